@@ -0,0 +1,33 @@
+"""
+Настройки gunicorn для продакшена.
+
+Запуск: gunicorn -c config/gunicorn.conf.py config.asgi:application
+
+Модель процессов: WEB_CONCURRENCY процессов (по умолчанию по числу ядер CPU),
+в каждом uvicorn с циклом событий asyncio. Асинхронные представления (личный
+кабинет, список бронирований, сетка свободных столиков) обслуживают множество
+одновременных соединений в одном процессе. Синхронные представления выполняются
+в пуле потоков asgiref, поэтому процессов больше числа ядер не требуется.
+
+Для сравнения с WSGI: GUNICORN_WORKER_CLASS=gthread и приложение config.wsgi:application.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+# Потоки используются только воркером gthread (режим WSGI)
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Перезапуск процессов для защиты от утечек памяти, со сдвигом, чтобы не перезапускались одновременно
+max_requests = 5000
+max_requests_jitter = 500
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,236 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Ресторан, с которым работает текущий запрос или команда (задает RestaurantMiddleware или use_restaurant)
+current_restaurant = ContextVar("current_restaurant", default=None)
+
+# Разрешено ли текущему запросу читать с реплик: None или число из [0, 1), по которому
+# выбирается реплика (одна на весь запрос). Задает ReplicaMiddleware или use_replicas
+replica_reads = ContextVar("replica_reads", default=None)
+
+# Отставание реплик в процессе: {псевдоним: (секунды, время проверки по time.monotonic)}
+replica_lag = {}
+
+# Проверка отставания выполняется одним фоновым потоком процесса за раз
+replica_lag_lock = threading.Lock()
+
+# Отставание реплики в секундах; 0, если реплика догнала основную БД или это не реплика (проверка на одной машине)
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# Модели, данные которых принадлежат ресторану и хранятся в его БД. Пользователи,
+# рестораны, сессии и очереди писем общие и всегда хранятся в default
+RESTAURANT_MODELS = {"table", "reservation", "waitlistentry", "occupancyrollup"}
+
+
+def is_restaurant_model(model):
+    """Модель с данными ресторана, которую нужно направлять в БД ресторана."""
+    return model._meta.app_label == "reservation" and model._meta.model_name in RESTAURANT_MODELS
+
+
+def get_current_restaurant():
+    """id ресторана текущего запроса или команды либо None."""
+    return current_restaurant.get()
+
+
+@contextmanager
+def use_restaurant(restaurant_id):
+    """Работа с данными ресторана restaurant_id внутри блока with (запросы направляются в его БД)."""
+    token = current_restaurant.set(restaurant_id)
+    try:
+        yield restaurant_id
+    finally:
+        current_restaurant.reset(token)
+
+
+def restaurant_database(restaurant_id=None):
+    """Псевдоним БД ресторана restaurant_id (по умолчанию текущего): из RESTAURANT_DATABASES или default."""
+    if restaurant_id is None:
+        restaurant_id = get_current_restaurant()
+    return settings.RESTAURANT_DATABASE_ROUTES.get(restaurant_id, DEFAULT_DB_ALIAS)
+
+
+def restaurant_databases():
+    """Псевдонимы всех БД, в которых хранятся данные ресторанов, начиная с default."""
+    return [DEFAULT_DB_ALIAS, *settings.RESTAURANT_DATABASES]
+
+
+class RestaurantRouter:
+    """Маршрутизация данных ресторанов по их БД или схемам.
+
+    Столики, бронирования, лист ожидания и почасовая занятость ресторана читаются
+    и записываются в БД, указанную для него в RESTAURANT_DATABASES, остальные
+    рестораны и все общие модели - в default. БД выбирается по restaurant_id
+    сохраняемого объекта, а для запросов без объекта - по текущему ресторану.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_restaurant_model(model):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and is_restaurant_model(instance):
+            if instance.restaurant_id is not None:
+                return restaurant_database(instance.restaurant_id)
+            if instance._state.db:
+                # Связанные объекты (например, бронирования столика) читаются из БД самого объекта
+                return instance._state.db
+        return restaurant_database()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Данные ресторана ссылаются на общих пользователей и рестораны из default
+        if obj1._state.db in restaurant_databases() and obj2._state.db in restaurant_databases():
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        options = settings.RESTAURANT_DATABASES.get(db)
+        if options is None or not options.get("schema"):
+            return None
+        # В схеме ресторана создаются только его таблицы, общие таблицы берутся из public
+        if model_name is None:
+            return app_label == "reservation"
+        return app_label == "reservation" and model_name in RESTAURANT_MODELS
+
+
+@contextmanager
+def use_replicas(seed=0.0):
+    """Чтение с реплик внутри блока with; seed (от 0 до 1) выбирает реплику, None запрещает чтение с реплик."""
+    token = replica_reads.set(seed)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def primary_database(alias):
+    """Основная БД реплики alias; для остальных псевдонимов - сам alias."""
+    if alias in settings.DATABASE_REPLICAS:
+        return settings.DATABASE_REPLICAS[alias].get("primary", DEFAULT_DB_ALIAS)
+    return alias
+
+
+def check_replica_lag(alias):
+    """Отставание реплики alias в секундах (бесконечное, если она недоступна); запоминается в replica_lag."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        lag = math.inf
+    replica_lag[alias] = (lag, time.monotonic())
+    return lag
+
+
+def stale_replicas():
+    """Реплики, отставание которых не проверялось дольше REPLICA_LAG_CHECK_INTERVAL секунд."""
+    now = time.monotonic()
+    return [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if now - replica_lag.get(alias, (None, -math.inf))[1] >= settings.REPLICA_LAG_CHECK_INTERVAL
+    ]
+
+
+def refresh_replica_lag():
+    """Проверка отставания реплик, у которых истек интервал проверки."""
+    for alias in stale_replicas():
+        check_replica_lag(alias)
+
+
+def schedule_replica_lag_check():
+    """Проверка отставания устаревших реплик в фоновом потоке, если она еще не идет.
+
+    Запрос не ждет проверки: недоступная реплика не задерживает ответы на время
+    ожидания соединения, а до окончания проверки используется прежний результат.
+    """
+    if not stale_replicas() or not replica_lag_lock.acquire(blocking=False):
+        return
+
+    def check():
+        try:
+            refresh_replica_lag()
+        finally:
+            connections.close_all()
+            replica_lag_lock.release()
+
+    threading.Thread(target=check, name="replica-lag", daemon=True).start()
+
+
+def read_database(primary):
+    """Псевдоним БД для чтения данных основной БД primary: ее реплика или сама primary.
+
+    Реплика выбирается, если текущий запрос разрешает чтение с реплик, в primary нет
+    открытой транзакции и есть неотстающая реплика.
+    """
+    seed = replica_reads.get()
+    if seed is None or connections[primary].in_atomic_block:
+        return primary
+    replicas = healthy_replicas(primary)
+    return replicas[int(seed * len(replicas))] if replicas else primary
+
+
+def healthy_replicas(primary):
+    """Реплики БД primary, отставание которых при последней проверке не больше REPLICA_MAX_LAG.
+
+    Непроверенные реплики и реплики, проверка которых не завершается дольше двух
+    интервалов проверки (например, из-за недоступности), не используются.
+    """
+    now = time.monotonic()
+    replicas = []
+    for alias, options in settings.DATABASE_REPLICAS.items():
+        lag, checked_at = replica_lag.get(alias, (math.inf, -math.inf))
+        if (
+            options.get("primary", DEFAULT_DB_ALIAS) == primary
+            and lag <= settings.REPLICA_MAX_LAG
+            and now - checked_at < 2 * settings.REPLICA_LAG_CHECK_INTERVAL
+        ):
+            replicas.append(alias)
+    return replicas
+
+
+class ReplicaRouter(RestaurantRouter):
+    """Маршрутизация по БД ресторанов с чтением с реплик.
+
+    Запись и чтение внутри транзакции всегда идут в основную БД. Чтение вне
+    транзакции идет на реплику, только если запрос разрешил это (ReplicaMiddleware:
+    безопасные HTTP-методы без недавней записи посетителя) и реплика не отстает.
+    Объекты, прочитанные с реплики, сохраняются в ее основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database(self.get_primary(super().db_for_read(model, **hints), hints))
+
+    def db_for_write(self, model, **hints):
+        return self.get_primary(super().db_for_write(model, **hints), hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        db1, db2 = primary_database(obj1._state.db), primary_database(obj2._state.db)
+        if db1 == db2 or (db1 in restaurant_databases() and db2 in restaurant_databases()):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему с основной БД репликацией
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return super().allow_migrate(db, app_label, model_name, **hints)
+
+    @staticmethod
+    def get_primary(db, hints):
+        """Основная БД для выбранной RestaurantRouter БД db, а без нее - для БД объекта из подсказки."""
+        if db is None:
+            instance = hints.get("instance")
+            db = instance._state.db if instance is not None and instance._state.db else DEFAULT_DB_ALIAS
+        return primary_database(db)
@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -10,8 +11,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECRET_KEY = "django-insecure-%xy0#4=561wth#p64%xeig(owu3_cbn8lxx9-wb@g=9%r!@7_a"
 SECRET_KEY = os.getenv("SECRET_KEY")
 
-# DEBUG = True if os.getenv("DEBUG") == "True" else False
-DEBUG = True
+DEBUG = True if os.getenv("DEBUG") == "True" else False
 
 ALLOWED_HOSTS = ["*"]
 
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "reservation",
     "django.contrib.sites",
@@ -30,6 +31,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "reservation.middleware.PrecompressedStaticMiddleware",
+    # Список ресторанов и отставание реплик загружаются редко и не входят в бюджет запросов представлений
+    "reservation.middleware.RestaurantMiddleware",
+    "reservation.middleware.ReplicaMiddleware",
+    "reservation.middleware.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -51,6 +57,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "reservation.context_processors.cache_timeouts",
             ],
         },
     },
@@ -61,15 +68,100 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "ENGINE": "django.db.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Проверка соединения перед выдачей: разорванные соединения заменяются новыми
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Пул соединений psycopg в каждом процессе. Без пула (DB_POOL=False, например за
+# внешним пулером pgbouncer) соединения переиспользуются DB_CONN_MAX_AGE секунд
+if os.getenv("DB_POOL", "True") == "True":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "name": "default",
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            # Сколько секунд запрос ждет свободное соединение, прежде чем получить ошибку
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", 60))
+
+# Рестораны (или группы ресторанов) на отдельных БД или схемах одной БД, например:
+# {"venue_a": {"restaurants": [2, 3], "schema": "venue_a"}, "venue_b": {"restaurants": [4], "NAME": "res_b"}}.
+# Параметры подключения, которые не указаны (NAME, HOST, PORT, USER, PASSWORD), берутся из default,
+# рестораны без своей БД остаются в default. Маршрутизацию выполняет config.routers.RestaurantRouter
+RESTAURANT_DATABASES = json.loads(os.getenv("RESTAURANT_DATABASES", "{}"))
+RESTAURANT_DATABASE_ROUTES = {}
+for alias, options in RESTAURANT_DATABASES.items():
+    DATABASES[alias] = {**DATABASES["default"], **{key: value for key, value in options.items() if key.isupper()}}
+    DATABASES[alias]["OPTIONS"] = dict(DATABASES["default"].get("OPTIONS", {}))
+    if "pool" in DATABASES[alias]["OPTIONS"]:
+        DATABASES[alias]["OPTIONS"]["pool"] = {**DATABASES[alias]["OPTIONS"]["pool"], "name": alias}
+    if options.get("schema"):
+        # Таблицы ресторана в его схеме, общие таблицы (пользователи, рестораны) - в public
+        DATABASES[alias]["OPTIONS"]["options"] = f"-c search_path={options['schema']},public"
+    RESTAURANT_DATABASE_ROUTES.update(dict.fromkeys(options.get("restaurants", []), alias))
+
+# Реплики для чтения основной БД или БД ресторанов, например:
+# {"replica": {"HOST": "10.0.0.2"}, "venue_a_replica": {"primary": "venue_a", "HOST": "10.0.0.3"}}.
+# Не указанные параметры подключения берутся из основной БД (primary, по умолчанию default).
+# Для проверки на одной машине достаточно {"replica": {}}: второй псевдоним той же БД
+DATABASE_REPLICAS = json.loads(os.getenv("DATABASE_REPLICAS", "{}"))
+for alias, options in DATABASE_REPLICAS.items():
+    primary = options.get("primary", "default")
+    DATABASES[alias] = {**DATABASES[primary], **{key: value for key, value in options.items() if key.isupper()}}
+    DATABASES[alias]["OPTIONS"] = dict(DATABASES[primary].get("OPTIONS", {}))
+    if "pool" in DATABASES[alias]["OPTIONS"]:
+        DATABASES[alias]["OPTIONS"]["pool"] = {**DATABASES[alias]["OPTIONS"]["pool"], "name": alias}
+    # В тестах реплика - то же подключение, что и основная БД
+    DATABASES[alias]["TEST"] = {"MIRROR": primary}
+
+# Реплика с отставанием больше REPLICA_MAX_LAG секунд не используется; отставание
+# проверяется не чаще раза в REPLICA_LAG_CHECK_INTERVAL секунд в каждом процессе
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", 5))
+# После записи посетитель REPLICA_PIN_SECONDS секунд читает из основной БД и видит свои изменения
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 15))
+
+DATABASE_ROUTERS = ["config.routers.ReplicaRouter"]
+
+# Ресторан по умолчанию для запросов без выбранного ресторана; без него - ресторан с наименьшим id
+DEFAULT_RESTAURANT_ID = int(os.getenv("DEFAULT_RESTAURANT_ID", 0)) or None
+
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+        "KEY_PREFIX": "res_table",
+        # Увеличение версии сбрасывает все закэшированные страницы и фрагменты
+        "VERSION": int(os.getenv("CACHE_VERSION", 1)),
+    }
+}
+
+# Сессии читаются из кэша и записываются и в кэш, и в БД. При нескольких процессах
+# gunicorn кэш должен быть общим (CACHE_BACKEND Redis или Memcached), иначе выход
+# из аккаунта в одном процессе не виден другим
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+
+# Пользователь сессии, его группы и права кэшируются (users.backends.CachedModelBackend)
+AUTHENTICATION_BACKENDS = ["users.backends.CachedModelBackend"]
+USER_CACHE_TIMEOUT = int(os.getenv("USER_CACHE_TIMEOUT", 3600))
+
+# Время жизни кэша страниц для анонимных посетителей и фрагментов шаблонов, в секундах
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", 600))
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", 600))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -97,18 +189,38 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
+STATIC_ROOT = os.getenv("STATIC_ROOT", os.path.join(BASE_DIR, "staticfiles"))
+# Время кэширования в браузере статики без хэша в имени файла, в секундах
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", 3600))
+
+# С STATIC_MANIFEST=True шаблоны ссылаются на файлы с хэшем в имени, собранные collectstatic
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "reservation.storage.CompressedManifestStaticFilesStorage"
+            if os.getenv("STATIC_MANIFEST", False) == "True"
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# Раздача MEDIA_ROOT самим приложением, когда перед ним нет отдельного веб-сервера
+SERVE_MEDIA = os.getenv("SERVE_MEDIA", False) == "True"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.User"
 
+LOGIN_URL = "users:login"
 LOGIN_REDIRECT_URL = "reservation:main"
 LOGOUT_REDIRECT_URL = "reservation:main"
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Для локальной проверки: django.core.mail.backends.filebased.EmailBackend или locmem.EmailBackend
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH", os.path.join(BASE_DIR, "sent_emails"))
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", False) == "True"
@@ -116,7 +228,18 @@ EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", False) == "True"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("MAIL_PASSWORD")
 
+# Срок действия ссылки подтверждения почты, в секундах. Аккаунты, не подтвержденные за это время,
+# удаляет команда cleanup_unverified
+EMAIL_VERIFICATION_TTL = int(os.getenv("EMAIL_VERIFICATION_TTL", 48 * 3600))
+
 SERVER_EMAIL = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 SITE_ID = 1
+
+# Ошибка вместо предупреждения в журнале при превышении бюджета запросов к БД
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", False) == "True"
+
+# Часы работы ресторана (местное время): по ним считается доля занятости столиков в отчете
+RESTAURANT_OPENING_HOUR = int(os.getenv("RESTAURANT_OPENING_HOUR", 0))
+RESTAURANT_CLOSING_HOUR = int(os.getenv("RESTAURANT_CLOSING_HOUR", 24))
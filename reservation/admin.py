@@ -1,19 +1,43 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from config.routers import get_current_restaurant
+from .analytics import WEEKDAYS, occupancy_report
+from .export import export_response
+from .models import OccupancyRollup, Reservation, Restaurant, Table, WaitlistEntry
+
+# Период отчета о занятости по умолчанию
+OCCUPANCY_REPORT_DAYS = 365
+
+
+@admin.action(description="Выгрузить в CSV")
+def export_reservations_csv(modeladmin, request, queryset):
+    return export_response(request, queryset, "csv")
 
-from .models import Reservation, Restaurant, Table
+
+@admin.action(description="Выгрузить в JSONL")
+def export_reservations_jsonl(modeladmin, request, queryset):
+    return export_response(request, queryset, "jsonl")
 
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     list_display = (
         "id",
+        "restaurant",
         "owner",
         "table",
+        "guests",
         "reserved_at",
         "customer_name",
         "customer_contact",
     )
     list_filter = (
+        "restaurant",
         "table",
         "customer_name",
         "reserved_at",
@@ -23,6 +47,7 @@ class ReservationAdmin(admin.ModelAdmin):
         "customer_name",
         "reserved_at",
     )
+    actions = (export_reservations_csv, export_reservations_jsonl)
 
 
 @admin.register(Restaurant)
@@ -34,6 +59,84 @@ class RestaurantAdmin(admin.ModelAdmin):
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
-    list_display = ("id", "number", "capacity")
-    list_filter = ("number",)
+    list_display = ("id", "restaurant", "number", "capacity", "is_available")
+    list_filter = ("restaurant", "number")
     search_fields = ("number",)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "customer_name",
+        "guests",
+        "desired_from",
+        "desired_to",
+        "status",
+        "offered_table",
+        "offered_at",
+    )
+    list_filter = ("restaurant", "status")
+    search_fields = ("customer_name", "customer_contact", "owner__email")
+    list_select_related = ("offered_table",)
+
+
+@admin.register(OccupancyRollup)
+class OccupancyRollupAdmin(admin.ModelAdmin):
+    """Отчет о занятости столиков вместо списка почасовых строк, которые пересчитываются автоматически."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        """Тепловая карта занятости по дням недели и часам и доли занятости столиков ресторана за период.
+
+        Ресторан выбирается параметром restaurant, как и на сайте (см. RestaurantMiddleware).
+        """
+        today = timezone.localdate()
+        date_to = self.get_date(request, "date_to") or today
+        date_from = self.get_date(request, "date_from") or date_to - timedelta(days=OCCUPANCY_REPORT_DAYS - 1)
+        if date_from > date_to:
+            date_from, date_to = date_to, date_from
+        report = occupancy_report(date_from, date_to)
+        heatmap = (report["heatmap"] * 100).round().astype(int)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Отчет о занятости столиков",
+            "date_from": date_from,
+            "date_to": date_to,
+            "restaurant_id": get_current_restaurant(),
+            "restaurants": Restaurant.objects.order_by("pk").values_list("pk", "name"),
+            "report": report,
+            "utilization": round(report["utilization"] * 100, 1),
+            "hours": range(24),
+            "heatmap": [
+                {"weekday": weekday, "cells": [{"percent": percent, "alpha": percent / 100} for percent in row]}
+                for weekday, row in zip(WEEKDAYS, heatmap.tolist())
+            ],
+            "tables": [
+                {
+                    **table,
+                    "utilization": round(table["utilization"] * 100, 1),
+                    "seat_utilization": round(table["seat_utilization"] * 100, 1),
+                }
+                for table in report["tables"]
+            ],
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, "admin/reservation/occupancyrollup/report.html", context)
+
+    @staticmethod
+    def get_date(request, name):
+        """Дата из параметра запроса или None."""
+        try:
+            return parse_date(request.GET.get(name, ""))
+        except ValueError:
+            return None
@@ -0,0 +1,83 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from reservation.models import RESERVATION_DURATION
+
+
+def evening_period(reserved_at):
+    """Сутки (по часовому поясу проекта), на которые приходится начало бронирования.
+
+    Период продлен на продолжительность бронирования: позднее бронирование
+    заканчивается уже на следующих сутках.
+    """
+    day = timezone.localtime(reserved_at).date()
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end + RESERVATION_DURATION
+
+
+class TableAllocator:
+    """Подбор столика под количество гостей по занятости, загруженной в память.
+
+    Столики и их бронирования за период хранятся массивами NumPy, поэтому подбор
+    не обращается к БД и не перебирает столики в цикле Python. Выбирается свободный
+    столик наименьшей достаточной вместимости (большие столики остаются для больших
+    компаний), а из столиков одной вместимости - тот, где бронирование плотнее всего
+    примыкает к соседним и оставляет меньше непригодных коротких окон.
+    """
+
+    def __init__(self, tables, reservations):
+        """tables - словари с id, number, capacity и is_available; reservations - (table_id, начало, окончание)."""
+        self.table_ids = np.array([table["id"] for table in tables], dtype=np.int64)
+        self.numbers = np.array([table["number"] for table in tables], dtype=np.int64)
+        self.capacity = np.array([table["capacity"] for table in tables], dtype=np.int64)
+        self.available = np.array([table["is_available"] for table in tables], dtype=bool)
+        self.sorter = np.argsort(self.table_ids)
+        self.known_ids = set(self.table_ids.tolist())
+        self.rows = np.empty(0, dtype=np.int64)
+        self.starts = np.empty(0)
+        self.ends = np.empty(0)
+        self.add_reservations(reservations)
+
+    def add_reservations(self, reservations):
+        """Добавление бронирований (table_id, начало, окончание) к занятости в памяти."""
+        reservations = [row for row in reservations if row[0] in self.known_ids]
+        if not reservations:
+            return
+        table_id, starts, ends = zip(*reservations)
+        rows = self.sorter[np.searchsorted(self.table_ids, np.array(table_id, dtype=np.int64), sorter=self.sorter)]
+        self.rows = np.concatenate([self.rows, rows])
+        self.starts = np.concatenate([self.starts, [value.timestamp() for value in starts]])
+        self.ends = np.concatenate([self.ends, [value.timestamp() for value in ends]])
+
+    def allocate(self, reserved_at, guests):
+        """id подходящего свободного столика для бронирования с reserved_at на guests гостей или None."""
+        start = reserved_at.timestamp()
+        end = (reserved_at + RESERVATION_DURATION).timestamp()
+        busy = np.zeros(len(self.table_ids), dtype=bool)
+        busy[self.rows[(self.starts < end) & (self.ends > start)]] = True
+        candidates = np.flatnonzero((self.capacity >= guests) & self.available & ~busy)
+        if not len(candidates):
+            return None
+
+        # Незанятое время до и после бронирования на каждом столике (до ближайших бронирований)
+        previous_end = np.full(len(self.table_ids), -np.inf)
+        next_start = np.full(len(self.table_ids), np.inf)
+        before = self.ends <= start
+        after = self.starts >= end
+        np.maximum.at(previous_end, self.rows[before], self.ends[before])
+        np.minimum.at(next_start, self.rows[after], self.starts[after])
+        # Столик без соседних бронирований считается наименее подходящим для плотной посадки
+        gap_limit = timedelta(days=1).total_seconds()
+        gaps = np.minimum(start - previous_end, gap_limit) + np.minimum(next_start - end, gap_limit)
+
+        order = np.lexsort(
+            (self.numbers[candidates], gaps[candidates], self.capacity[candidates]),
+        )
+        return int(self.table_ids[candidates[order[0]]])
+
+    def reserve(self, table_id, reserved_at):
+        """Учет нового бронирования столика table_id в занятости в памяти."""
+        self.add_reservations([(table_id, reserved_at, reserved_at + RESERVATION_DURATION)])
@@ -0,0 +1,250 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from config.routers import get_current_restaurant, read_database, restaurant_database
+from reservation.models import RESERVATION_DURATION, OccupancyRollup, Reservation, Table
+
+HOUR = timedelta(hours=1)
+
+WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+
+def hour_start(value):
+    """Начало часа (UTC), на который приходится момент value; так же считает date_trunc в БД."""
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def week_hour(hour):
+    """Номер часа недели по часовому поясу проекта: 0 - понедельник с 0 до 1 часа, 167 - воскресенье с 23 часов."""
+    local = timezone.localtime(hour)
+    return local.weekday() * 24 + local.hour
+
+
+def rollup_deltas(reservations, sign=1, deltas=None):
+    """Изменения почасовой занятости от бронирований (restaurant_id, table_id, начало, окончание, гостей).
+
+    Интервал бронирования делится на часы: каждому часу достаются минуты пересечения
+    с ним и гостеминуты, а начатое бронирование засчитывается часу своего начала.
+    sign=-1 вычитает бронирования, например удаленные или перенесенные. Изменения
+    добавляются к deltas, если они переданы.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0, 0])
+    for restaurant_id, table_id, start, end, guests in reservations:
+        hour = hour_start(start)
+        deltas[restaurant_id, table_id, hour][2] += sign
+        while hour < end:
+            minutes = round((min(end, hour + HOUR) - max(start, hour)).total_seconds() / 60)
+            delta = deltas[restaurant_id, table_id, hour]
+            delta[0] += sign * minutes
+            delta[1] += sign * minutes * guests
+            hour += HOUR
+    return deltas
+
+
+def apply_rollup_deltas(deltas):
+    """Запись изменений почасовой занятости запросом INSERT ... ON CONFLICT DO UPDATE в БД каждого ресторана.
+
+    Изменения прибавляются к счетчикам в БД, а не перезаписывают их, поэтому
+    одновременные бронирования разных столиков не теряют обновления друг друга.
+    """
+    by_database = defaultdict(dict)
+    for key, delta in deltas.items():
+        if any(delta):
+            by_database[restaurant_database(key[0])][key] = delta
+    for using, database_deltas in by_database.items():
+        upsert_rollups(database_deltas, using)
+
+
+def upsert_rollups(deltas, using):
+    """Прибавление изменений deltas к почасовой занятости в БД using одним запросом."""
+    restaurant_ids, table_ids, hours = zip(*deltas.keys())
+    booked_minutes, guest_minutes, reservations = zip(*deltas.values())
+    table = OccupancyRollup._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (
+                restaurant_id, table_id, hour, week_hour, booked_minutes, guest_minutes, reservations
+            )
+            SELECT * FROM unnest(
+                %s::bigint[], %s::bigint[], %s::timestamptz[], %s::smallint[],
+                %s::integer[], %s::integer[], %s::integer[]
+            )
+            ON CONFLICT (table_id, hour) DO UPDATE SET
+                booked_minutes = {table}.booked_minutes + EXCLUDED.booked_minutes,
+                guest_minutes = {table}.guest_minutes + EXCLUDED.guest_minutes,
+                reservations = {table}.reservations + EXCLUDED.reservations
+            """,
+            [
+                list(restaurant_ids),
+                list(table_ids),
+                list(hours),
+                [week_hour(hour) for hour in hours],
+                list(booked_minutes),
+                list(guest_minutes),
+                list(reservations),
+            ],
+        )
+
+
+def record_reservations(reservations, sign=1):
+    """Учет сохраненных (sign=1) или удаленных (sign=-1) бронирований в почасовой занятости.
+
+    bulk_create не отправляет сигналы, поэтому после пакетного сохранения
+    бронирований эта функция вызывается явно, как и touch_tables.
+    """
+    apply_rollup_deltas(
+        rollup_deltas(
+            [
+                (
+                    reservation.restaurant_id,
+                    reservation.table_id,
+                    reservation.reserved_at,
+                    reservation.ends_at,
+                    reservation.guests,
+                )
+                for reservation in reservations
+            ],
+            sign,
+        )
+    )
+
+
+def rebuild_rollups(start, end, using=None):
+    """Пересчет почасовой занятости за период [start, end) по бронированиям БД using. Возвращает число строк.
+
+    Нужен после загрузки данных в обход ORM и для заполнения отчета по уже
+    существующим бронированиям. Часы считаются в БД одним запросом через
+    generate_series, период выравнивается по началу часа. По умолчанию
+    пересчитывается БД текущего ресторана вместе со всеми ресторанами в ней.
+    """
+    using = using or restaurant_database()
+    start, end = hour_start(start), hour_start(end - timedelta(microseconds=1)) + HOUR
+    rollups = OccupancyRollup._meta.db_table
+    with transaction.atomic(using=using):
+        OccupancyRollup.objects.using(using).filter(hour__gte=start, hour__lt=end).delete()
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {rollups} (
+                    restaurant_id, table_id, hour, week_hour, booked_minutes, guest_minutes, reservations
+                )
+                SELECT
+                    reservation.restaurant_id,
+                    reservation.table_id,
+                    slot.hour,
+                    (extract(isodow FROM slot.hour AT TIME ZONE %s) - 1) * 24
+                        + extract(hour FROM slot.hour AT TIME ZONE %s),
+                    SUM(slot.minutes),
+                    SUM(slot.minutes * reservation.guests),
+                    COUNT(*) FILTER (WHERE slot.hour = date_trunc('hour', reservation.reserved_at))
+                FROM {Reservation._meta.db_table} AS reservation
+                CROSS JOIN LATERAL generate_series(
+                    date_trunc('hour', reservation.reserved_at), reservation.ends_at - interval '1 microsecond',
+                    interval '1 hour'
+                ) AS hours(hour)
+                CROSS JOIN LATERAL (
+                    SELECT
+                        hours.hour,
+                        round(extract(epoch FROM
+                            least(reservation.ends_at, hours.hour + interval '1 hour')
+                            - greatest(reservation.reserved_at, hours.hour)
+                        ) / 60)::integer AS minutes
+                ) AS slot
+                WHERE reservation.reserved_at > %s AND reservation.reserved_at < %s
+                    AND slot.hour >= %s AND slot.hour < %s
+                GROUP BY reservation.restaurant_id, reservation.table_id, slot.hour
+                """,
+                [settings.TIME_ZONE, settings.TIME_ZONE, start - RESERVATION_DURATION, end, start, end],
+            )
+            return cursor.rowcount
+
+
+def report_period(date_from, date_to):
+    """Границы отчета: с полуночи date_from до полуночи после date_to по часовому поясу проекта."""
+    start = timezone.make_aware(datetime.combine(date_from, time.min))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return start, end
+
+
+def occupancy_report(date_from, date_to, restaurant_id=None):
+    """Отчет о занятости столиков ресторана restaurant_id (по умолчанию текущего) за дни с date_from по date_to.
+
+    БД суммирует почасовую занятость до ячеек «столик × час недели» (не больше 168 строк
+    на столик при любой длине периода), а тепловая карта и доли занятости
+    считаются массивами NumPy. Доля занятости - занятые минуты от всех минут ячейки
+    за период; для столиков она считается только по часам работы ресторана.
+    """
+    restaurant_id = restaurant_id or get_current_restaurant()
+    using = read_database(restaurant_database(restaurant_id))
+    start, end = report_period(date_from, date_to)
+    tables = list(
+        Table.objects.using(using)
+        .filter(restaurant_id=restaurant_id)
+        .order_by("number")
+        .values("id", "number", "capacity")
+    )
+    rows = list(
+        OccupancyRollup.objects.using(using)
+        .filter(restaurant_id=restaurant_id, hour__gte=start, hour__lt=end)
+        .values_list("table_id", "week_hour")
+        .annotate(Sum("booked_minutes"), Sum("guest_minutes"), Sum("reservations"))
+        .order_by()
+    )
+
+    table_ids = np.array([table["id"] for table in tables], dtype=np.int64)
+    capacity = np.array([table["capacity"] for table in tables], dtype=np.int64)
+    cells = np.zeros((3, len(tables), 7 * 24), dtype=np.int64)
+    if rows and len(tables):
+        data = np.array(rows, dtype=np.int64)
+        sorter = np.argsort(table_ids)
+        positions = np.searchsorted(table_ids, data[:, 0], sorter=sorter).clip(max=len(tables) - 1)
+        known = table_ids[sorter[positions]] == data[:, 0]
+        data, index = data[known], sorter[positions[known]]
+        for measure in range(3):
+            np.add.at(cells[measure], (index, data[:, 1]), data[:, 2 + measure])
+    booked, guest_minutes, started = cells.reshape(3, len(tables), 7, 24)
+
+    # Сколько раз каждый день недели встречается в периоде (1970-01-01 - четверг)
+    days = np.arange(np.datetime64(date_from), np.datetime64(date_to) + 1).astype(np.int64)
+    weekday_count = np.bincount((days + 3) % 7, minlength=7)
+    cell_minutes = weekday_count[:, None] * 60 * np.ones(24, dtype=np.int64)
+    open_hours = np.zeros(24, dtype=bool)
+    open_hours[settings.RESTAURANT_OPENING_HOUR : settings.RESTAURANT_CLOSING_HOUR] = True
+    open_minutes = cell_minutes[:, open_hours].sum()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        heatmap = np.nan_to_num(booked.sum(axis=0) / (cell_minutes * max(len(tables), 1)))
+        table_booked = booked[:, :, open_hours].sum(axis=(1, 2))
+        table_guests = guest_minutes[:, :, open_hours].sum(axis=(1, 2))
+        utilization = np.nan_to_num(table_booked / open_minutes)
+        seat_utilization = np.nan_to_num(table_guests / (capacity * open_minutes))
+        total_utilization = float(np.nan_to_num(table_booked.sum() / (open_minutes * len(tables))))
+
+    return {
+        "start": start,
+        "end": end,
+        "days": len(days),
+        "heatmap": heatmap,
+        "reservations": int(started.sum()),
+        "utilization": total_utilization,
+        "tables": [
+            {
+                **table,
+                "reservations": int(table_started),
+                "booked_hours": round(int(table_minutes) / 60, 1),
+                "utilization": float(table_utilization),
+                "seat_utilization": float(table_seat_utilization),
+            }
+            for table, table_started, table_minutes, table_utilization, table_seat_utilization in zip(
+                tables, started.sum(axis=(1, 2)), booked.sum(axis=(1, 2)), utilization, seat_utilization
+            )
+        ],
+    }
@@ -0,0 +1,118 @@
+import hashlib
+from datetime import timedelta
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from config.routers import get_current_restaurant
+from reservation.models import Table
+from reservation.pagination import KeysetPaginationMixin
+from reservation.services import SLOT_DURATION, availability_grid
+from reservation.views import availability_payload, get_availability_params, upcoming_reservations
+
+# Поля бронирования в ответе API
+RESERVATION_FIELDS = ("id", "table_id", "table__number", "reserved_at", "ends_at", "guests", "customer_name")
+
+
+def restaurant_tables():
+    """Столики текущего ресторана."""
+    return Table.objects.filter(restaurant_id=get_current_restaurant())
+
+
+def tables_version():
+    """Версия состояния столиков текущего ресторана: хэш пар (id, version) одним запросом.
+
+    Меняется при добавлении, изменении и удалении столика и при любом изменении
+    его бронирований, поэтому подходит для ETag ответов, построенных по бронированиям.
+    """
+    digest = hashlib.sha256()
+    for table_id, version in restaurant_tables().order_by("id").values_list("id", "version"):
+        digest.update(f"{table_id}:{version};".encode())
+    return digest.hexdigest()
+
+
+def make_etag(*parts):
+    """Сильный ETag из частей, от которых зависит содержимое ответа."""
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def time_bucket(step):
+    """Номер текущего интервала длиной step: ответы, зависящие от текущего времени, меняют ETag раз в step."""
+    return int(timezone.now().timestamp() // step.total_seconds())
+
+
+def tables_etag(request, *args, **kwargs):
+    return make_etag("tables", tables_version())
+
+
+def availability_etag(request, *args, **kwargs):
+    # Прошедшие слоты перестают быть свободными, поэтому ETag меняется и с началом каждого слота
+    return make_etag("availability", tables_version(), request.GET.urlencode(), time_bucket(SLOT_DURATION))
+
+
+def reservations_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    # Начавшиеся бронирования пропадают из списка предстоящих, поэтому ETag меняется и раз в минуту
+    minute = time_bucket(timedelta(minutes=1))
+    return make_etag("reservations", request.user.pk, tables_version(), request.GET.urlencode(), minute)
+
+
+class ApiView(View):
+    """Базовое представление API: только чтение, ответ всегда перепроверяется по ETag."""
+
+    http_method_names = ["get", "head", "options"]
+    cache_control = {"public": True, "no_cache": True}
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        patch_cache_control(response, **self.cache_control)
+        return response
+
+
+@method_decorator(condition(etag_func=tables_etag), name="get")
+class TableApiView(ApiView):
+    """Список столиков."""
+
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        tables = restaurant_tables().order_by("number").values("id", "number", "capacity", "is_available")
+        return JsonResponse({"tables": list(tables)})
+
+
+@method_decorator(condition(etag_func=availability_etag), name="get")
+class AvailabilityApiView(ApiView):
+    """Сетка свободных слотов столиков за период (параметры date_from, date_to, guests)."""
+
+    query_budget = 3
+
+    def get(self, request, *args, **kwargs):
+        try:
+            date_from, date_to, guests = get_availability_params(request)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        grid = availability_grid(date_from, date_to, guests=guests)
+        return JsonResponse(availability_payload(grid, date_from, date_to))
+
+
+@method_decorator(condition(etag_func=reservations_etag), name="get")
+class ReservationApiView(KeysetPaginationMixin, ApiView):
+    """Предстоящие бронирования пользователя постранично (курсор следующей страницы - параметр after)."""
+
+    cache_control = {"private": True, "no_cache": True}
+    query_budget = 3
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Требуется авторизация."}, status=401)
+        queryset = self.paginate_keyset(upcoming_reservations().filter(owner=request.user))
+        rows = list(queryset.values(*RESERVATION_FIELDS)[: self.keyset_page_size + 1])
+        page = self.get_keyset_context(rows)
+        response = JsonResponse({"reservations": page["object_list"], "next_cursor": page["next_cursor"]})
+        patch_vary_headers(response, ["Cookie"])
+        return response
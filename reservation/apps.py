@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReservationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "reservation"
+
+    def ready(self):
+        import reservation.signals  # noqa: F401
+        from reservation.partitions import create_partitions_after_migrate
+
+        post_migrate.connect(create_partitions_after_migrate, sender=self)
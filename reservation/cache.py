@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+# Cookie, наличие которых означает персональную страницу (сессия или отложенные сообщения)
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, "messages")
+
+
+def is_anonymous_request(request):
+    """GET-запрос посетителя без сессии и сообщений: страница одинакова для всех таких посетителей.
+
+    Проверяются только cookie, поэтому ни сессия, ни пользователь из БД не загружаются.
+    """
+    return request.method in ("GET", "HEAD") and not any(name in request.COOKIES for name in PERSONAL_COOKIES)
+
+
+def page_cache_key(request, params=()):
+    """Ключ кэша страницы по пути и значениям параметров запроса params.
+
+    Остальные параметры (метки рекламных кампаний, случайные значения) страницу не меняют
+    и в ключ не входят, иначе каждый их набор занимал бы в кэше свою копию страницы.
+    Версия ключа задается CACHES["default"]["VERSION"].
+    """
+    query = urlencode([(name, request.GET.getlist(name)) for name in params if name in request.GET], doseq=True)
+    return f"page:{request.path}?{query}" if query else f"page:{request.path}"
+
+
+class AnonymousPageCacheMixin:
+    """Кэширование страницы целиком для анонимных посетителей.
+
+    Закэшированная страница отдается до вызова представления, без обращения к БД.
+    """
+
+    page_cache_timeout = None
+    # Параметры запроса, от которых зависит страница: только они входят в ключ кэша
+    page_cache_params = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_anonymous_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, self.page_cache_params)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.page_cache_timeout or settings.PAGE_CACHE_TIMEOUT
+            response.add_post_render_callback(lambda rendered: cache.set(key, rendered.content, timeout))
+        return response
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def cache_timeouts(request):
+    """Время жизни кэша фрагментов шаблонов."""
+    return {"fragment_cache_timeout": settings.FRAGMENT_CACHE_TIMEOUT}
@@ -0,0 +1,45 @@
+import logging
+import os
+
+from django.db import connections
+
+logger = logging.getLogger("reservation.db_pool")
+
+# Доля занятых соединений, при которой в журнал пишется предупреждение о насыщении пула
+POOL_SATURATION_WARNING = 0.9
+
+
+def get_pool_stats(alias="default"):
+    """Статистика пула соединений psycopg текущего процесса или None, если пул не используется.
+
+    Кроме счетчиков psycopg_pool возвращает среднее ожидание свободного соединения
+    (wait_avg_ms) и насыщенность пула (saturation) - долю занятых соединений
+    от максимального размера пула.
+    """
+    pool = connections[alias].pool
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    requests_num = stats.get("requests_num", 0)
+    in_use = stats["pool_size"] - stats["pool_available"]
+    stats.update(
+        alias=alias,
+        pid=os.getpid(),
+        pool_in_use=in_use,
+        wait_avg_ms=round(stats.get("requests_wait_ms", 0) / requests_num, 2) if requests_num else 0.0,
+        saturation=round(in_use / stats["pool_max"], 3),
+    )
+    if stats["saturation"] >= POOL_SATURATION_WARNING or stats.get("requests_waiting"):
+        logger.warning(
+            "Пул соединений %s насыщен: занято %s из %s, ожидают %s запросов",
+            alias,
+            in_use,
+            stats["pool_max"],
+            stats.get("requests_waiting", 0),
+        )
+    return stats
+
+
+def get_all_pool_stats():
+    """Статистика пулов всех подключений к БД, для которых включен пул."""
+    return {alias: stats for alias in connections.settings if (stats := get_pool_stats(alias)) is not None}
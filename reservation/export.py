@@ -0,0 +1,95 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from reservation.models import Reservation
+
+# Выгружаемые поля: заголовок файла и путь к значению в values_list
+EXPORT_FIELDS = {
+    "id": "id",
+    "table": "table__number",
+    "guests": "guests",
+    "reserved_at": "reserved_at",
+    "ends_at": "ends_at",
+    "customer_name": "customer_name",
+    "customer_contact": "customer_contact",
+    "owner_email": "owner__email",
+}
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+class Echo:
+    """Объект-заглушка для csv.writer: возвращает записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+def filter_reservations(queryset=None, date_from=None, date_to=None, table=None, owner=None):
+    """Отбор бронирований по периоду, номеру столика и email владельца."""
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    if date_from:
+        queryset = queryset.filter(reserved_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(reserved_at__lt=date_to)
+    if table:
+        queryset = queryset.filter(table__number=table)
+    if owner:
+        queryset = queryset.filter(owner__email=owner)
+    return queryset
+
+
+def iter_export_rows(queryset, file_format="csv", chunk_size=2000):
+    """Строки выгрузки бронирований в формате csv или jsonl.
+
+    Данные читаются серверным курсором пачками по chunk_size кортежей, поэтому
+    расход памяти не зависит от объема выгрузки.
+    """
+    rows = queryset.order_by("reserved_at", "id").values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=chunk_size)
+    if file_format == "jsonl":
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_export_rows(queryset, file_format="csv", chunk_size=2000):
+    """Асинхронный вариант iter_export_rows для ответа под ASGI.
+
+    Синхронный итератор ASGI-обработчик Django сначала читает целиком, а этот отдает строки
+    по мере чтения: каждая пачка из chunk_size строк читается в потоке вне цикла событий.
+    """
+    # Генератор еще не выполняется, поэтому создать его можно в цикле событий
+    rows = iter_export_rows(queryset, file_format, chunk_size)
+    while True:
+        lines = await sync_to_async(list)(islice(rows, chunk_size))
+        for line in lines:
+            yield line
+        if len(lines) < chunk_size:
+            break
+
+
+def export_response(request, queryset, file_format="csv", filename="reservations"):
+    """Потоковый HTTP-ответ с выгрузкой бронирований.
+
+    Под ASGI содержимое ответа - асинхронный итератор, под WSGI - обычный.
+    """
+    # Ответ читается после выхода из контекста ресторана запроса, поэтому база выбирается сейчас
+    queryset = queryset.using(queryset.db)
+    rows = aiter_export_rows if isinstance(request, ASGIRequest) else iter_export_rows
+    response = StreamingHttpResponse(rows(queryset, file_format), content_type=EXPORT_CONTENT_TYPES[file_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
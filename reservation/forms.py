@@ -1,7 +1,13 @@
 from django import forms
 from django.forms import ModelForm
+from django.utils import timezone
 
-from reservation.models import Reservation, Restaurant
+from config.routers import get_current_restaurant
+from reservation.models import Reservation, Restaurant, Table, WaitlistEntry
+from reservation.services import weekly_recurrence
+
+# Наибольшее число бронирований в одном пакете (столики x недели)
+MAX_BATCH_RESERVATIONS = 1000
 
 
 class StyleFormMixin:
@@ -26,7 +32,7 @@ class ReservationForm(ModelForm):
         """Стилизация формы бронирования столика."""
 
         model = Reservation
-        fields = ["owner", "table", "reserved_at", "customer_name", "customer_contact"]
+        fields = ["owner", "guests", "table", "reserved_at", "customer_name", "customer_contact"]
         widgets = {
             'owner': forms.HiddenInput(),
             "reserved_at": forms.DateTimeInput(
@@ -40,7 +46,14 @@ class ReservationForm(ModelForm):
 
     def __init__(self, *args, **kwargs):
         super(ReservationForm, self).__init__(*args, **kwargs)
+        # Столики ресторана бронирования, а для нового бронирования - текущего ресторана
+        restaurant_id = self.instance.restaurant_id or get_current_restaurant()
+        self.fields["table"].queryset = Table.objects.filter(restaurant_id=restaurant_id).order_by("number")
+        # Без выбранного столика он подбирается по количеству гостей
+        self.fields["table"].required = False
+        self.fields["table"].empty_label = "Подобрать автоматически"
         self.fields["table"].widget.attrs.update({"class": "form-control"})
+        self.fields["guests"].widget.attrs.update({"class": "form-control", "min": 1})
         self.fields["customer_name"].widget.attrs.update(
             {
                 "class": "form-control",
@@ -55,6 +68,17 @@ class ReservationForm(ModelForm):
         )
         self.fields["owner"].widget.attrs.update({"class": "form-control"})
 
+    def clean(self):
+        """Проверка, что выбранный вручную столик доступен и вмещает всех гостей."""
+        cleaned_data = super().clean()
+        table = cleaned_data.get("table")
+        guests = cleaned_data.get("guests")
+        if table and not table.is_available:
+            self.add_error("table", f"Столик №{table.number} сейчас недоступен для бронирования.")
+        elif table and guests and table.capacity < guests:
+            self.add_error("table", f"Столик №{table.number} вмещает не больше {table.capacity} гостей.")
+        return cleaned_data
+
     # Настройки для формы, если использовать форму отдельно
     # def clean(self):
     #     """Валидация формы, на проверку отсутствия брони выбранного столика."""
@@ -91,3 +115,80 @@ class ReservationForm(ModelForm):
     #     if commit:
     #         reservation.save()  # Сохраняем в БД
     #     return reservation
+
+
+class WaitlistForm(StyleFormMixin, ModelForm):
+    """Форма записи в лист ожидания."""
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ["guests", "desired_from", "desired_to", "customer_name", "customer_contact"]
+        widgets = {
+            "desired_from": forms.DateTimeInput(attrs={"type": "datetime-local"}),
+            "desired_to": forms.DateTimeInput(attrs={"type": "datetime-local"}),
+        }
+
+    def clean(self):
+        """Проверка, что окно ожидания задано верно и еще не прошло."""
+        cleaned_data = super().clean()
+        desired_from = cleaned_data.get("desired_from")
+        desired_to = cleaned_data.get("desired_to")
+        if desired_from and desired_to:
+            if desired_to < desired_from:
+                self.add_error("desired_to", "Время окончания ожидания не может быть раньше начала.")
+            elif desired_to <= timezone.now():
+                self.add_error("desired_to", "Время ожидания уже прошло.")
+        return cleaned_data
+
+
+class BatchReservationForm(StyleFormMixin, forms.Form):
+    """Форма пакетного бронирования: несколько столиков сразу и/или повтор каждую неделю."""
+
+    tables = forms.ModelMultipleChoiceField(queryset=Table.objects.none(), label="Столики")
+    reserved_at = forms.DateTimeField(
+        label="Дата и время первого бронирования",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}),
+    )
+    weeks = forms.IntegerField(
+        label="Количество недель",
+        help_text="1 - без повтора, 52 - каждую неделю в течение года",
+        min_value=1,
+        max_value=52,
+        initial=1,
+    )
+    customer_name = forms.CharField(max_length=100, label="Имя клиента")
+    customer_contact = forms.CharField(max_length=100, label="Контактная информация")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["tables"].queryset = Table.objects.filter(
+            restaurant_id=get_current_restaurant(), is_available=True
+        ).order_by("number")
+
+    def clean(self):
+        """Проверка, что бронирование не в прошлом и пакет не слишком большой."""
+        cleaned_data = super().clean()
+        reserved_at = cleaned_data.get("reserved_at")
+        tables = cleaned_data.get("tables")
+        weeks = cleaned_data.get("weeks")
+        if reserved_at and reserved_at < timezone.now():
+            self.add_error("reserved_at", "Дата бронирования не может быть в прошлом.")
+        if tables and weeks and len(tables) * weeks > MAX_BATCH_RESERVATIONS:
+            raise forms.ValidationError(f"В одном пакете не больше {MAX_BATCH_RESERVATIONS} бронирований.")
+        return cleaned_data
+
+    def get_reservations(self, owner):
+        """Бронирования пакета: каждый выбранный столик на каждую неделю, гостей по вместимости столика."""
+        return [
+            Reservation(
+                restaurant_id=table.restaurant_id,
+                table=table,
+                reserved_at=reserved_at,
+                guests=table.capacity,
+                customer_name=self.cleaned_data["customer_name"],
+                customer_contact=self.cleaned_data["customer_contact"],
+                owner=owner,
+            )
+            for reserved_at in weekly_recurrence(self.cleaned_data["reserved_at"], self.cleaned_data["weeks"])
+            for table in self.cleaned_data["tables"]
+        ]
@@ -0,0 +1,115 @@
+import json
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Ширины уменьшенных копий; копии не бывают шире исходного изображения
+VARIANT_WIDTHS = (400, 800, 1200)
+
+# Форматы копий: расширение файла, формат Pillow и параметры сохранения
+VARIANT_FORMATS = {
+    "webp": ("webp", "WEBP", {"quality": 75, "method": 6}),
+    "jpeg": ("jpg", "JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+# Каталог копий внутри MEDIA_ROOT
+VARIANTS_DIR = "variants"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def manifest_name(path):
+    """Файл со списком копий изображения path."""
+    return f"{VARIANTS_DIR}/{os.path.splitext(path)[0]}.json"
+
+
+def variant_name(path, width, variant_format):
+    """Файл копии изображения path шириной width в формате variant_format."""
+    extension = VARIANT_FORMATS[variant_format][0]
+    return f"{VARIANTS_DIR}/{os.path.splitext(path)[0]}-{width}w.{extension}"
+
+
+def get_manifest(path, storage=default_storage):
+    """Список копий изображения path или None, если копии еще не созданы."""
+    try:
+        with storage.open(manifest_name(path)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=1024)
+def read_manifest(name, modified_time):
+    """Список копий из файла name, измененного в modified_time; кэшируется, пока файл не изменится."""
+    with default_storage.open(name) as file:
+        return json.load(file)
+
+
+def get_cached_manifest(path):
+    """Список копий изображения path из default_storage или None, если копии еще не созданы.
+
+    Файл манифеста читается один раз на процесс и перечитывается после изменения, поэтому
+    теги шаблонов на каждой странице проверяют только время изменения файла.
+    """
+    name = manifest_name(path)
+    try:
+        return read_manifest(name, default_storage.get_modified_time(name))
+    except (OSError, ValueError):
+        return None
+
+
+def is_up_to_date(path, storage=default_storage):
+    """Проверка, что копии изображения созданы после последнего изменения исходного файла."""
+    name = manifest_name(path)
+    return storage.exists(name) and storage.get_modified_time(name) >= storage.get_modified_time(path)
+
+
+def generate_variants(path, storage=default_storage, force=False):
+    """Создание уменьшенных и пережатых копий изображения path в форматах VARIANT_FORMATS.
+
+    Рядом с копиями сохраняется манифест с размерами исходного изображения и
+    именами копий, по нему тег media_image строит srcset. Возвращает манифест.
+    """
+    if not force and is_up_to_date(path, storage):
+        return get_manifest(path, storage)
+
+    with storage.open(path) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    manifest = {"width": image.width, "height": image.height, "variants": {}}
+    for width in sorted({min(width, image.width) for width in VARIANT_WIDTHS}):
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS) if width < image.width else image
+        for variant_format, (_, pillow_format, params) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, **params)
+            name = variant_name(path, width, variant_format)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            manifest["variants"].setdefault(variant_format, []).append([name, width])
+
+    name = manifest_name(path)
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(json.dumps(manifest).encode()))
+    return manifest
+
+
+def find_images(storage=default_storage, directory=""):
+    """Пути всех изображений в storage, кроме уже созданных копий."""
+    directories, files = storage.listdir(directory)
+    for name in files:
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.join(directory, name) if directory else name
+    for subdirectory in directories:
+        if not directory and subdirectory == VARIANTS_DIR:
+            continue
+        yield from find_images(storage, os.path.join(directory, subdirectory) if directory else subdirectory)
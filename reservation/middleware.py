@@ -0,0 +1,254 @@
+import os
+import random
+from contextlib import closing
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.static import serve
+
+from config.routers import schedule_replica_lag_check, use_replicas, use_restaurant
+from reservation.query_budget import QueryRecorder, get_view_budget
+from reservation.restaurants import RESTAURANT_PARAM, aget_restaurant_ids, select_restaurant
+
+
+class QueryBudgetMiddleware:
+    """Учет запросов к БД на каждый HTTP-запрос и проверка бюджета представления.
+
+    Бюджет задается атрибутом query_budget у класса представления. При превышении
+    пишется предупреждение в журнал, а при QUERY_BUDGET_STRICT = True выбрасывается
+    QueryBudgetExceeded. В режиме DEBUG статистика добавляется в заголовок Server-Timing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        request.query_budget = None
+        with recorder.record():
+            response = self.get_response(request)
+        return self.process_recorded(request, response, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        request.query_budget = None
+        with recorder.record():
+            response = await self.get_response(request)
+        return self.process_recorded(request, response, recorder)
+
+    def process_recorded(self, request, response, recorder):
+        """Проверка бюджета и заголовок Server-Timing по записанным запросам."""
+        recorder.check(
+            request.query_budget,
+            label=f"{request.method} {request.path}",
+            strict=getattr(settings, "QUERY_BUDGET_STRICT", False),
+        )
+        if settings.DEBUG:
+            response["Server-Timing"] = f'db;dur={recorder.total_time * 1000:.1f};desc="{recorder.count} queries"'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Сохранение бюджета вызываемого представления."""
+        request.query_budget = get_view_budget(view_func)
+
+
+class RestaurantMiddleware:
+    """Выбор ресторана запроса: данные ресторана читаются и записываются в его БД.
+
+    Ресторан выбирается параметром ?restaurant=<id> и запоминается в cookie, без
+    выбора используется ресторан по умолчанию. Сессия не читается, поэтому выбор
+    ресторана не мешает кэшированию страниц анонимных посетителей.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_restaurant(self.get_restaurant(request)):
+            response = self.get_response(request)
+        return self.remember_restaurant(request, response)
+
+    async def __acall__(self, request):
+        with use_restaurant(self.get_restaurant(request, await aget_restaurant_ids())):
+            response = await self.get_response(request)
+        return self.remember_restaurant(request, response)
+
+    def get_restaurant(self, request, ids=None):
+        """id ресторана из параметра запроса или cookie; сохраняется в request.restaurant_id."""
+        request.restaurant_id = select_restaurant(
+            request.GET.get(RESTAURANT_PARAM) or request.COOKIES.get(RESTAURANT_PARAM), ids
+        )
+        return request.restaurant_id
+
+    def remember_restaurant(self, request, response):
+        """Cookie с рестораном, выбранным параметром запроса."""
+        if RESTAURANT_PARAM in request.GET and request.COOKIES.get(RESTAURANT_PARAM) != str(request.restaurant_id):
+            response.set_cookie(RESTAURANT_PARAM, request.restaurant_id, max_age=365 * 24 * 3600, samesite="Lax")
+        return response
+
+
+class ReplicaMiddleware:
+    """Чтение с реплик для безопасных запросов и закрепление посетителя за основной БД после записи.
+
+    GET и HEAD читают с реплики (если она не отстает больше REPLICA_MAX_LAG), остальные
+    запросы работают с основной БД. После небезопасного запроса cookie на REPLICA_PIN_SECONDS
+    секунд направляет все запросы посетителя в основную БД, чтобы он сразу видел свои
+    бронирования. Отставание реплик проверяется в фоне, пока запросы читают с реплик.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # Cookie закрепления за основной БД
+    pin_cookie = "db-primary"
+    safe_methods = ("GET", "HEAD")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_replicas(self.get_seed(request)):
+            response = self.get_response(request)
+        return self.pin_primary(request, response)
+
+    async def __acall__(self, request):
+        with use_replicas(self.get_seed(request)):
+            response = await self.get_response(request)
+        return self.pin_primary(request, response)
+
+    def replica_allowed(self, request):
+        """Можно ли читать с реплики: реплики настроены, метод безопасный и посетитель недавно ничего не менял."""
+        return (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in self.safe_methods
+            and self.pin_cookie not in request.COOKIES
+        )
+
+    def get_seed(self, request):
+        """Число, по которому выбирается реплика запроса, или None для чтения из основной БД."""
+        if not self.replica_allowed(request):
+            return None
+        schedule_replica_lag_check()
+        return random.random()
+
+    def pin_primary(self, request, response):
+        """Cookie закрепления за основной БД после запроса, который мог что-то изменить."""
+        if settings.DATABASE_REPLICAS and request.method not in self.safe_methods:
+            response.set_cookie(self.pin_cookie, "1", max_age=settings.REPLICA_PIN_SECONDS, samesite="Lax")
+        return response
+
+
+class PrecompressedStaticMiddleware:
+    """Раздача статики из STATIC_ROOT с заранее сжатыми копиями .br и .gz.
+
+    Копию выбирает заголовок Accept-Encoding. Файлы с хэшем содержимого в имени
+    кэшируются браузером на год и больше не запрашиваются, остальные - на STATIC_MAX_AGE.
+    Запросы, которые не относятся к собранной статике, передаются дальше.
+    """
+
+    encodings = ((".br", "br"), (".gz", "gzip"))
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = "/" + settings.STATIC_URL.lstrip("/")
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return (self.is_static_request(request) and self.serve_static(request)) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Проверка и чтение файла блокируют поток, поэтому выполняются вне цикла событий
+        if self.is_static_request(request):
+            response = await sync_to_async(self.serve_static, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def is_static_request(self, request):
+        """Запрос файла статики, который может быть в STATIC_ROOT (без обращения к диску)."""
+        return (
+            request.method in ("GET", "HEAD") and request.path.startswith(self.prefix) and bool(settings.STATIC_ROOT)
+        )
+
+    def serve_static(self, request):
+        """Ответ с файлом статики или None, если такого файла нет в собранной статике.
+
+        Файл и условные запросы (If-Modified-Since) обрабатывает django.views.static.serve.
+        """
+        name = request.path[len(self.prefix) :]
+        try:
+            if not os.path.isfile(safe_join(settings.STATIC_ROOT, name)):
+                return None
+        except SuspiciousFileOperation:  # путь за пределами STATIC_ROOT
+            return None
+
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        served = name
+        for extension, encoding in self.encodings:
+            is_accepted = accepted.get(encoding, accepted.get("*", 0)) > 0
+            if is_accepted and os.path.isfile(safe_join(settings.STATIC_ROOT, name + extension)):
+                served = name + extension
+                break
+
+        # Тип содержимого и Content-Encoding serve определяет по имени: app.css.br - text/css, br
+        response = serve(request, served, document_root=settings.STATIC_ROOT)
+        if response.streaming:
+            # Файлы статики небольшие и читаются целиком: потоковый ответ под ASGI
+            # пришлось бы итерировать в цикле событий
+            with closing(response):
+                content = b"".join(response.streaming_content)
+            del response["Content-Disposition"]
+            response = HttpResponse(content, headers=dict(response.items()))
+        is_hashed = getattr(staticfiles_storage, "is_hashed", None)
+        if is_hashed is not None and is_hashed(name):
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = f"public, max-age={settings.STATIC_MAX_AGE}"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+
+def accepted_encodings(header):
+    """Кодировки из заголовка Accept-Encoding с их весами q; q=0 означает, что кодировка не принимается."""
+    weights = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    return weights
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:00
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import reservation.models
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+def remove_overlapping_reservations(apps, schema_editor):
+    """Удаление бронирований, пересекающихся с более ранними на том же столике.
+
+    До появления ограничения-исключения одна и та же часть времени могла быть забронирована
+    дважды; с такими строками ограничение не создать. Из пересекающихся остается более раннее
+    бронирование (при равном начале - созданное первым), более поздние удаляются.
+    """
+    using = schema_editor.connection.alias
+    Reservation = apps.get_model("reservation", "Reservation")
+    overlapping = []
+    last_table_id = last_ends_at = None
+    reservations = Reservation.objects.using(using).order_by("table_id", "reserved_at", "pk")
+    for pk, table_id, reserved_at, ends_at in reservations.values_list("pk", "table_id", "reserved_at", "ends_at"):
+        if table_id == last_table_id and reserved_at < last_ends_at:
+            overlapping.append(pk)
+            continue
+        last_table_id, last_ends_at = table_id, ends_at
+    Reservation.objects.using(using).filter(pk__in=overlapping).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0002_initial"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name="reservation",
+            name="ends_at",
+            field=models.DateTimeField(editable=False, null=True, verbose_name="Окончание бронирования"),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE reservation_reservation SET ends_at = reserved_at + interval '60 minutes';",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="reservation",
+            name="ends_at",
+            field=models.DateTimeField(editable=False, verbose_name="Окончание бронирования"),
+        ),
+        migrations.RunPython(remove_overlapping_reservations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="reservation",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                expressions=[
+                    ("table", "="),
+                    (
+                        reservation.models.TsTzRange(
+                            "reserved_at",
+                            "ends_at",
+                            django.contrib.postgres.fields.ranges.RangeBoundary(),
+                        ),
+                        "&&",
+                    ),
+                ],
+                name="reservation_table_period_excl",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:24
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import reservation.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0003_reservation_ends_at_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="reservation",
+            name="reservation_table_period_excl",
+        ),
+        migrations.AddConstraint(
+            model_name="reservation",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                expressions=[
+                    (
+                        reservation.models.TsTzRange(
+                            "reserved_at", "ends_at", django.contrib.postgres.fields.ranges.RangeBoundary()
+                        ),
+                        "&&",
+                    ),
+                    ("table", "="),
+                ],
+                name="reservation_period_table_excl",
+            ),
+        ),
+    ]
@@ -0,0 +1,127 @@
+from django.db import migrations
+from django.utils import timezone
+
+from reservation.partitions import (
+    EXCLUSION_SQL,
+    PARENT_TABLE,
+    PARTITION_MONTHS_AHEAD,
+    add_months,
+    create_default_partition,
+    create_partition,
+    month_start,
+)
+
+COLUMNS = "id, reserved_at, customer_name, customer_contact, owner_id, table_id, ends_at"
+OLD_TABLE = f"{PARENT_TABLE}_unpartitioned"
+SEQUENCE = f"{PARENT_TABLE}_id_seq"
+
+# Индексы и внешние ключи, общие для обычной и секционированной таблицы
+INDEXES_SQL = f"""
+    CREATE INDEX reservation_period_idx ON {PARENT_TABLE} (reserved_at, id);
+    CREATE INDEX reservation_table_period_idx ON {PARENT_TABLE} (table_id, reserved_at);
+    CREATE INDEX reservation_owner_period_idx ON {PARENT_TABLE} (owner_id, reserved_at, id)
+        WHERE owner_id IS NOT NULL;
+    ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT reservation_reservat_table_id_6f8891b8_fk_reservati
+        FOREIGN KEY (table_id) REFERENCES reservation_table (id) DEFERRABLE INITIALLY DEFERRED;
+    ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT reservation_reservation_owner_id_8a9827ee_fk_users_user_id
+        FOREIGN KEY (owner_id) REFERENCES users_user (id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+
+def get_last_id(cursor):
+    """Последнее выданное значение id бронирования."""
+    cursor.execute(f"SELECT last_value, is_called FROM {SEQUENCE}")
+    last_value, is_called = cursor.fetchone()
+    cursor.execute(f"SELECT max(id) FROM {OLD_TABLE}")
+    (max_id,) = cursor.fetchone()
+    return max(last_value if is_called else 0, max_id or 0)
+
+
+def partition_reservations(apps, schema_editor):
+    """Перенос бронирований в таблицу, секционированную по месяцам reserved_at.
+
+    Первичный ключ секционированной таблицы обязан содержать ключ секционирования,
+    поэтому он становится (id, reserved_at), а уникальность id обеспечивает
+    последовательность. Identity-столбцы у секционированных таблиц появились
+    только в PostgreSQL 17, поэтому id получает значение по умолчанию из последовательности.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {OLD_TABLE}")
+        last_id = get_last_id(cursor)
+        cursor.execute(f"ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP IDENTITY")
+        cursor.execute(f"CREATE SEQUENCE {SEQUENCE}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {PARENT_TABLE} (
+                id bigint NOT NULL DEFAULT nextval('{SEQUENCE}'),
+                reserved_at timestamp with time zone NOT NULL,
+                customer_name varchar(100) NOT NULL,
+                customer_contact varchar(100) NOT NULL,
+                owner_id bigint NULL,
+                table_id bigint NOT NULL,
+                ends_at timestamp with time zone NOT NULL
+            ) PARTITION BY RANGE (reserved_at)
+            """
+        )
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {PARENT_TABLE}.id")
+        if last_id:
+            cursor.execute("SELECT setval(%s, %s)", [SEQUENCE, last_id])
+        create_default_partition(cursor)
+
+        # Секции для всех месяцев с бронированиями и на PARTITION_MONTHS_AHEAD месяцев вперед
+        cursor.execute(f"SELECT min(reserved_at) FROM {OLD_TABLE}")
+        (first,) = cursor.fetchone()
+        current = month_start(timezone.localdate())
+        month = month_start(timezone.localtime(first)) if first else current
+        while month <= add_months(current, PARTITION_MONTHS_AHEAD):
+            create_partition(month, using=schema_editor.connection.alias)
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {PARENT_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {OLD_TABLE}")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey PRIMARY KEY (id, reserved_at)")
+        cursor.execute(INDEXES_SQL)
+
+
+def unpartition_reservations(apps, schema_editor):
+    """Возврат бронирований в обычную таблицу с ограничением-исключением."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {OLD_TABLE}")
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {OLD_TABLE}")
+        (last_id,) = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE {SEQUENCE}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {PARENT_TABLE} (
+                id bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+                reserved_at timestamp with time zone NOT NULL,
+                customer_name varchar(100) NOT NULL,
+                customer_contact varchar(100) NOT NULL,
+                owner_id bigint NULL,
+                table_id bigint NOT NULL,
+                ends_at timestamp with time zone NOT NULL
+            )
+            """
+        )
+        cursor.execute(f"INSERT INTO {PARENT_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {OLD_TABLE}")
+        if last_id:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), %s)", [last_id])
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey PRIMARY KEY (id)")
+        cursor.execute(INDEXES_SQL)
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT reservation_period_table_excl {EXCLUSION_SQL}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0005_alter_reservation_owner_alter_reservation_table_and_more"),
+        ("users", "0003_alter_user_token"),
+    ]
+
+    operations = [
+        # Состояние моделей не меняется: ограничение-исключение модели остается
+        # для проверки форм, а в базе оно создается в каждой секции
+        migrations.RunPython(partition_reservations, unpartition_reservations),
+    ]
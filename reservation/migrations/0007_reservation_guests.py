@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:08
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0006_partition_reservation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="guests",
+            field=models.PositiveSmallIntegerField(
+                default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name="Количество гостей"
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:10
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.core.validators
+import django.db.models.deletion
+import reservation.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0007_reservation_guests"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WaitlistEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "guests",
+                    models.PositiveSmallIntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)], verbose_name="Количество гостей"
+                    ),
+                ),
+                ("desired_from", models.DateTimeField(verbose_name="Начало не раньше")),
+                ("desired_to", models.DateTimeField(verbose_name="Начало не позже")),
+                ("customer_name", models.CharField(max_length=100, verbose_name="Имя клиента")),
+                ("customer_contact", models.CharField(max_length=100, verbose_name="Контактная информация")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("waiting", "Ожидает"), ("notified", "Предложен столик"), ("cancelled", "Отменено")],
+                        default="waiting",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Создано")),
+                ("offered_at", models.DateTimeField(blank=True, null=True, verbose_name="Предложенное время")),
+                ("notified_at", models.DateTimeField(blank=True, null=True, verbose_name="Уведомлен")),
+                (
+                    "offered_table",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="reservation.table",
+                        verbose_name="Предложенный столик",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Запись в листе ожидания",
+                "verbose_name_plural": "Лист ожидания",
+                "ordering": ["created_at"],
+                "indexes": [
+                    django.contrib.postgres.indexes.GistIndex(
+                        reservation.models.TsTzRange(
+                            "desired_from",
+                            "desired_to",
+                            django.contrib.postgres.fields.ranges.RangeBoundary(
+                                inclusive_lower=True, inclusive_upper=True
+                            ),
+                        ),
+                        models.F("guests"),
+                        condition=models.Q(("status", "waiting")),
+                        name="waitlist_window_guests_idx",
+                    )
+                ],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(("desired_to__gte", models.F("desired_from"))), name="waitlist_window_order"
+                    )
+                ],
+            },
+        ),
+    ]
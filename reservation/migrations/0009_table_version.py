@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0008_waitlistentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="table",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Версия"),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0009_table_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccupancyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("hour", models.DateTimeField(verbose_name="Час")),
+                ("week_hour", models.PositiveSmallIntegerField(verbose_name="Час недели")),
+                ("booked_minutes", models.IntegerField(default=0, verbose_name="Занято минут")),
+                ("guest_minutes", models.IntegerField(default=0, verbose_name="Гостеминут")),
+                ("reservations", models.IntegerField(default=0, verbose_name="Начато бронирований")),
+                (
+                    "table",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="reservation.table",
+                        verbose_name="Столик",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Занятость за час",
+                "verbose_name_plural": "Отчет о занятости",
+                "indexes": [models.Index(fields=["hour"], name="occupancy_rollup_hour_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("table", "hour"), name="occupancy_rollup_table_hour_uniq")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,177 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:26
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import reservation.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_restaurant(apps, schema_editor):
+    """Существующие столики, бронирования и лист ожидания относятся к первому ресторану.
+
+    До появления нескольких ресторанов все данные принадлежали одному; если ресторана
+    еще нет, он создается.
+    """
+    using = schema_editor.connection.alias
+    Restaurant = apps.get_model("reservation", "Restaurant")
+    models_to_update = [
+        apps.get_model("reservation", name) for name in ("Table", "Reservation", "WaitlistEntry", "OccupancyRollup")
+    ]
+    if not any(model.objects.using(using).exists() for model in models_to_update):
+        return
+    restaurant = Restaurant.objects.using(using).order_by("pk").first()
+    if restaurant is None:
+        restaurant = Restaurant.objects.using(using).create(name="НеРесторан", description="")
+    for model in models_to_update:
+        model.objects.using(using).filter(restaurant__isnull=True).update(restaurant=restaurant)
+    # Отложенные проверки внешних ключей выполняются сразу, иначе следующие ALTER TABLE в транзакции невозможны
+    schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0010_occupancyrollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="occupancyrollup",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AddField(
+            model_name="table",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tables",
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AddField(
+            model_name="waitlistentry",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.RunPython(assign_restaurant, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="occupancyrollup",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="reservation",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="table",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tables",
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="waitlistentry",
+            name="restaurant",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="reservation.restaurant",
+                verbose_name="Ресторан",
+            ),
+        ),
+        migrations.AlterModelOptions(
+            name="table",
+            options={"verbose_name": "Столик", "verbose_name_plural": "Столики"},
+        ),
+        migrations.RemoveIndex(
+            model_name="occupancyrollup",
+            name="occupancy_rollup_hour_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="reservation",
+            name="reservation_period_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="waitlistentry",
+            name="waitlist_window_guests_idx",
+        ),
+        migrations.AlterField(
+            model_name="table",
+            name="number",
+            field=models.IntegerField(verbose_name="Номер стола"),
+        ),
+        migrations.AddIndex(
+            model_name="occupancyrollup",
+            index=models.Index(fields=["restaurant", "hour"], name="occupancy_restaurant_hour_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["restaurant", "reserved_at", "id"], name="reservation_venue_period_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="waitlistentry",
+            index=django.contrib.postgres.indexes.GistIndex(
+                models.F("restaurant"),
+                reservation.models.TsTzRange(
+                    "desired_from",
+                    "desired_to",
+                    django.contrib.postgres.fields.ranges.RangeBoundary(inclusive_lower=True, inclusive_upper=True),
+                ),
+                models.F("guests"),
+                condition=models.Q(("status", "waiting")),
+                name="waitlist_restaurant_window_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="table",
+            constraint=models.UniqueConstraint(fields=("restaurant", "number"), name="table_restaurant_number_uniq"),
+        ),
+    ]
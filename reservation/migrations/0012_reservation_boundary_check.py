@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations
+
+from reservation.models import RESERVATION_DURATION
+from reservation.partitions import create_boundary_check, drop_boundary_check
+
+
+def add_boundary_check(apps, schema_editor):
+    """Проверка пересечений бронирований из соседних месячных секций."""
+    with schema_editor.connection.cursor() as cursor:
+        create_boundary_check(cursor, settings.TIME_ZONE, RESERVATION_DURATION)
+
+
+def remove_boundary_check(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        drop_boundary_check(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservation", "0011_restaurant_scope"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_boundary_check, remove_boundary_check),
+    ]
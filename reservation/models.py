@@ -1,9 +1,25 @@
+from datetime import timedelta
+
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
+from django.core.validators import MinValueValidator
 from django.db import models
 
 from users.models import User
 
 NULLABLE = {"blank": True, "null": True}
 
+# Продолжительность одного бронирования столика
+RESERVATION_DURATION = timedelta(minutes=60)
+
+
+class TsTzRange(models.Func):
+    """Интервал времени бронирования в виде tstzrange."""
+
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
 
 class Restaurant(models.Model):
     """Модель ресторана."""
@@ -43,9 +59,15 @@ class Restaurant(models.Model):
 class Table(models.Model):
     """Модель стола."""
 
-    number = models.IntegerField(unique=True, verbose_name="Номер стола")
+    # Отдельный индекс не нужен: его заменяет уникальный индекс (restaurant, number)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, related_name="tables", verbose_name="Ресторан", db_index=False
+    )
+    number = models.IntegerField(verbose_name="Номер стола")
     capacity = models.IntegerField(verbose_name="Вместимость столика")
     is_available = models.BooleanField(default=True, verbose_name="Доступность столика")
+    # Увеличивается при каждом изменении столика или его бронирований, из нее строятся ETag ответов API
+    version = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Версия")
     owner = models.ForeignKey(
         User,
         verbose_name="Владелец",
@@ -58,28 +80,195 @@ class Table(models.Model):
     def __str__(self):
         return f"№ {self.number} (Вместимость: {self.capacity})"
 
+    class Meta:
+        verbose_name = "Столик"
+        verbose_name_plural = "Столики"
+        constraints = [
+            # Номера столиков повторяются в разных ресторанах
+            models.UniqueConstraint(fields=["restaurant", "number"], name="table_restaurant_number_uniq"),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Сохранение столика без поля version.
+
+        Версию увеличивает только touch_tables атомарным UPDATE, иначе сохранение
+        устаревшего объекта вернуло бы версию назад и ETag повторился бы.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != "version"
+            ]
+        super().save(*args, **kwargs)
+
 
 class Reservation(models.Model):
     """Модель бронирования."""
 
-    table = models.ForeignKey(Table, on_delete=models.CASCADE, verbose_name="Номер столика")
+    # Отдельные индексы внешних ключей не нужны: их заменяют составные индексы в Meta
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, verbose_name="Номер столика", db_index=False)
+    # Ресторан столика: списки бронирований ресторана читаются по индексу без соединения со столиками
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, verbose_name="Ресторан", db_index=False, editable=False
+    )
     reserved_at = models.DateTimeField(verbose_name="Дата бронирования")
+    ends_at = models.DateTimeField(verbose_name="Окончание бронирования", editable=False)
     customer_name = models.CharField(max_length=100, verbose_name="Имя клиента")
     customer_contact = models.CharField(max_length=100, verbose_name="Контактная информация")
+    guests = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        verbose_name="Количество гостей",
+    )
     owner = models.ForeignKey(
         User,
         verbose_name="Пользователь",
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_index=False,
     )
 
     def __str__(self):
         return f"Зарезервировано для {self.customer_name} в {self.reserved_at} столик {self.table}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Загрузка из БД с запоминанием столика, времени и количества гостей бронирования.
+
+        После изменения бронирования прежний слот предлагается листу ожидания,
+        а из почасовой занятости вычитаются прежние значения.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_slot = (instance.__dict__.get("table_id"), instance.__dict__.get("reserved_at"))
+        instance._loaded_guests = instance.__dict__.get("guests")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Сохранение бронирования с расчетом времени окончания и ресторана столика."""
+        if self.reserved_at:
+            self.ends_at = self.reserved_at + RESERVATION_DURATION
+        if self.table_id is not None and (self.restaurant_id is None or Reservation.table.is_cached(self)):
+            self.restaurant_id = self.table.restaurant_id
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "reserved_at" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "ends_at"}
+        if update_fields is not None and "table" in update_fields:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "restaurant"}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Бронирование"
         verbose_name_plural = "Бронирования"
         ordering = [
             "reserved_at",
         ]
+        indexes = [
+            # Список бронирований ресторана и пагинация по ключу (reserved_at, id)
+            models.Index(fields=["restaurant", "reserved_at", "id"], name="reservation_venue_period_idx"),
+            # Бронирования столика по времени и удаление столика
+            models.Index(fields=["table", "reserved_at"], name="reservation_table_period_idx"),
+            # Личный кабинет. Индекс только по предстоящим бронированиям невозможен:
+            # условие частичного индекса не может содержать now(), поэтому в индекс
+            # не попадают бронирования без владельца (импорт, ручные записи)
+            models.Index(
+                fields=["owner", "reserved_at", "id"],
+                name="reservation_owner_period_idx",
+                condition=models.Q(owner__isnull=False),
+            ),
+        ]
+        constraints = [
+            # Один столик не может быть забронирован на пересекающиеся интервалы
+            ExclusionConstraint(
+                name="reservation_period_table_excl",
+                # Интервал первым столбцом индекса: по номеру столика с его малым
+                # числом значений GiST-индекс делится плохо
+                expressions=[
+                    (TsTzRange("reserved_at", "ends_at", RangeBoundary()), RangeOperators.OVERLAPS),
+                    ("table", RangeOperators.EQUAL),
+                ],
+            ),
+        ]
+
+
+class WaitlistEntry(models.Model):
+    """Гость в листе ожидания: ждет освобождения столика на guests гостей с началом от desired_from до desired_to."""
+
+    STATUS_WAITING = "waiting"
+    STATUS_NOTIFIED = "notified"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (STATUS_WAITING, "Ожидает"),
+        (STATUS_NOTIFIED, "Предложен столик"),
+        (STATUS_CANCELLED, "Отменено"),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, verbose_name="Ресторан", db_index=False)
+    guests = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)], verbose_name="Количество гостей")
+    desired_from = models.DateTimeField(verbose_name="Начало не раньше")
+    desired_to = models.DateTimeField(verbose_name="Начало не позже")
+    customer_name = models.CharField(max_length=100, verbose_name="Имя клиента")
+    customer_contact = models.CharField(max_length=100, verbose_name="Контактная информация")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_WAITING, verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    offered_table = models.ForeignKey(
+        Table,
+        on_delete=models.SET_NULL,
+        verbose_name="Предложенный столик",
+        related_name="+",
+        **NULLABLE,
+    )
+    offered_at = models.DateTimeField(verbose_name="Предложенное время", **NULLABLE)
+    notified_at = models.DateTimeField(verbose_name="Уведомлен", **NULLABLE)
+
+    def __str__(self):
+        return f"{self.customer_name}: {self.guests} гостей, {self.desired_from} - {self.desired_to}"
+
+    class Meta:
+        verbose_name = "Запись в листе ожидания"
+        verbose_name_plural = "Лист ожидания"
+        ordering = ["created_at"]
+        indexes = [
+            # Поиск ожидающих в ресторане по освободившемуся времени и вместимости столика
+            GistIndex(
+                models.F("restaurant"),
+                TsTzRange("desired_from", "desired_to", RangeBoundary(inclusive_lower=True, inclusive_upper=True)),
+                models.F("guests"),
+                name="waitlist_restaurant_window_idx",
+                condition=models.Q(status="waiting"),
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(desired_to__gte=models.F("desired_from")),
+                name="waitlist_window_order",
+            ),
+        ]
+
+
+class OccupancyRollup(models.Model):
+    """Почасовая занятость столика: обновляется при каждом изменении бронирований, по ней строятся отчеты."""
+
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, verbose_name="Ресторан", db_index=False)
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, verbose_name="Столик", db_index=False)
+    hour = models.DateTimeField(verbose_name="Час")
+    # День недели и час по часовому поясу проекта (0 - понедельник с 0 до 1 часа): отчеты
+    # группируют по готовому числу, а не переводят каждую строку в местное время
+    week_hour = models.PositiveSmallIntegerField(verbose_name="Час недели")
+    booked_minutes = models.IntegerField(default=0, verbose_name="Занято минут")
+    guest_minutes = models.IntegerField(default=0, verbose_name="Гостеминут")
+    reservations = models.IntegerField(default=0, verbose_name="Начато бронирований")
+
+    def __str__(self):
+        return f"{self.table_id} {self.hour}: {self.booked_minutes} мин"
+
+    class Meta:
+        verbose_name = "Занятость за час"
+        verbose_name_plural = "Отчет о занятости"
+        constraints = [
+            models.UniqueConstraint(fields=["table", "hour"], name="occupancy_rollup_table_hour_uniq"),
+        ]
+        indexes = [
+            # Отчеты выбирают строки ресторана за период по всем его столикам
+            models.Index(fields=["restaurant", "hour"], name="occupancy_restaurant_hour_idx"),
+        ]
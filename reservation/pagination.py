@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(reservation):
+    """Курсор страницы: время бронирования в микросекундах и id последней записи (объекта или словаря values())."""
+    if isinstance(reservation, dict):
+        reserved_at, pk = reservation["reserved_at"], reservation["id"]
+    else:
+        reserved_at, pk = reservation.reserved_at, reservation.pk
+    timestamp = (reserved_at - EPOCH) // MICROSECOND
+    return f"{timestamp}_{pk}"
+
+
+def decode_cursor(cursor):
+    """Разбор курсора, возвращает (reserved_at, id) или None для некорректного значения."""
+    try:
+        timestamp, pk = cursor.split("_")
+        reserved_at = EPOCH + int(timestamp) * MICROSECOND
+        return reserved_at, int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class KeysetPaginationMixin:
+    """Постраничный вывод бронирований по ключу (reserved_at, id) без OFFSET.
+
+    Страница выбирается условием по ключу последней записи предыдущей страницы,
+    поэтому время ответа не зависит от количества бронирований в таблице.
+    """
+
+    keyset_page_size = 20
+    cursor_param = "after"
+    descending = False
+
+    def get_keyset_ordering(self):
+        """Сортировка по ключу пагинации."""
+        if self.descending:
+            return ["-reserved_at", "-id"]
+        return ["reserved_at", "id"]
+
+    def paginate_keyset(self, queryset):
+        """Ограничение набора данных записями после курсора из запроса."""
+        queryset = queryset.order_by(*self.get_keyset_ordering())
+        key = decode_cursor(self.request.GET.get(self.cursor_param))
+        if key is None:
+            return queryset
+        reserved_at, pk = key
+        if self.descending:
+            return queryset.filter(Q(reserved_at__lt=reserved_at) | Q(reserved_at=reserved_at, id__lt=pk))
+        return queryset.filter(Q(reserved_at__gt=reserved_at) | Q(reserved_at=reserved_at, id__gt=pk))
+
+    def get_keyset_context(self, rows):
+        """Контекст страницы по первым keyset_page_size + 1 записям после курсора."""
+        has_next = len(rows) > self.keyset_page_size
+        page = rows[: self.keyset_page_size]
+        return {
+            "object_list": page,
+            "next_cursor": encode_cursor(page[-1]) if has_next else None,
+            "is_first_page": self.cursor_param not in self.request.GET,
+        }
+
+    async def aget_keyset_page(self, queryset):
+        """Асинхронная выборка одной страницы записей и курсора следующей страницы."""
+        rows = [row async for row in queryset[: self.keyset_page_size + 1]]
+        return self.get_keyset_context(rows)
@@ -0,0 +1,194 @@
+import re
+from datetime import date, datetime
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+# Таблица бронирований секционирована по месяцам reserved_at
+PARENT_TABLE = "reservation_reservation"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+# На сколько месяцев вперед создаются секции
+PARTITION_MONTHS_AHEAD = 3
+
+# Схема, в которую переносятся отключенные старые секции
+ARCHIVE_SCHEMA = "reservation_archive"
+
+# Ограничение-исключение секции: то же выражение, что у ограничения модели Reservation.
+# На секционированной таблице такое ограничение невозможно, поэтому оно создается в каждой секции
+# и не видит бронирований соседних секций (см. BOUNDARY_CHECK_SQL)
+EXCLUSION_SQL = "EXCLUDE USING gist (tstzrange(reserved_at, ends_at, '[)') WITH &&, table_id WITH =)"
+
+# Триггер проверки пересечений через границу месяца: бронирование, которое заканчивается в следующем
+# месяце или начинается в первые duration нового месяца, может пересечься с бронированием соседней секции.
+# Для таких бронирований строка столика блокируется, как в book_table, и пересечения ищутся по всей
+# таблице; ошибка имеет тот же код, что и у ограничения-исключения. Аргументы триггера - часовой пояс
+# границ секций и наибольшая продолжительность бронирования. Триггер секционированной таблицы
+# копируется во все ее секции, в том числе создаваемые позже
+BOUNDARY_CHECK_FUNCTION = "reservation_boundary_check"
+BOUNDARY_CHECK_SQL = f"""
+    CREATE OR REPLACE FUNCTION {BOUNDARY_CHECK_FUNCTION}() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        local_month timestamp := date_trunc('month', NEW.reserved_at AT TIME ZONE TG_ARGV[0]);
+        duration interval := TG_ARGV[1]::interval;
+    BEGIN
+        IF NEW.reserved_at < (local_month AT TIME ZONE TG_ARGV[0]) + duration
+            OR NEW.ends_at > ((local_month + interval '1 month') AT TIME ZONE TG_ARGV[0])
+        THEN
+            PERFORM 1 FROM reservation_table WHERE id = NEW.table_id FOR UPDATE;
+            IF EXISTS (
+                SELECT 1 FROM {PARENT_TABLE}
+                WHERE table_id = NEW.table_id
+                    AND id <> NEW.id
+                    AND tstzrange(reserved_at, ends_at, '[)') && tstzrange(NEW.reserved_at, NEW.ends_at, '[)')
+                    AND reserved_at > NEW.reserved_at - duration
+                    AND reserved_at < NEW.ends_at
+            ) THEN
+                RAISE EXCEPTION 'Бронирование столика % пересекается с бронированием соседней секции', NEW.table_id
+                    USING ERRCODE = 'exclusion_violation';
+            END IF;
+        END IF;
+        RETURN NEW;
+    END;
+    $$
+"""
+
+
+def month_start(value):
+    """Первое число месяца даты или момента времени value."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Первое число месяца, отстоящего от month на count месяцев."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Имя секции бронирований за месяц month."""
+    return f"{PARENT_TABLE}_p{month:%Y_%m}"
+
+
+def month_bound(month):
+    """Граница секции: полночь первого числа месяца в часовом поясе проекта."""
+    return timezone.make_aware(datetime(month.year, month.month, 1)).isoformat()
+
+
+def is_partitioned(using="default"):
+    """Проверка, что таблица бронирований уже секционирована."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [PARENT_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_partitions(using="default"):
+    """Месяцы, для которых есть секции, по возрастанию."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    return sorted(
+        date(int(match[1]), int(match[2]), 1) for match in map(PARTITION_NAME_RE.match, names) if match is not None
+    )
+
+
+def create_default_partition(cursor):
+    """Секция по умолчанию для бронирований за месяцы без своей секции."""
+    cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT")
+    cursor.execute(f"ALTER TABLE {DEFAULT_PARTITION} ADD CONSTRAINT {DEFAULT_PARTITION}_excl {EXCLUSION_SQL}")
+
+
+def create_partition(month, using="default"):
+    """Создание секции за месяц month.
+
+    Бронирования этого месяца, уже попавшие в секцию по умолчанию, переносятся
+    в новую секцию: иначе PostgreSQL не даст ее создать.
+    """
+    name = partition_name(month)
+    start, end = month_bound(month), month_bound(add_months(month, 1))
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE reserved_at >= %s AND reserved_at < %s)",
+            [start, end],
+        )
+        (in_default,) = cursor.fetchone()
+        if in_default:
+            cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bounds}")
+        # Ограничение создается до переноса строк: после вставки в транзакции остаются
+        # отложенные проверки внешних ключей, и ALTER TABLE секции становится невозможен
+        cursor.execute(f"ALTER TABLE {name} ADD CONSTRAINT {name}_excl {EXCLUSION_SQL}")
+        if in_default:
+            period = "reserved_at >= %s AND reserved_at < %s"
+            cursor.execute(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {period}", [start, end])
+            cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE {period}", [start, end])
+            cursor.execute(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    return name
+
+
+def ensure_partitions(first_month=None, months_ahead=PARTITION_MONTHS_AHEAD, using="default"):
+    """Создание недостающих секций с first_month (по умолчанию текущего) на months_ahead месяцев вперед.
+
+    Возвращает имена созданных секций.
+    """
+    existing = set(get_partitions(using))
+    month = first_month or month_start(timezone.localdate())
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(month, using))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_partition(month, drop=False, using="default"):
+    """Отключение секции за месяц month от таблицы бронирований.
+
+    Отключение меняет только метаданные и не удаляет строки по одной. Секция
+    переносится в схему ARCHIVE_SCHEMA или удаляется при drop. Внешние ключи
+    архивной секции удаляются, чтобы не мешать удалению столиков и пользователей.
+    """
+    name = partition_name(month)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
+            return name
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'", [name])
+        for (constraint,) in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        cursor.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+    return f"{ARCHIVE_SCHEMA}.{name}"
+
+
+def create_boundary_check(cursor, time_zone, duration):
+    """Создание триггера BOUNDARY_CHECK_SQL на таблице бронирований.
+
+    time_zone - часовой пояс границ секций, duration - наибольшая продолжительность бронирования.
+    """
+    cursor.execute(BOUNDARY_CHECK_SQL)
+    cursor.execute(
+        f"CREATE TRIGGER {BOUNDARY_CHECK_FUNCTION} BEFORE INSERT OR UPDATE OF reserved_at, ends_at, table_id "
+        f"ON {PARENT_TABLE} FOR EACH ROW EXECUTE FUNCTION {BOUNDARY_CHECK_FUNCTION}(%s, %s)",
+        [time_zone, f"{int(duration.total_seconds())} seconds"],
+    )
+
+
+def drop_boundary_check(cursor):
+    """Удаление триггера BOUNDARY_CHECK_SQL."""
+    cursor.execute(f"DROP TRIGGER IF EXISTS {BOUNDARY_CHECK_FUNCTION} ON {PARENT_TABLE}")
+    cursor.execute(f"DROP FUNCTION IF EXISTS {BOUNDARY_CHECK_FUNCTION}()")
+
+
+def create_partitions_after_migrate(sender, using="default", **kwargs):
+    """Обработчик post_migrate: секции на ближайшие месяцы после применения миграций."""
+    if connections[using].vendor == "postgresql" and is_partitioned(using):
+        ensure_partitions(using=using)
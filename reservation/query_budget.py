@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.urls import resolve
+
+logger = logging.getLogger("reservation.query_budget")
+
+
+class QueryBudgetExceeded(Exception):
+    """Количество запросов к БД превысило заявленный бюджет."""
+
+
+class QueryRecorder:
+    """Запись выполненных SQL-запросов и их длительности на всех подключениях к БД."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @contextmanager
+    def record(self):
+        """Запись запросов внутри блока with."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self):
+        """Количество выполненных запросов."""
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        """Суммарное время выполнения запросов в секундах."""
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """Повторяющиеся SQL-запросы (с точностью до параметров) и количество их выполнений."""
+        counter = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counter.most_common() if count > 1}
+
+    def summary(self, label):
+        """Краткое описание записанных запросов для журнала и сообщений об ошибках."""
+        text = f"{label}: {self.count} запросов к БД за {self.total_time * 1000:.1f} мс"
+        for sql, count in list(self.duplicates.items())[:3]:
+            text += f"\n  повторяется {count} раз: {sql[:200]}"
+        return text
+
+    def check(self, budget, label, strict=True):
+        """Проверка бюджета: исключение при strict, иначе предупреждение в журнал."""
+        if budget is None or self.count <= budget:
+            return True
+        message = f"Превышен бюджет {budget}. {self.summary(label)}"
+        if strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return False
+
+
+@contextmanager
+def query_budget(budget, label="query_budget"):
+    """Проверка в тестах, что код внутри блока with выполняет не больше budget запросов."""
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    recorder.check(budget, label)
+
+
+def get_view_budget(view_func):
+    """Бюджет запросов представления: атрибут query_budget класса или функции."""
+    view_class = getattr(view_func, "view_class", None)
+    return getattr(view_class, "query_budget", getattr(view_func, "query_budget", None))
+
+
+def assert_view_query_budget(client, url, method="get", data=None):
+    """Запрос к url тестовым клиентом с проверкой бюджета запросов его представления.
+
+    Возвращает ответ представления.
+    """
+    budget = get_view_budget(resolve(url.split("?")[0]).func)
+    with query_budget(budget, label=f"{method.upper()} {url}"):
+        response = getattr(client, method)(url, data)
+    return response
@@ -0,0 +1,52 @@
+import json
+
+from reservation.partitions import DEFAULT_PARTITION, PARENT_TABLE, PARTITION_NAME_RE
+
+# Таблицы, полный просмотр которых недопустим на больших объемах данных
+LARGE_TABLES = ("reservation_reservation", "reservation_waitlistentry")
+
+
+class SequentialScanFound(Exception):
+    """В плане запроса найден последовательный просмотр большой таблицы."""
+
+
+def explain(queryset):
+    """План выполнения запроса queryset в виде дерева узлов EXPLAIN."""
+    return json.loads(queryset.explain(format="json"))[0]["Plan"]
+
+
+def iter_plan_nodes(plan):
+    """Все узлы дерева плана, начиная с корня."""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from iter_plan_nodes(child)
+
+
+def parent_table(relation):
+    """Таблица, к которой относится relation: для секции бронирований - секционированная таблица.
+
+    В плане запроса к секционированной таблице указаны ее секции, а не она сама.
+    """
+    if relation == DEFAULT_PARTITION or PARTITION_NAME_RE.match(relation or ""):
+        return PARENT_TABLE
+    return relation
+
+
+def find_seq_scans(plan, tables=LARGE_TABLES):
+    """Имена таблиц из tables (или их секций), которые план просматривает последовательно."""
+    return [
+        node["Relation Name"]
+        for node in iter_plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and parent_table(node.get("Relation Name")) in tables
+    ]
+
+
+def assert_no_seq_scan(queryset, label="query", tables=LARGE_TABLES):
+    """Проверка, что запрос queryset не просматривает последовательно большие таблицы.
+
+    Проверять имеет смысл на заполненной базе после ANALYZE: на почти пустых
+    таблицах планировщик справедливо выбирает последовательный просмотр.
+    """
+    scans = find_seq_scans(explain(queryset), tables)
+    if scans:
+        raise SequentialScanFound(f"{label}: последовательный просмотр {', '.join(scans)}\n{queryset.explain()}")
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError
+
+from reservation.models import Restaurant
+
+# Ключ кэша списка id ресторанов; сбрасывается сигналами при добавлении и удалении ресторана
+RESTAURANT_IDS_CACHE_KEY = "restaurant-ids"
+
+# Параметр запроса и cookie с выбранным рестораном
+RESTAURANT_PARAM = "restaurant"
+
+
+def get_restaurant_ids():
+    """id всех ресторанов по возрастанию: из кэша, а при промахе из БД."""
+    ids = cache.get(RESTAURANT_IDS_CACHE_KEY)
+    if ids is None:
+        ids = list(Restaurant.objects.order_by("pk").values_list("pk", flat=True))
+        cache.set(RESTAURANT_IDS_CACHE_KEY, ids, None)
+    return ids
+
+
+async def aget_restaurant_ids():
+    """Асинхронный вариант get_restaurant_ids."""
+    ids = await cache.aget(RESTAURANT_IDS_CACHE_KEY)
+    if ids is None:
+        ids = [pk async for pk in Restaurant.objects.order_by("pk").values_list("pk", flat=True)]
+        await cache.aset(RESTAURANT_IDS_CACHE_KEY, ids, None)
+    return ids
+
+
+def select_restaurant(value=None, ids=None):
+    """id ресторана из значения параметра или cookie value, если такой ресторан есть, иначе ресторан по умолчанию.
+
+    Ресторан по умолчанию - DEFAULT_RESTAURANT_ID, а без него ресторан с наименьшим id.
+    Возвращает None, если ресторанов нет. Список ids по умолчанию берется из get_restaurant_ids.
+    """
+    if ids is None:
+        ids = get_restaurant_ids()
+    try:
+        restaurant_id = int(value)
+    except (TypeError, ValueError):
+        restaurant_id = None
+    if restaurant_id in ids:
+        return restaurant_id
+    if settings.DEFAULT_RESTAURANT_ID in ids:
+        return settings.DEFAULT_RESTAURANT_ID
+    return ids[0] if ids else None
+
+
+def command_restaurant(value=None):
+    """id ресторана для management-команды: из аргумента --restaurant или ресторан по умолчанию."""
+    if value is not None and value not in get_restaurant_ids():
+        raise CommandError(f"Ресторан id={value} не найден")
+    restaurant_id = select_restaurant(value)
+    if restaurant_id is None:
+        raise CommandError("Нет ни одного ресторана, создайте его в админке")
+    return restaurant_id
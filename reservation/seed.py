@@ -0,0 +1,74 @@
+from itertools import cycle
+
+from django.db.models import Max
+from django.utils import timezone
+
+from config.routers import get_current_restaurant
+from reservation.models import RESERVATION_DURATION, Reservation, Table, WaitlistEntry
+
+# Вместимость создаваемых столиков по кругу
+SEED_CAPACITIES = (2, 4, 6, 8)
+
+
+def seed_tables(count, restaurant_id=None):
+    """Создание count столиков ресторана (по умолчанию текущего) с номерами после уже существующих."""
+    restaurant_id = restaurant_id or get_current_restaurant()
+    tables = Table.objects.filter(restaurant_id=restaurant_id)
+    first_number = (tables.aggregate(Max("number"))["number__max"] or 0) + 1
+    capacities = cycle(SEED_CAPACITIES)
+    return Table.objects.bulk_create(
+        Table(restaurant_id=restaurant_id, number=first_number + index, capacity=next(capacities))
+        for index in range(count)
+    )
+
+
+def seed_reservations(tables, count, owners=(), batch_size=5000):
+    """Создание count непересекающихся бронирований на столиках tables.
+
+    Бронирования идут подряд на каждом столике, половина из них в прошлом,
+    половина в будущем, владельцы назначаются по кругу из owners.
+    """
+    per_table = -(-count // len(tables))
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) - RESERVATION_DURATION * (per_table // 2)
+    owners = cycle(owners or [None])
+    reservations = []
+    for index in range(count):
+        reserved_at = start + RESERVATION_DURATION * (index // len(tables))
+        table = tables[index % len(tables)]
+        reservations.append(
+            Reservation(
+                restaurant_id=table.restaurant_id,
+                table=table,
+                reserved_at=reserved_at,
+                ends_at=reserved_at + RESERVATION_DURATION,
+                customer_name=f"Гость {index}",
+                customer_contact="+70000000000",
+                owner=next(owners),
+            )
+        )
+        if len(reservations) == batch_size:
+            Reservation.objects.bulk_create(reservations)
+            reservations = []
+    Reservation.objects.bulk_create(reservations)
+
+
+def seed_waitlist(owners, count, batch_size=5000):
+    """Создание count записей листа ожидания текущего ресторана на ближайший месяц с окнами от получаса до трех часов."""
+    start = timezone.now().replace(minute=0, second=0, microsecond=0)
+    owners = cycle(owners)
+    windows = cycle(RESERVATION_DURATION * factor for factor in (0.5, 1, 2, 3))
+    entries = []
+    for index in range(count):
+        desired_from = start + RESERVATION_DURATION * (index * 7 % (24 * 30))
+        entries.append(
+            WaitlistEntry(
+                restaurant_id=get_current_restaurant(),
+                owner=next(owners),
+                guests=index % 10 + 1,
+                desired_from=desired_from,
+                desired_to=desired_from + next(windows),
+                customer_name=f"Гость {index}",
+                customer_contact="+70000000000",
+            )
+        )
+    WaitlistEntry.objects.bulk_create(entries, batch_size=batch_size)
@@ -0,0 +1,352 @@
+from datetime import datetime, time, timedelta
+from math import ceil
+
+import numpy as np
+from django.contrib.postgres.fields import RangeBoundary
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.routers import get_current_restaurant, read_database, restaurant_database
+from reservation.allocation import TableAllocator, evening_period
+from reservation.analytics import record_reservations
+from reservation.models import RESERVATION_DURATION, Reservation, Table, TsTzRange
+
+# Шаг сетки свободных слотов
+SLOT_DURATION = timedelta(minutes=30)
+
+# Код ошибки PostgreSQL при нарушении ограничения-исключения
+EXCLUSION_VIOLATION = "23P01"
+
+
+# Сколько раз подбирается другой столик, если выбранный успели занять параллельно
+ALLOCATION_ATTEMPTS = 3
+
+
+class ReservationConflict(Exception):
+    """Столик уже забронирован на пересекающееся время."""
+
+
+class NoFreeTable(ReservationConflict):
+    """Нет свободного столика, вмещающего всех гостей, на время бронирования."""
+
+
+class BatchConflict(ReservationConflict):
+    """Часть бронирований пакета пересекается с существующими или друг с другом."""
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts)
+        self.conflicts = conflicts
+
+
+def touch_tables(table_ids, using=None):
+    """Увеличение версии столиков table_ids после изменения их бронирований (см. Table.version).
+
+    Столики обновляются в БД using, по умолчанию в БД текущего ресторана.
+    """
+    table_ids = {table_id for table_id in table_ids if table_id is not None}
+    if table_ids:
+        Table.objects.using(using or restaurant_database()).filter(pk__in=table_ids).update(version=F("version") + 1)
+
+
+def get_reservation_period(reserved_at):
+    """Интервал [начало, окончание) бронирования, начинающегося в reserved_at."""
+    return reserved_at, reserved_at + RESERVATION_DURATION
+
+
+def period_bounds(start, end):
+    """Условия на reserved_at для бронирований, пересекающихся с интервалом [start, end).
+
+    Условие на интервал не ограничивает reserved_at напрямую, а без этого
+    PostgreSQL не может отсечь ненужные месячные секции таблицы бронирований.
+    """
+    return {"reserved_at__gt": start - RESERVATION_DURATION, "reserved_at__lt": end}
+
+
+def find_conflicts(table, start, end, exclude_id=None):
+    """Бронирования столика, пересекающиеся с интервалом [start, end).
+
+    Условие совпадает с выражением ограничения-исключения модели,
+    поэтому проверка выполняется одним поиском по его GiST-индексу.
+    """
+    queryset = Reservation.objects.annotate(period=TsTzRange("reserved_at", "ends_at", RangeBoundary())).filter(
+        table=table,
+        period__overlap=(start, end),
+        **period_bounds(start, end),
+    )
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    return queryset
+
+
+def is_table_free(table, reserved_at, exclude_id=None):
+    """Проверка, свободен ли столик на время бронирования, начинающегося в reserved_at."""
+    start, end = get_reservation_period(reserved_at)
+    return not find_conflicts(table, start, end, exclude_id=exclude_id).exists()
+
+
+def is_exclusion_violation(error):
+    """Проверка, что ошибка целостности вызвана ограничением-исключением."""
+    cause = error.__cause__
+    return (getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)) == EXCLUSION_VIOLATION
+
+
+def book_table(reservation):
+    """Сохранение бронирования в одной короткой транзакции.
+
+    Строка столика блокируется через SELECT ... FOR UPDATE, поэтому параллельные
+    бронирования одного столика проверяются и записываются строго по очереди,
+    а бронирование записывается в базу ровно один раз и только после проверки.
+    Если столик не выбран, он подбирается по количеству гостей (book_best_table) среди
+    столиков ресторана бронирования, а для нового бронирования - текущего ресторана.
+    """
+    if reservation.table_id is None:
+        return book_best_table(reservation)
+    if reservation.restaurant_id is None and Reservation.table.is_cached(reservation):
+        reservation.restaurant_id = reservation.table.restaurant_id
+    using = restaurant_database(reservation.restaurant_id)
+    try:
+        with transaction.atomic(using=using):
+            reservation.restaurant_id = (
+                Table.objects.using(using)
+                .select_for_update()
+                .values_list("restaurant_id", flat=True)
+                .get(pk=reservation.table_id)
+            )
+            start, end = get_reservation_period(reservation.reserved_at)
+            if find_conflicts(reservation.table_id, start, end, exclude_id=reservation.pk).exists():
+                raise ReservationConflict
+            reservation.save()
+    except IntegrityError as error:
+        # Бронирование в обход блокировки (например, из админки) отклоняет сама база: ограничение-исключение
+        # секции, а пересечение с бронированием соседней секции - триггер reservation_boundary_check
+        if is_exclusion_violation(error):
+            raise ReservationConflict from error
+        raise
+    return reservation
+
+
+def load_table_allocator(reserved_at, guests, exclude_id=None, restaurant_id=None):
+    """Распределитель столиков ресторана с занятостью вмещающих guests гостей столиков на сутки бронирования.
+
+    Загружается двумя запросами, дальше подбор идет в памяти.
+    """
+    start, end = evening_period(reserved_at)
+    tables = list(availability_tables(guests, restaurant_id))
+    reservations = availability_reservations([table["id"] for table in tables], start, end)
+    if exclude_id is not None:
+        reservations = reservations.exclude(id=exclude_id)
+    return TableAllocator(tables, reservations)
+
+
+def book_best_table(reservation, allocator=None):
+    """Бронирование свободного столика наименьшей достаточной вместимости для reservation.guests гостей.
+
+    Если подобранный столик успели занять параллельно, занятость в памяти
+    дополняется и подбирается следующий. При отсутствии столика - NoFreeTable.
+    """
+    if reservation.restaurant_id is None:
+        reservation.restaurant_id = get_current_restaurant()
+    if allocator is None:
+        allocator = load_table_allocator(
+            reservation.reserved_at,
+            reservation.guests,
+            exclude_id=reservation.pk,
+            restaurant_id=reservation.restaurant_id,
+        )
+    for _ in range(ALLOCATION_ATTEMPTS):
+        table_id = allocator.allocate(reservation.reserved_at, reservation.guests)
+        if table_id is None:
+            break
+        reservation.table_id = table_id
+        try:
+            booked = book_table(reservation)
+        except ReservationConflict:
+            allocator.reserve(table_id, reservation.reserved_at)
+            continue
+        allocator.reserve(table_id, reservation.reserved_at)
+        return booked
+    reservation.table_id = None
+    raise NoFreeTable
+
+
+def find_conflicting_intervals(intervals, using=None):
+    """Номера интервалов (table_id, start, end), которые нельзя забронировать.
+
+    Пересечения с уже сохраненными бронированиями ищутся одним запросом: интервалы
+    передаются массивами в unnest, а LATERAL-подзапрос для каждого из них выполняет
+    один поиск по GiST-индексу ограничения-исключения в нужной секции. Из пересекающихся
+    между собой интервалов набора допустимым считается более ранний. Запрос выполняется
+    в БД using, по умолчанию в БД текущего ресторана.
+    """
+    if not intervals:
+        return set()
+    table_ids, starts, ends = zip(*intervals)
+    with connections[using or restaurant_database()].cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT batch.idx
+            FROM unnest(%s::bigint[], %s::timestamptz[], %s::timestamptz[])
+                WITH ORDINALITY AS batch(table_id, starts, ends, idx)
+            CROSS JOIN LATERAL (
+                SELECT 1 FROM {Reservation._meta.db_table} AS reservation
+                WHERE tstzrange(reservation.reserved_at, reservation.ends_at, '[)')
+                        && tstzrange(batch.starts, batch.ends, '[)')
+                    AND reservation.table_id = batch.table_id
+                    AND reservation.reserved_at > batch.starts - %s
+                    AND reservation.reserved_at < batch.ends
+                LIMIT 1
+            ) AS conflict
+            """,
+            [list(table_ids), list(starts), list(ends), RESERVATION_DURATION],
+        )
+        conflicts = {index - 1 for (index,) in cursor.fetchall()}
+
+    last_end = {}
+    for index in sorted(range(len(intervals)), key=lambda position: intervals[position][:2]):
+        if index in conflicts:
+            continue
+        table_id, start, end = intervals[index]
+        if table_id in last_end and start < last_end[table_id]:
+            conflicts.add(index)
+        else:
+            last_end[table_id] = end
+    return conflicts
+
+
+def weekly_recurrence(reserved_at, weeks):
+    """Начала еженедельных бронирований: weeks раз в тот же день недели и то же местное время."""
+    local = timezone.localtime(reserved_at).replace(tzinfo=None)
+    return [timezone.make_aware(local + timedelta(weeks=week)) for week in range(weeks)]
+
+
+def book_reservations(reservations):
+    """Сохранение пакета бронирований (несколько столиков, повторы по неделям) целиком или никак.
+
+    Столики пакета блокируются, весь пакет проверяется на пересечения одним запросом
+    find_conflicting_intervals и сохраняется одним bulk_create: число запросов не зависит
+    от размера пакета. При пересечениях ничего не сохраняется, а BatchConflict содержит
+    бронирования, которые не удалось бы записать. Все столики пакета должны
+    принадлежать одному ресторану.
+    """
+    using = restaurant_database()
+    try:
+        with transaction.atomic(using=using):
+            table_ids = sorted({reservation.table_id for reservation in reservations})
+            restaurants = dict(
+                Table.objects.using(using)
+                .select_for_update()
+                .filter(pk__in=table_ids)
+                .order_by("pk")
+                .values_list("pk", "restaurant_id")
+            )
+            for reservation in reservations:
+                reservation.restaurant_id = restaurants[reservation.table_id]
+                reservation.ends_at = reservation.reserved_at + RESERVATION_DURATION
+            conflicts = find_conflicting_intervals(
+                [(reservation.table_id, reservation.reserved_at, reservation.ends_at) for reservation in reservations],
+                using,
+            )
+            if conflicts:
+                raise BatchConflict([reservations[index] for index in sorted(conflicts)])
+            created = Reservation.objects.using(using).bulk_create(reservations)
+            # bulk_create не отправляет сигналы, поэтому версии столиков и занятость обновляются здесь
+            touch_tables(table_ids, using)
+            record_reservations(created)
+            return created
+    except IntegrityError as error:
+        # Пересечение с бронированием, сохраненным в обход блокировки
+        if is_exclusion_violation(error):
+            raise ReservationConflict from error
+        raise
+
+
+def availability_period(date_from, date_to):
+    """Интервал [start, end) с начала дня date_from до конца дня date_to."""
+    start = timezone.make_aware(datetime.combine(date_from, time.min))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return start, end
+
+
+def availability_tables(guests=None, restaurant_id=None):
+    """Столики ресторана (по умолчанию текущего) для сетки занятости: вмещающие guests гостей, по вместимости."""
+    restaurant_id = restaurant_id or get_current_restaurant()
+    tables = Table.objects.using(read_database(restaurant_database(restaurant_id))).filter(restaurant_id=restaurant_id)
+    tables = tables.order_by("capacity", "number")
+    if guests:
+        tables = tables.filter(capacity__gte=guests)
+    return tables.values("id", "number", "capacity", "is_available")
+
+
+def availability_reservations(table_ids, start, end):
+    """Бронирования столиков table_ids, пересекающиеся с интервалом [start, end)."""
+    return (
+        Reservation.objects.annotate(period=TsTzRange("reserved_at", "ends_at", RangeBoundary()))
+        .filter(table_id__in=table_ids, period__overlap=(start, end), **period_bounds(start, end))
+        .order_by()
+        .values_list("table_id", "reserved_at", "ends_at")
+    )
+
+
+def availability_grid(date_from, date_to, guests=None, slot=SLOT_DURATION):
+    """Сетка занятости всех столиков с шагом slot за дни с date_from по date_to включительно.
+
+    Столики и пересекающиеся с периодом бронирования загружаются двумя запросами,
+    дальше занятость считается матрицей NumPy (столики x слоты) без циклов по столикам.
+    Возвращает словарь со списком столиков, началами слотов, матрицей занятости busy
+    и матрицей free: можно ли начать бронирование в этом слоте.
+    """
+    start, end = availability_period(date_from, date_to)
+    tables = list(availability_tables(guests))
+    reservations = list(availability_reservations([table["id"] for table in tables], start, end))
+    return build_availability_grid(tables, reservations, start, end, slot)
+
+
+async def aavailability_grid(date_from, date_to, guests=None, slot=SLOT_DURATION):
+    """Асинхронный вариант availability_grid на асинхронном ORM."""
+    start, end = availability_period(date_from, date_to)
+    tables = [table async for table in availability_tables(guests)]
+    reservations = [row async for row in availability_reservations([table["id"] for table in tables], start, end)]
+    return build_availability_grid(tables, reservations, start, end, slot)
+
+
+def build_availability_grid(tables, reservations, start, end, slot=SLOT_DURATION):
+    """Расчет матриц busy и free по загруженным столикам и бронированиям."""
+    slot_seconds = slot.total_seconds()
+    slots_count = ceil((end - start).total_seconds() / slot_seconds)
+    table_ids = np.fromiter((table["id"] for table in tables), dtype=np.int64, count=len(tables))
+
+    # Разностный массив: +1 в слоте начала бронирования, -1 в слоте окончания
+    diff = np.zeros((len(tables), slots_count + 1), dtype=np.int32)
+    if reservations:
+        table_id, reserved_at, ends_at = zip(*reservations)
+        base = start.timestamp()
+        sorter = np.argsort(table_ids)
+        rows = sorter[np.searchsorted(table_ids, np.array(table_id, dtype=np.int64), sorter=sorter)]
+        first = np.array([value.timestamp() for value in reserved_at]) - base
+        last = np.array([value.timestamp() for value in ends_at]) - base
+        first = np.clip(np.floor(first / slot_seconds), 0, slots_count).astype(np.int64)
+        last = np.clip(np.ceil(last / slot_seconds), 0, slots_count).astype(np.int64)
+        np.add.at(diff, (rows, first), 1)
+        np.add.at(diff, (rows, last), -1)
+    busy = np.cumsum(diff, axis=1)[:, :slots_count] > 0
+
+    # Бронирование можно начать, если свободны все слоты на его продолжительность
+    window = ceil(RESERVATION_DURATION.total_seconds() / slot_seconds)
+    free_count = np.zeros((len(tables), slots_count + 1), dtype=np.int32)
+    free_count[:, 1:] = np.cumsum(~busy, axis=1)
+    free = np.zeros_like(busy)
+    if slots_count >= window:
+        free[:, : slots_count - window + 1] = (free_count[:, window:] - free_count[:, :-window]) == window
+
+    slot_starts = [start + slot * index for index in range(slots_count)]
+    slot_epochs = np.arange(slots_count) * slot_seconds + start.timestamp()
+    free[:, slot_epochs < timezone.now().timestamp()] = False
+    free[~np.array([table["is_available"] for table in tables], dtype=bool)] = False
+
+    return {
+        "tables": tables,
+        "slots": slot_starts,
+        "busy": busy,
+        "free": free,
+    }
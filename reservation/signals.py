@@ -0,0 +1,68 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reservation.analytics import apply_rollup_deltas, record_reservations, rollup_deltas
+from reservation.models import RESERVATION_DURATION, Reservation, Restaurant, Table
+from reservation.restaurants import RESTAURANT_IDS_CACHE_KEY
+from reservation.services import touch_tables
+from reservation.waitlist import match_freed_slot
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, using, origin=None, **kwargs):
+    """Новая версия столика, вычитание из занятости и предложение слота листу ожидания.
+
+    При удалении самого столика его почасовая занятость удаляется каскадно, поэтому не обновляется.
+    """
+    touch_tables([instance.table_id], using)
+    deleted_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if not issubclass(deleted_model, Table):
+        record_reservations([instance], sign=-1)
+    transaction.on_commit(
+        partial(match_freed_slot, instance.restaurant_id, instance.table_id, instance.reserved_at), using=using
+    )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, using, **kwargs):
+    """Новая версия столиков бронирования, учет в занятости и предложение прежнего слота листу ожидания.
+
+    Слот предлагается, если бронирование перенесли на другой столик или время.
+    При изменении из почасовой занятости вычитаются прежние значения бронирования.
+    """
+    slot = (instance.table_id, instance.reserved_at)
+    loaded_slot = getattr(instance, "_loaded_slot", None) or slot
+    loaded_guests = getattr(instance, "_loaded_guests", None) or instance.guests
+    instance._loaded_slot = slot
+    instance._loaded_guests = instance.guests
+    touch_tables([instance.table_id, loaded_slot[0]], using)
+    if created:
+        record_reservations([instance])
+    elif loaded_slot != slot or loaded_guests != instance.guests:
+        restaurant_id = instance.restaurant_id
+        deltas = rollup_deltas(
+            [(restaurant_id, *loaded_slot, loaded_slot[1] + RESERVATION_DURATION, loaded_guests)], sign=-1
+        )
+        apply_rollup_deltas(rollup_deltas([(restaurant_id, *slot, instance.ends_at, instance.guests)], deltas=deltas))
+    if not created and loaded_slot != slot:
+        transaction.on_commit(partial(match_freed_slot, instance.restaurant_id, *loaded_slot), using=using)
+
+
+@receiver(post_save, sender=Table)
+def table_saved(sender, instance, created, using, **kwargs):
+    """Новая версия столика после изменения вместимости или доступности."""
+    if not created:
+        touch_tables([instance.pk], using)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    """Сброс кэша списка ресторанов, по которому RestaurantMiddleware выбирает ресторан запроса."""
+    if kwargs.get("created", True):
+        cache.delete(RESTAURANT_IDS_CACHE_KEY)
@@ -0,0 +1,64 @@
+import gzip
+from functools import cached_property
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него создаются только копии gzip
+    brotli = None
+
+# Расширения файлов, для которых создаются сжатые копии
+COMPRESSED_EXTENSIONS = (".css", ".js", ".map", ".json", ".svg", ".txt", ".html")
+
+# Сжатая копия сохраняется, только если она заметно меньше исходного файла
+MIN_COMPRESSION_RATIO = 0.95
+
+
+def compress(content):
+    """Сжатые варианты содержимого файла: расширение копии и ее содержимое."""
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хэшем содержимого в имени файла и сжатыми копиями .gz и .br.
+
+    Копии создаются во время collectstatic, а отдает их PrecompressedStaticMiddleware.
+    """
+
+    # Карты исходников (.map) в статике не поставляются, поэтому ссылки sourceMappingURL
+    # в файлах сторонних библиотек остаются как есть, а не ломают collectstatic
+    patterns = tuple(
+        (extension, tuple(pattern for pattern in patterns if "sourceMappingURL" not in str(pattern)))
+        for extension, patterns in ManifestStaticFilesStorage.patterns
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                self.write_compressed(name)
+
+    def write_compressed(self, name):
+        """Сохранение сжатых копий файла name рядом с ним."""
+        with self.open(name) as file:
+            content = file.read()
+        for extension, compressed in compress(content).items():
+            if len(compressed) >= len(content) * MIN_COMPRESSION_RATIO:
+                continue
+            with open(self.path(name + extension), "wb") as file:
+                file.write(compressed)
+
+    def is_hashed(self, name):
+        """Проверка, что name - имя файла с хэшем содержимого из манифеста."""
+        return name in self.hashed_names
+
+    @cached_property
+    def hashed_names(self):
+        """Имена файлов с хэшем из манифеста."""
+        return set(self.hashed_files.values())
@@ -1,4 +1,9 @@
 from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from reservation.images import get_cached_manifest
 
 register = template.Library()
 
@@ -8,3 +13,46 @@ def media_filter(path):
     if path:
         return f"/media/{path}"
     return "#"
+
+
+@register.simple_tag
+def media_image(path, sizes="100vw", **attrs):
+    """Тег <picture> для изображения из MEDIA_ROOT с копиями WebP и JPEG разной ширины.
+
+    Браузер выбирает по srcset и sizes копию под ширину экрана. Пока копии не
+    созданы командой process_images, выводится исходное изображение.
+    Пример: {% media_image "chef.jpg" sizes="19rem" class="card-img-top" alt="..." %}
+    """
+    path = str(path or "")
+    manifest = get_cached_manifest(path) if path else None
+    if manifest is None:
+        return format_html("<img{}>", flatatt({"src": media_filter(path), **attrs}))
+
+    def srcset(variant_format):
+        return ", ".join(
+            f"{settings.MEDIA_URL}{name} {width}w" for name, width in manifest["variants"][variant_format]
+        )
+
+    largest, _ = manifest["variants"]["jpeg"][-1]
+    image_attrs = {
+        "src": f"{settings.MEDIA_URL}{largest}",
+        "srcset": srcset("jpeg"),
+        "sizes": sizes,
+        **attrs,
+    }
+    return format_html(
+        '<picture><source type="image/webp"{}><img{}></picture>',
+        flatatt({"srcset": srcset("webp"), "sizes": sizes}),
+        flatatt(image_attrs),
+    )
+
+
+@register.simple_tag
+def media_variant(path, width, variant_format="jpeg"):
+    """Адрес наименьшей копии изображения не уже width или исходного изображения, если копий нет."""
+    manifest = get_cached_manifest(path)
+    if manifest is None:
+        return media_filter(path)
+    variants = manifest["variants"][variant_format]
+    name = next((name for name, variant_width in variants if variant_width >= int(width)), variants[-1][0])
+    return f"{settings.MEDIA_URL}{name}"
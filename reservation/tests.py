@@ -0,0 +1,850 @@
+import json
+import threading
+import warnings
+from datetime import datetime, time, timedelta
+from time import monotonic
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from config.routers import replica_lag, use_replicas, use_restaurant
+from reservation.allocation import TableAllocator
+from reservation.analytics import rebuild_rollups
+from reservation.cache import page_cache_key
+from reservation.export import EXPORT_FIELDS, export_response
+from reservation.middleware import ReplicaMiddleware
+from reservation.models import (
+    RESERVATION_DURATION,
+    OccupancyRollup,
+    Reservation,
+    Restaurant,
+    Table,
+    WaitlistEntry,
+)
+from reservation.query_budget import assert_view_query_budget
+from reservation.query_plan import SequentialScanFound, assert_no_seq_scan, find_seq_scans
+from reservation.restaurants import get_restaurant_ids
+from reservation.services import (
+    BatchConflict,
+    NoFreeTable,
+    ReservationConflict,
+    book_best_table,
+    book_reservations,
+    book_table,
+    find_conflicting_intervals,
+    find_conflicts,
+    get_reservation_period,
+    is_exclusion_violation,
+    load_table_allocator,
+    weekly_recurrence,
+)
+from users.backends import CachedModelBackend
+from users.models import User
+
+
+def local_input(value):
+    """Значение поля datetime-local формы для времени value."""
+    return f"{timezone.localtime(value):%Y-%m-%dT%H:%M}"
+
+
+class ViewQueryBudgetTest(TransactionTestCase):
+    """Представления укладываются в заявленные бюджеты запросов к БД.
+
+    Тест без общей транзакции: иначе транзакции представлений превращаются в точки сохранения
+    и добавляют запросы, которых в работе нет. Список ресторанов и пользователь сессии в работе
+    почти всегда берутся из кэша, поэтому кэш прогревается заранее.
+    """
+
+    # Страница обратной связи не проверяется: у нее нет шаблона
+    pages = ("main", "about", "contacts", "services", "mission", "history", "team")
+
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=self.restaurant, number=1, capacity=4)
+        self.other_table = Table.objects.create(restaurant=self.restaurant, number=2, capacity=2)
+        self.user = User.objects.create(email="guest@example.com")
+        self.reserved_at = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=2)
+        self.reservation = book_table(
+            Reservation(
+                table=self.table,
+                reserved_at=self.reserved_at,
+                guests=2,
+                customer_name="test",
+                customer_contact="test",
+                owner=self.user,
+            )
+        )
+        get_restaurant_ids()
+
+    def login(self, user):
+        """Вход пользователя user с пользователем сессии в кэше."""
+        self.client.force_login(user)
+        CachedModelBackend().get_user(user.pk)
+
+    def booking_data(self, days=1, **data):
+        """Данные формы бронирования столика через days суток после бронирования пользователя."""
+        return {
+            "guests": 2,
+            "table": self.table.pk,
+            "reserved_at": local_input(self.reserved_at + timedelta(days=days)),
+            "customer_name": "test",
+            "customer_contact": "test",
+            **data,
+        }
+
+    def create_waiting(self):
+        """Гость в листе ожидания, которому подходит слот бронирования пользователя."""
+        return WaitlistEntry.objects.create(
+            owner=User.objects.create(email="waiting@example.com"),
+            restaurant=self.restaurant,
+            guests=2,
+            desired_from=self.reserved_at - timedelta(hours=1),
+            desired_to=self.reserved_at + timedelta(hours=1),
+            customer_name="test",
+            customer_contact="test",
+        )
+
+    def assert_budget(self, name, method="get", data=None, status=200, kwargs=None):
+        """Запрос к представлению name с проверкой бюджета и кода ответа."""
+        response = assert_view_query_budget(self.client, reverse(f"reservation:{name}", kwargs=kwargs), method, data)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_anonymous_pages(self):
+        for name in self.pages:
+            with self.subTest(name):
+                self.assert_budget(name)
+                self.assert_budget(name)  # из кэша страниц
+
+    def test_user_pages(self):
+        self.login(self.user)
+        for name in (*self.pages, "reservation_list", "personal_account", "reservation_batch", "waitlist"):
+            with self.subTest(name):
+                self.assert_budget(name)
+        self.assert_budget("personal_account", data={"period": "past"})
+        self.assert_budget("reservation_update", kwargs={"pk": self.reservation.pk})
+
+    def test_availability(self):
+        today = timezone.localdate()
+        data = {"date_from": today, "date_to": today + timedelta(days=6), "guests": 2}
+        self.assert_budget("availability", data=data)
+        self.assert_budget("api_availability", data=data)
+        self.assert_budget("api_tables")
+
+    def test_api_reservations(self):
+        self.login(self.user)
+        response = self.assert_budget("api_reservations")
+        self.assertEqual(len(response.json()["reservations"]), 1)
+
+    def test_db_pool_stats(self):
+        # Пользователь сессии загружается из БД, если его еще нет в кэше
+        self.client.force_login(User.objects.create(email="staff@example.com", is_staff=True))
+        self.assert_budget("db_pool_stats")
+
+    def test_booking(self):
+        self.login(self.user)
+        self.assert_budget("reservation_list", "post", self.booking_data(), status=302)
+        self.assert_budget("reservation_create", "post", self.booking_data(table=self.other_table.pk), status=302)
+        # Подбор столика по количеству гостей
+        self.assert_budget("reservation_list", "post", self.booking_data(days=2, table="", guests=4), status=302)
+        self.assert_budget("reservation_list", "post", self.booking_data())  # столик уже занят
+        self.assertEqual(Reservation.objects.filter(owner=self.user).count(), 4)
+
+    def test_batch_booking(self):
+        self.login(self.user)
+        data = {
+            "tables": [self.table.pk, self.other_table.pk],
+            "reserved_at": local_input(self.reserved_at + timedelta(days=1)),
+            "weeks": 4,
+            "customer_name": "test",
+            "customer_contact": "test",
+        }
+        self.assert_budget("reservation_batch", "post", data, status=302)
+        self.assertEqual(Reservation.objects.filter(owner=self.user).count(), 9)
+
+    def test_waitlist(self):
+        self.login(self.user)
+        data = {
+            "guests": 2,
+            "desired_from": local_input(self.reserved_at),
+            "desired_to": local_input(self.reserved_at + timedelta(hours=3)),
+            "customer_name": "test",
+            "customer_contact": "test",
+        }
+        self.assert_budget("waitlist", "post", data, status=302)
+        self.assertTrue(WaitlistEntry.objects.filter(owner=self.user).exists())
+
+    def test_update_with_waitlist_match(self):
+        """Перенос вместе с предложением прежнего слота листу ожидания после фиксации транзакции."""
+        waiting = self.create_waiting()
+        self.login(self.user)
+        data = self.booking_data(table=self.other_table.pk)
+        self.assert_budget("reservation_update", "post", data, status=302, kwargs={"pk": self.reservation.pk})
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.table, self.other_table)
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status, WaitlistEntry.STATUS_NOTIFIED)
+
+    def test_delete_with_waitlist_match(self):
+        """Удаление вместе с предложением освободившегося слота листу ожидания после фиксации транзакции."""
+        waiting = self.create_waiting()
+        self.login(self.user)
+        self.assert_budget("reservation_delete", "post", status=302, kwargs={"pk": self.reservation.pk})
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status, WaitlistEntry.STATUS_NOTIFIED)
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Параллельные бронирования одного столика на одно время."""
+
+    threads_count = 8
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=restaurant, number=1, capacity=2)
+        self.reserved_at = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def test_only_one_booking_succeeds(self):
+        """Из одновременных бронирований одного слота успешно ровно одно, остальные - ReservationConflict."""
+        outcomes = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.threads_count)
+
+        def worker():
+            reservation = Reservation(
+                table=self.table, reserved_at=self.reserved_at, customer_name="test", customer_contact="test"
+            )
+            barrier.wait()  # все потоки бронируют одновременно
+            try:
+                book_table(reservation)
+                outcome = "booked"
+            except ReservationConflict:
+                outcome = "conflict"
+            except Exception as error:  # noqa: BLE001 - иная ошибка видна в тексте провала теста
+                outcome = repr(error)
+            finally:
+                connections.close_all()
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ["booked"] + ["conflict"] * (self.threads_count - 1))
+        self.assertEqual(Reservation.objects.filter(table=self.table).count(), 1)
+
+
+class PartitionBoundaryTest(TestCase):
+    """Пересечения бронирований из соседних месячных секций отклоняет база."""
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=restaurant, number=1, capacity=2)
+        month = timezone.localdate().replace(day=1) + timedelta(days=32)
+        self.month_start = timezone.make_aware(datetime(month.year, month.month, 1))
+
+    def save(self, reserved_at):
+        """Сохранение бронирования столика в обход book_table."""
+        reservation = Reservation(
+            table=self.table, reserved_at=reserved_at, customer_name="test", customer_contact="test"
+        )
+        reservation.restaurant_id = self.table.restaurant_id
+        reservation.save()
+        return reservation
+
+    def test_overlap_across_month_boundary(self):
+        self.save(self.month_start - timedelta(minutes=30))
+        with self.assertRaises(IntegrityError) as raised, transaction.atomic():
+            self.save(self.month_start)
+        self.assertTrue(is_exclusion_violation(raised.exception))
+
+    def test_move_across_month_boundary(self):
+        self.save(self.month_start - timedelta(hours=1))
+        reservation = self.save(self.month_start + timedelta(minutes=30))
+        reservation.reserved_at = self.month_start - timedelta(minutes=15)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            reservation.save()
+
+    def test_adjacent_reservations(self):
+        self.save(self.month_start - timedelta(hours=1))
+        self.save(self.month_start)
+        self.assertEqual(Reservation.objects.filter(table=self.table).count(), 2)
+
+
+class QueryPlanCheckTest(TestCase):
+    """Проверка планов находит последовательный просмотр секций таблицы бронирований."""
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=restaurant, number=1, capacity=2)
+        reserved_at = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for days in range(3):
+            book_table(
+                Reservation(
+                    table=self.table,
+                    reserved_at=reserved_at + timedelta(days=days),
+                    customer_name="test",
+                    customer_contact="test",
+                )
+            )
+        # Без сортировки, как в is_table_free: exists() сбрасывает порядок
+        self.conflicts = find_conflicts(self.table, *get_reservation_period(reserved_at)).order_by()
+
+    def set_planner(self, **settings):
+        """Включение и отключение способов доступа планировщика до конца транзакции теста."""
+        with connection.cursor() as cursor:
+            for name, value in settings.items():
+                cursor.execute(f"SET LOCAL {name} = {'on' if value else 'off'}")
+
+    def test_partitions_resolved_to_parent(self):
+        plan = {
+            "Node Type": "Append",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "reservation_reservation_p2026_01"},
+                {"Node Type": "Seq Scan", "Relation Name": "reservation_reservation_default"},
+                {"Node Type": "Seq Scan", "Relation Name": "reservation_table"},
+            ],
+        }
+        self.assertEqual(find_seq_scans(plan), ["reservation_reservation_p2026_01", "reservation_reservation_default"])
+
+    def test_forced_seq_scan_fails(self):
+        self.set_planner(enable_indexscan=False, enable_bitmapscan=False)
+        with self.assertRaises(SequentialScanFound):
+            assert_no_seq_scan(self.conflicts)
+
+    def test_index_scan_passes(self):
+        self.set_planner(enable_seqscan=False)
+        assert_no_seq_scan(self.conflicts)
+
+
+class ExportStreamingTest(TestCase):
+    """Выгрузка бронирований отдается потоком и под WSGI, и под ASGI."""
+
+    rows_count = 5
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        table = Table.objects.create(restaurant=restaurant, number=1, capacity=2)
+        reserved_at = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for days in range(self.rows_count):
+            book_table(
+                Reservation(
+                    table=table,
+                    reserved_at=reserved_at + timedelta(days=days),
+                    customer_name="test",
+                    customer_contact="test",
+                )
+            )
+
+    def test_wsgi_response(self):
+        response = export_response(RequestFactory().get("/"), Reservation.objects.all())
+        self.assertFalse(response.is_async)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(EXPORT_FIELDS))
+        self.assertEqual(len(lines), self.rows_count + 1)
+
+    async def test_asgi_response_streams_in_chunks(self):
+        """Под ASGI каждая строка уходит отдельным сообщением, без чтения всей выгрузки в список."""
+        response = export_response(AsyncRequestFactory().get("/"), Reservation.objects.all(), "jsonl")
+        self.assertTrue(response.is_async)
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        # Синхронный итератор ASGI-обработчик читает целиком и предупреждает об этом
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            await ASGIHandler().send_response(response, send)
+
+        bodies = [message for message in messages if message["type"] == "http.response.body"]
+        # Строка на каждое бронирование и завершающее пустое сообщение
+        self.assertEqual(len(bodies), self.rows_count + 1)
+        self.assertTrue(all(message["more_body"] for message in bodies[:-1]))
+        self.assertEqual(json.loads(bodies[0]["body"])["table"], 1)
+
+
+def evening(days=3, hour=19):
+    """Время hour:00 через days суток в часовом поясе проекта."""
+    return timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=days), time(hour)))
+
+
+class TableAllocatorTest(SimpleTestCase):
+    """Подбор столика распределителем по занятости в памяти."""
+
+    def setUp(self):
+        self.reserved_at = evening()
+
+    def allocator(self, capacities, reservations=(), unavailable=()):
+        """Распределитель для столиков {id: вместимость} с id в качестве номера и бронированиями (id, начало)."""
+        return TableAllocator(
+            [
+                {"id": pk, "number": pk, "capacity": capacity, "is_available": pk not in unavailable}
+                for pk, capacity in capacities.items()
+            ],
+            [(pk, start, start + RESERVATION_DURATION) for pk, start in reservations],
+        )
+
+    def test_smallest_sufficient_table(self):
+        allocator = self.allocator({1: 6, 2: 2, 3: 4, 4: 8})
+        self.assertEqual(allocator.allocate(self.reserved_at, 3), 3)
+        self.assertEqual(allocator.allocate(self.reserved_at, 2), 2)
+        self.assertEqual(allocator.allocate(self.reserved_at, 7), 4)
+
+    def test_unavailable_table_skipped(self):
+        allocator = self.allocator({1: 4, 2: 6}, unavailable={1})
+        self.assertEqual(allocator.allocate(self.reserved_at, 3), 2)
+
+    def test_busy_table_skipped(self):
+        allocator = self.allocator({1: 4, 2: 6}, [(1, self.reserved_at - timedelta(minutes=30))])
+        self.assertEqual(allocator.allocate(self.reserved_at, 3), 2)
+        # Бронирование, закончившееся к началу, столик не занимает
+        self.assertEqual(allocator.allocate(self.reserved_at + timedelta(minutes=30), 3), 1)
+
+    def test_tightest_fit_among_same_capacity(self):
+        """Из столиков одной вместимости выбирается тот, где бронирование примыкает к соседнему."""
+        allocator = self.allocator({1: 4, 2: 4}, [(2, self.reserved_at - RESERVATION_DURATION)])
+        self.assertEqual(allocator.allocate(self.reserved_at, 4), 2)
+
+    def test_fully_booked_evening(self):
+        allocator = self.allocator({1: 2, 2: 4}, [(2, self.reserved_at)])
+        allocator.reserve(1, self.reserved_at)
+        self.assertIsNone(allocator.allocate(self.reserved_at, 2))
+        self.assertIsNone(allocator.allocate(self.reserved_at, 5))  # нет столика на 5 гостей
+
+
+class BookBestTableTest(TestCase):
+    """Бронирование столика, подобранного по количеству гостей."""
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.large = Table.objects.create(restaurant=self.restaurant, number=1, capacity=6)
+        self.small = Table.objects.create(restaurant=self.restaurant, number=2, capacity=2)
+        self.medium = Table.objects.create(restaurant=self.restaurant, number=3, capacity=4)
+        self.reserved_at = evening()
+
+    def book(self, guests):
+        """Бронирование столика на guests гостей в reserved_at."""
+        reservation = Reservation(
+            restaurant=self.restaurant,
+            reserved_at=self.reserved_at,
+            guests=guests,
+            customer_name="test",
+            customer_contact="test",
+        )
+        return book_best_table(reservation)
+
+    def test_smallest_sufficient_table(self):
+        self.assertEqual(self.book(3).table, self.medium)
+        self.assertEqual(self.book(2).table, self.small)
+        # Столики на 2 и 4 гостя заняты, остается большой
+        self.assertEqual(self.book(2).table, self.large)
+
+    def test_unavailable_table_skipped(self):
+        self.medium.is_available = False
+        self.medium.save()
+        self.assertEqual(self.book(3).table, self.large)
+
+    def test_fully_booked_evening(self):
+        for _ in range(3):
+            self.book(2)
+        with self.assertRaises(NoFreeTable):
+            self.book(2)
+        self.assertEqual(Reservation.objects.filter(reserved_at=self.reserved_at).count(), 3)
+
+    def test_stale_allocator(self):
+        """Столик, занятый после загрузки занятости, пропускается и подбирается следующий."""
+        allocator = load_table_allocator(self.reserved_at, 3, restaurant_id=self.restaurant.pk)
+        Reservation.objects.create(
+            table=self.medium,
+            restaurant=self.restaurant,
+            reserved_at=self.reserved_at,
+            customer_name="test",
+            customer_contact="test",
+        )
+        reservation = Reservation(
+            restaurant=self.restaurant,
+            reserved_at=self.reserved_at,
+            guests=3,
+            customer_name="test",
+            customer_contact="test",
+        )
+        self.assertEqual(book_best_table(reservation, allocator).table, self.large)
+
+
+class BatchBookingTest(TestCase):
+    """Пакетное бронирование: проверка пересечений одним запросом и сохранение целиком или никак."""
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=restaurant, number=1, capacity=2)
+        self.other_table = Table.objects.create(restaurant=restaurant, number=2, capacity=4)
+        self.reserved_at = evening()
+
+    def batch(self, tables, reserved_at, weeks=1):
+        """Бронирования столиков tables по неделям, начиная с reserved_at."""
+        return [
+            Reservation(table=table, reserved_at=start, customer_name="test", customer_contact="test")
+            for table in tables
+            for start in weekly_recurrence(reserved_at, weeks)
+        ]
+
+    def save(self, table, reserved_at):
+        """Бронирование table, сохраненное до пакета."""
+        return book_table(
+            Reservation(table=table, reserved_at=reserved_at, customer_name="test", customer_contact="test")
+        )
+
+    def interval(self, table, minutes=0):
+        """Интервал бронирования table через minutes минут после reserved_at."""
+        return (table.pk, *get_reservation_period(self.reserved_at + timedelta(minutes=minutes)))
+
+    def test_conflicts_inside_batch(self):
+        intervals = [
+            self.interval(self.table),
+            self.interval(self.table),  # тот же столик на то же время
+            self.interval(self.other_table),
+            self.interval(self.table, 30),  # пересекается с первым
+            self.interval(self.table, 60),  # примыкает к первому
+        ]
+        self.assertEqual(find_conflicting_intervals(intervals), {1, 3})
+
+    def test_earlier_interval_wins(self):
+        """Из пересекающихся интервалов пакета допустим более ранний, независимо от порядка в пакете."""
+        intervals = [self.interval(self.table, 30), self.interval(self.table)]
+        self.assertEqual(find_conflicting_intervals(intervals), {0})
+
+    def test_conflict_with_saved_reservation(self):
+        self.save(self.table, self.reserved_at + timedelta(minutes=30))
+        intervals = [self.interval(self.table), self.interval(self.other_table), self.interval(self.table, 90)]
+        self.assertEqual(find_conflicting_intervals(intervals), {0})
+
+    def test_overlapping_weekly_series(self):
+        reservations = self.batch([self.table], self.reserved_at, weeks=4)
+        reservations += self.batch([self.table], self.reserved_at + timedelta(minutes=30), weeks=4)
+        with self.assertRaises(BatchConflict) as raised:
+            book_reservations(reservations)
+        self.assertEqual(raised.exception.conflicts, reservations[4:])
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_conflict_rolls_back_whole_batch(self):
+        third_week = weekly_recurrence(self.reserved_at, 3)[2]
+        existing = self.save(self.other_table, third_week + timedelta(minutes=30))
+        reservations = self.batch([self.table, self.other_table], self.reserved_at, weeks=4)
+        with self.assertRaises(BatchConflict) as raised:
+            book_reservations(reservations)
+        self.assertEqual(
+            [(reservation.table, reservation.reserved_at) for reservation in raised.exception.conflicts],
+            [(self.other_table, third_week)],
+        )
+        # Бронирования пакета без пересечений тоже не сохранены
+        self.assertEqual(list(Reservation.objects.all()), [existing])
+
+    def test_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            book_reservations(self.batch([self.table], self.reserved_at, weeks=2))
+        with CaptureQueriesContext(connection) as large:
+            book_reservations(
+                self.batch([self.table, self.other_table], self.reserved_at + timedelta(days=1), weeks=8)
+            )
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Reservation.objects.count(), 18)
+
+
+class ApiConditionalGetTest(TestCase):
+    """Условные GET-запросы к API: ETag строится по версиям столиков ресторана."""
+
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=self.restaurant, number=1, capacity=4)
+        self.user = User.objects.create(email="guest@example.com")
+        self.reserved_at = evening()
+        self.reservation = self.book(self.reserved_at)
+        self.client.force_login(self.user)
+        # ETag зависит и от текущего интервала времени: смена минуты во время теста не должна его менять
+        patcher = mock.patch("reservation.api.time_bucket", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def book(self, reserved_at):
+        """Бронирование столика пользователем на reserved_at."""
+        return book_table(
+            Reservation(
+                table=self.table,
+                reserved_at=reserved_at,
+                customer_name="test",
+                customer_contact="test",
+                owner=self.user,
+            )
+        )
+
+    def get(self, name, etag=None):
+        """GET-запрос к API name, условный при заданном etag."""
+        headers = {"If-None-Match": f'"{etag}"'} if etag else {}
+        today = timezone.localdate()
+        params = {"date_from": today, "date_to": today + timedelta(days=6)} if name == "api_availability" else {}
+        return self.client.get(reverse(f"reservation:{name}"), params, headers=headers)
+
+    def etags(self):
+        """Текущие ETag всех ответов API."""
+        return {
+            name: self.get(name)["ETag"].strip('"') for name in ("api_tables", "api_availability", "api_reservations")
+        }
+
+    def test_not_modified(self):
+        for name, etag in self.etags().items():
+            with self.subTest(name):
+                response = self.get(name, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(self.get(name, "stale").status_code, 200)
+
+    def assert_changed(self, change):
+        """Изменение change увеличивает версию столика и меняет ETag всех ответов."""
+        etags = self.etags()
+        version = Table.objects.get(pk=self.table.pk).version
+        change()
+        self.assertGreater(Table.objects.get(pk=self.table.pk).version, version)
+        for name, etag in etags.items():
+            with self.subTest(name):
+                self.assertEqual(self.get(name, etag).status_code, 200)
+
+    def test_booking_changes_etag(self):
+        self.assert_changed(lambda: self.book(self.reserved_at + timedelta(days=1)))
+
+    def test_edit_changes_etag(self):
+        def edit():
+            self.reservation.reserved_at += timedelta(hours=2)
+            self.reservation.save()
+
+        self.assert_changed(edit)
+
+    def test_delete_changes_etag(self):
+        self.assert_changed(self.reservation.delete)
+
+    def test_table_change_changes_etag(self):
+        def change_table():
+            self.table.capacity = 6
+            self.table.save()
+
+        self.assert_changed(change_table)
+
+
+class DatabaseRoutingTest(SimpleTestCase):
+    """Выбор БД маршрутизатором: реплики для чтения, основная БД после записи и БД ресторанов.
+
+    Реплики и БД ресторанов задаются подменой настроек: маршрутизатор выбирает псевдоним,
+    не подключаясь к нему, поэтому запросы в тесте не выполняются.
+    """
+
+    databases = {"default"}
+    replicas = {"replica": {"primary": "default"}, "lagging": {"primary": "default"}}
+
+    def setUp(self):
+        patcher = mock.patch.dict(replica_lag, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_lag(self, **lags):
+        """Отставание реплик в секундах по результатам только что выполненной проверки."""
+        for alias, lag in lags.items():
+            replica_lag[alias] = (lag, monotonic())
+
+    def middleware(self, request):
+        """Ответ ReplicaMiddleware на request и БД, из которой во время запроса читаются бронирования."""
+        databases = []
+
+        def get_response(request):
+            databases.append(Reservation.objects.all().db)
+            return HttpResponse()
+
+        return ReplicaMiddleware(get_response)(request), databases[0]
+
+    def test_reads_go_to_replica(self):
+        with self.settings(DATABASE_REPLICAS=self.replicas):
+            self.set_lag(replica=0, lagging=0)
+            for seed, alias in ((0, "replica"), (0.99, "lagging")):
+                with self.subTest(seed), use_replicas(seed):
+                    self.assertEqual(Reservation.objects.all().db, alias)
+                    self.assertEqual(User.objects.all().db, alias)
+                    self.assertEqual(router.db_for_write(Reservation), "default")
+                    with transaction.atomic():
+                        self.assertEqual(Reservation.objects.all().db, "default")
+            # Без разрешения запроса чтение идет из основной БД
+            self.assertEqual(Reservation.objects.all().db, "default")
+
+    def test_lagging_replica_skipped(self):
+        with self.settings(DATABASE_REPLICAS=self.replicas, REPLICA_MAX_LAG=5, REPLICA_LAG_CHECK_INTERVAL=5):
+            self.set_lag(replica=1, lagging=60)
+            for seed in (0, 0.99):
+                with self.subTest(seed), use_replicas(seed):
+                    self.assertEqual(Reservation.objects.all().db, "replica")
+
+            # Реплика, проверка которой давно не завершалась, тоже не используется
+            replica_lag["replica"] = (0, monotonic() - 10)
+            with use_replicas(0):
+                self.assertEqual(Reservation.objects.all().db, "default")
+
+    def test_write_pins_primary(self):
+        factory = RequestFactory()
+        with self.settings(DATABASE_REPLICAS=self.replicas, REPLICA_PIN_SECONDS=15):
+            self.set_lag(replica=0, lagging=0)
+            self.assertIn(self.middleware(factory.get("/"))[1], self.replicas)
+
+            response, database = self.middleware(factory.post("/"))
+            self.assertEqual(database, "default")
+            cookie = response.cookies[ReplicaMiddleware.pin_cookie]
+            self.assertEqual(cookie["max-age"], 15)
+
+            factory.cookies[ReplicaMiddleware.pin_cookie] = cookie.value
+            response, database = self.middleware(factory.get("/"))
+            self.assertEqual(database, "default")
+            self.assertNotIn(ReplicaMiddleware.pin_cookie, response.cookies)
+
+    def test_restaurant_database(self):
+        routes = {
+            "RESTAURANT_DATABASES": {"second": {"restaurants": [7]}},
+            "RESTAURANT_DATABASE_ROUTES": {7: "second"},
+        }
+        with self.settings(**routes):
+            with use_restaurant(7):
+                self.assertEqual(Reservation.objects.all().db, "second")
+                self.assertEqual(Table.objects.all().db, "second")
+                # Пользователи и рестораны общие
+                self.assertEqual(User.objects.all().db, "default")
+                self.assertEqual(Restaurant.objects.all().db, "default")
+            with use_restaurant(8):
+                self.assertEqual(Reservation.objects.all().db, "default")
+
+            # Объект записывается в БД своего ресторана независимо от текущего
+            self.assertEqual(router.db_for_write(Reservation, instance=Reservation(restaurant_id=7)), "second")
+            self.assertEqual(router.db_for_write(Reservation, instance=Reservation(restaurant_id=8)), "default")
+            reservation = Reservation(restaurant_id=7)
+            reservation._state.db = "second"
+            user = User(email="guest@example.com")
+            user._state.db = "default"
+            self.assertTrue(router.allow_relation(reservation, user))
+
+
+class OccupancyRollupTest(TestCase):
+    """Почасовая занятость, обновляемая при каждом изменении бронирований, совпадает с пересчетом с нуля."""
+
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Тест", description="")
+        self.table = Table.objects.create(restaurant=restaurant, number=1, capacity=4)
+        self.other_table = Table.objects.create(restaurant=restaurant, number=2, capacity=6)
+        # Начало не на границе часа: бронирование делится между двумя часами
+        self.reserved_at = evening(hour=18) + timedelta(minutes=30)
+
+    def rollups(self):
+        """Ненулевая почасовая занятость: {(столик, час): (час недели, минуты, гостеминуты, бронирования)}.
+
+        Строки, обнуленные вычитанием удаленных и перенесенных бронирований, на отчеты не влияют.
+        """
+        return {
+            (rollup.table_id, rollup.hour): (
+                rollup.week_hour,
+                rollup.booked_minutes,
+                rollup.guest_minutes,
+                rollup.reservations,
+            )
+            for rollup in OccupancyRollup.objects.all()
+            if rollup.booked_minutes or rollup.reservations
+        }
+
+    def assert_matches_rebuild(self):
+        """Текущая занятость равна пересчитанной rebuild_rollups за период всех бронирований."""
+        incremental = self.rollups()
+        rebuild_rollups(self.reserved_at - timedelta(days=2), self.reserved_at + timedelta(weeks=4))
+        self.assertEqual(incremental, self.rollups())
+        return incremental
+
+    def book(self, table, reserved_at, guests):
+        return book_table(
+            Reservation(
+                table=table, reserved_at=reserved_at, guests=guests, customer_name="test", customer_contact="test"
+            )
+        )
+
+    def test_create_update_delete(self):
+        reservation = self.book(self.table, self.reserved_at, 2)
+        self.book(self.table, self.reserved_at + timedelta(hours=1), 3)  # примыкает к первому
+        self.book(self.other_table, self.reserved_at + timedelta(minutes=15), 5)
+        self.assertTrue(self.assert_matches_rebuild())
+
+        changes = (
+            ("время", {"reserved_at": self.reserved_at - timedelta(minutes=45)}),
+            ("столик", {"table": self.other_table}),
+            ("гости", {"guests": 4}),
+            (
+                "столик, время и гости",
+                {"table": self.table, "reserved_at": self.reserved_at + timedelta(days=1), "guests": 1},
+            ),
+        )
+        for label, fields in changes:
+            with self.subTest(label):
+                reservation = Reservation.objects.get(pk=reservation.pk)
+                for name, value in fields.items():
+                    setattr(reservation, name, value)
+                book_table(reservation)
+                self.assert_matches_rebuild()
+
+        reservation.delete()
+        self.assert_matches_rebuild()
+        Reservation.objects.filter(table=self.other_table).delete()
+        self.assert_matches_rebuild()
+
+    def test_batch_booking(self):
+        book_reservations(
+            [
+                Reservation(table=table, reserved_at=start, guests=2, customer_name="test", customer_contact="test")
+                for table in (self.table, self.other_table)
+                for start in weekly_recurrence(self.reserved_at, 3)
+            ]
+        )
+        self.assertEqual(len(self.assert_matches_rebuild()), 12)
+
+
+class PageCacheKeyTest(TestCase):
+    """Ключ кэша страниц не зависит от параметров запроса, которые страницу не меняют."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_key_ignores_other_params(self):
+        factory = RequestFactory()
+        key = page_cache_key(factory.get("/about/"))
+        self.assertEqual(page_cache_key(factory.get("/about/", {"utm_source": "mail", "_": "123"})), key)
+        self.assertNotEqual(page_cache_key(factory.get("/team/")), key)
+
+        params = ("page",)
+        with_page = page_cache_key(factory.get("/about/", {"page": 2, "utm_source": "mail"}), params)
+        self.assertEqual(page_cache_key(factory.get("/about/", {"page": 2}), params), with_page)
+        self.assertNotEqual(page_cache_key(factory.get("/about/", {"page": 3}), params), with_page)
+        self.assertEqual(page_cache_key(factory.get("/about/", {"utm_source": "mail"}), params), key)
+
+    def test_one_cached_copy(self):
+        url = reverse("reservation:about")
+        self.client.get(url, {"utm_source": "mail"})
+        self.assertIsNotNone(cache.get(page_cache_key(RequestFactory().get(url))))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {"utm_source": "ads"}).status_code, 200)
@@ -1,19 +1,24 @@
 from django.urls import path
 
+from reservation.api import AvailabilityApiView, ReservationApiView, TableApiView
 from reservation.apps import ReservationConfig
 from reservation.views import (
     AboutView,
+    AvailabilityView,
     Contacts,
+    DatabasePoolStatsView,
     Feedback,
     MainView,
     Mission,
     PersonalAccountListView,
     ReservationCreateView,
+    ReservationBatchView,
     ReservationDeleteView,
     ReservationListView,
     ReservationUpdateView,
     Services,
     Team,
+    WaitlistCreateView,
     History,
 )
 
@@ -30,6 +35,9 @@ urlpatterns = [
     path("history/", History.as_view(), name="history"),
     path("team/", Team.as_view(), name="team"),
     path("reservation/", ReservationListView.as_view(), name="reservation_list"),
+    path("reservation/availability/", AvailabilityView.as_view(), name="availability"),
+    path("reservation/batch/", ReservationBatchView.as_view(), name="reservation_batch"),
+    path("reservation/waitlist/", WaitlistCreateView.as_view(), name="waitlist"),
     path(
         "reservation/create/",
         ReservationCreateView.as_view(),
@@ -45,5 +53,9 @@ urlpatterns = [
         ReservationDeleteView.as_view(),
         name="reservation_delete",
     ),
+    path("api/tables/", TableApiView.as_view(), name="api_tables"),
+    path("api/availability/", AvailabilityApiView.as_view(), name="api_availability"),
+    path("api/reservations/", ReservationApiView.as_view(), name="api_reservations"),
+    path("metrics/db-pool/", DatabasePoolStatsView.as_view(), name="db_pool_stats"),
     path("personal_account/", PersonalAccountListView.as_view(), name="personal_account"),
 ]
@@ -1,16 +1,33 @@
-from datetime import timedelta
-
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from django.contrib.auth.mixins import LoginRequiredMixin,PermissionRequiredMixin
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
 from django.utils import timezone
-from django.views.generic import CreateView, DeleteView, ListView, TemplateView, UpdateView
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser, IsAuthenticated
-
-from reservation.forms import ReservationForm
-from reservation.models import Reservation, Restaurant
+from django.utils.dateparse import parse_date
+from django.views.generic import CreateView, DeleteView, FormView, TemplateView, UpdateView, View
+
+from config.routers import get_current_restaurant
+from reservation.cache import AnonymousPageCacheMixin
+from reservation.db_pool import get_all_pool_stats
+from reservation.forms import BatchReservationForm, ReservationForm, WaitlistForm
+from reservation.models import RESERVATION_DURATION, Reservation, Restaurant, WaitlistEntry
+from reservation.pagination import KeysetPaginationMixin
+from reservation.services import (
+    BatchConflict,
+    NoFreeTable,
+    ReservationConflict,
+    aavailability_grid,
+    book_reservations,
+    book_table,
+)
+from users.services import aget_user_roles
+
+# Максимальный период, за который можно запросить сетку свободных столиков
+MAX_AVAILABILITY_DAYS = 14
 
 
 def home(request):
@@ -22,6 +39,7 @@ class Contacts(TemplateView):
     """Cтраница контакты."""
 
     template_name = "reservation/contacts.html"
+    query_budget = 3
 
     def post(self, request, *args, **kwargs):
         """Обработка POST-запроса ответа на обратную связь."""
@@ -34,59 +52,86 @@ class Contacts(TemplateView):
         return render(request, self.template_name)
 
 
-class Feedback(TemplateView):
+class Feedback(AnonymousPageCacheMixin, TemplateView):
     """Cтраница обратной связи."""
 
     template_name = "reservation/feedback.html"
+    query_budget = 2
 
 
-class MainView(TemplateView):
+class MainView(AnonymousPageCacheMixin, TemplateView):
     """Главная страница."""
 
     model = Restaurant
     template_name = "reservation/main.html"
+    query_budget = 2
 
 
-class AboutView(TemplateView):
+class AboutView(AnonymousPageCacheMixin, TemplateView):
     """Страница о ресторане."""
 
     model = Restaurant
     template_name = "reservation/about.html"
+    query_budget = 2
+
+
+def restaurant_reservations():
+    """Бронирования текущего ресторана вместе со столиками."""
+    return Reservation.objects.select_related("table").filter(restaurant_id=get_current_restaurant())
+
+
+def upcoming_reservations():
+    """Текущие и предстоящие бронирования текущего ресторана вместе со столиками."""
+    # Условие по reserved_at, а не по ends_at, чтобы использовать индекс по ресторану и дате бронирования
+    return restaurant_reservations().filter(reserved_at__gt=timezone.now() - RESERVATION_DURATION)
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """LoginRequiredMixin для асинхронных представлений.
 
+    Пользователь загружается через request.auser() и сохраняется в request.user,
+    чтобы шаблоны не обращались к БД синхронно.
+    """
 
-class ReservationListView(LoginRequiredMixin,ListView):
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class ReservationListView(AsyncLoginRequiredMixin, KeysetPaginationMixin, View):
     """Страница бронирования."""
 
-    model = Reservation
     template_name = "reservation/reservation_list.html"
-    context_object_name = "reservation"
     success_url = reverse_lazy("reservation:reservation_list")
     form_class = ReservationForm
+    query_budget = 10
 
+    async def get(self, request, *args, **kwargs):
+        """Форма бронирования и страница предстоящих бронирований."""
+        show_all = "admin" in (await aget_user_roles(request.user))["groups"]
+        page = await self.aget_keyset_page(self.get_queryset(show_all))
+        context = {**page, "reservation": page["object_list"], "form": self.form_class(), "view": self}
+        return TemplateResponse(request, self.template_name, context)
 
-    def get_object(self, queryset=None):
-        """Получение одного объекта."""
-        self.object = super().get_object(queryset)
-        self.object.save()
-        if self.request.user == self.object.owner:
-            self.object.save()
-            return self.object
-        raise PermissionRequiredMixin
+    async def post(self, request, *args, **kwargs):
+        """Обработка POST-запроса."""
+        # Формы и транзакции синхронные, поэтому бронирование выполняется в отдельном потоке
+        response = await sync_to_async(self.create_reservation)(request)
+        return response or await self.get(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        """Добавление данных в контекст шаблона."""
-        context = super().get_context_data(**kwargs)
-        context["form"] = ReservationForm()
-        return context
+    def create_reservation(self, request):
+        """Бронирование столика из данных формы.
 
-    def post(self, request, *args, **kwargs):
-        """Обработка POST-запроса."""
+        Возвращает перенаправление после успешного бронирования или None,
+        если нужно снова показать страницу с сообщением об ошибке.
+        """
         form = self.form_class(request.POST)
 
         if form.is_valid():
             reservation = form.save(commit=False)
             reservation.owner = request.user
-            reservation.save()
 
             # Проверка, находится ли время бронирования в прошлом
             if reservation.reserved_at and reservation.reserved_at < timezone.now():
@@ -94,43 +139,116 @@ class ReservationListView(LoginRequiredMixin,ListView):
                     request,
                     "Дата бронирования не может быть в прошлом. Пожалуйста, выберите другое время.",
                 )
-                return self.get(request, *args, **kwargs)  # Возврат на ту же страницу
-
-            # Проверка интервала бронирования (60 минут после)
-            reserved_at = reservation.reserved_at
-            start_time = reserved_at - timedelta(minutes=60)
-            end_time = reserved_at
-
+                return None
 
-            # Проверка, есть ли уже бронирования в этом интервале
-            interval_reservation = Reservation.objects.filter(reserved_at__range=(start_time, end_time)).exclude(
-                id=reservation.id
-            )  # Исключаем текущее бронирование, если оно уже существует
-
-            if interval_reservation.exists():
+            # Проверка, свободен ли выбранный (или подобранный) столик, и сохранение в одной транзакции
+            try:
+                book_table(reservation)
+            except NoFreeTable:
+                messages.error(
+                    request,
+                    f"К сожалению, на это время нет свободного столика на {reservation.guests} гостей. "
+                    "Выберите другое время или встаньте в лист ожидания.",
+                )
+                return None
+            except ReservationConflict:
                 messages.error(
                     request,
                     "К сожалению, на это время уже занято. Выберите другой стол или дату.",
                 )
-                return self.get(request, *args, **kwargs)  # Возврат на ту же страницу
+                return None
 
-            # Если все проверки пройдены, сохраняем бронирование
-            reservation.save()
             messages.success(request, "Ваше бронирование успешно зарегистрировано!")
             return redirect(self.success_url)  # Перенаправление на страницу с успешным бронированием
 
+        # Ошибки выбора столика и количества гостей показываются как есть
+        for field in ("guests", "table"):
+            for error in form.errors.get(field, []):
+                messages.error(request, error)
+        if "guests" in form.errors or "table" in form.errors:
+            return None
+
         # Если форма не прошла валидацию, отправляем общее сообщение об ошибке
         messages.error(
             request,
             "К сожалению, на это время уже занято. Выберите другой стол или дату",
         )
-        return self.get(request, *args, **kwargs)  # Возврат на ту же страницу
+        return None
+
+    def get_queryset(self, show_all=False):
+        """Предстоящие бронирования: все для администратора (show_all), иначе только свои."""
+        qs = upcoming_reservations()
+        if not show_all:
+            qs = qs.filter(owner=self.request.user)
+        return self.paginate_keyset(qs)
+
+
+class AvailabilityView(View):
+    """Свободные и занятые слоты всех столиков за период в формате JSON."""
+
+    query_budget = 2
+
+    async def get(self, request, *args, **kwargs):
+        """Обработка GET-запроса с параметрами date_from, date_to и guests."""
+        try:
+            date_from, date_to, guests = get_availability_params(request)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        grid = await aavailability_grid(date_from, date_to, guests=guests)
+        return JsonResponse(availability_payload(grid, date_from, date_to))
+
+
+def get_availability_params(request):
+    """Период и количество гостей из параметров запроса; ValueError с текстом ошибки при некорректных значениях."""
+    today = timezone.localdate()
+    try:
+        date_from = parse_date(request.GET.get("date_from", "")) or today
+        date_to = parse_date(request.GET.get("date_to", "")) or date_from
+        guests = int(request.GET.get("guests") or 0)
+    except ValueError:
+        raise ValueError("Некорректные параметры запроса.") from None
+    if date_to < date_from or (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+        raise ValueError(f"Период должен быть от 1 до {MAX_AVAILABILITY_DAYS} дней.")
+    return date_from, date_to, guests
+
+
+def availability_payload(grid, date_from, date_to):
+    """Сетка занятости в виде, пригодном для JSON-ответа."""
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "slots": grid["slots"],
+        "tables": [
+            {
+                "id": table["id"],
+                "number": table["number"],
+                "capacity": table["capacity"],
+                "is_available": table["is_available"],
+                "busy": busy.tolist(),
+                "free": free.tolist(),
+            }
+            for table, busy, free in zip(grid["tables"], grid["busy"], grid["free"])
+        ],
+    }
+
+
+class DatabasePoolStatsView(UserPassesTestMixin, View):
+    """Статистика пулов соединений с БД процесса, обработавшего запрос (только для персонала).
+
+    Ожидание соединения (requests_wait_ms, wait_avg_ms) и насыщенность пула (saturation)
+    показывают, хватает ли DB_POOL_MAX_SIZE под нагрузку.
+    """
+
+    # Пользователь сессии, если его нет в кэше
+    query_budget = 1
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        """Обработка GET-запроса."""
+        return JsonResponse({"pools": get_all_pool_stats()})
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        if self.request.user.groups.filter(name='admin').exists():
-            return qs
-        return qs.filter(owner=self.request.user)
 
 class ReservationCreateView(LoginRequiredMixin, CreateView):
     """Страница создания бронирования."""
@@ -139,13 +257,69 @@ class ReservationCreateView(LoginRequiredMixin, CreateView):
     form_class = ReservationForm
     template_name = "reservation/reservation_list.html"
     success_url = reverse_lazy("reservation:reservation_list")
+    query_budget = 10
 
 
     def form_valid(self, form):
         form.instance.owner = self.request.user
+        if form.instance.reserved_at < timezone.now():
+            messages.error(self.request, "Дата бронирования не может быть в прошлом.")
+            return self.form_invalid(form)
+        try:
+            self.object = book_table(form.instance)
+        except NoFreeTable:
+            messages.error(self.request, "К сожалению, на это время нет свободного столика на столько гостей.")
+            return self.form_invalid(form)
+        except ReservationConflict:
+            messages.error(self.request, "К сожалению, на это время уже занято.")
+            return self.form_invalid(form)
+        return redirect(self.get_success_url())
+
+
+
+class ReservationBatchView(LoginRequiredMixin, FormView):
+    """Пакетное бронирование нескольких столиков и/или на несколько недель вперед."""
+
+    form_class = BatchReservationForm
+    template_name = "reservation/reservation_batch.html"
+    success_url = reverse_lazy("reservation:personal_account")
+    query_budget = 8
+
+    def form_valid(self, form):
+        """Проверка и сохранение всего пакета; при пересечениях не сохраняется ничего."""
+        try:
+            reservations = book_reservations(form.get_reservations(self.request.user))
+        except BatchConflict as error:
+            busy = ", ".join(
+                f"№{reservation.table.number} {timezone.localtime(reservation.reserved_at):%d.%m.%Y %H:%M}"
+                for reservation in error.conflicts[:10]
+            )
+            more = f" и еще {len(error.conflicts) - 10}" if len(error.conflicts) > 10 else ""
+            form.add_error(None, f"Уже заняты: {busy}{more}. Ничего не забронировано.")
+            return self.form_invalid(form)
+        except ReservationConflict:
+            form.add_error(None, "К сожалению, часть столиков только что заняли. Ничего не забронировано.")
+            return self.form_invalid(form)
+        messages.success(self.request, f"Забронировано: {len(reservations)}.")
         return super().form_valid(form)
 
 
+class WaitlistCreateView(LoginRequiredMixin, CreateView):
+    """Запись в лист ожидания: при отмене или переносе подходящего бронирования гостю придет письмо."""
+
+    model = WaitlistEntry
+    form_class = WaitlistForm
+    template_name = "reservation/waitlist_form.html"
+    success_url = reverse_lazy("reservation:personal_account")
+    query_budget = 4
+
+    def form_valid(self, form):
+        form.instance.owner = self.request.user
+        form.instance.restaurant_id = self.request.restaurant_id
+        response = super().form_valid(form)
+        messages.success(self.request, "Вы в листе ожидания. Мы напишем, как только освободится подходящий столик.")
+        return response
+
 
 class ReservationUpdateView(UpdateView, ):
     """Страница редактирование бронирования."""
@@ -155,6 +329,8 @@ class ReservationUpdateView(UpdateView, ):
     template_name = "reservation/reservation_list.html"
     context_object_name = "reservation"
     success_url = reverse_lazy("reservation:personal_account")
+    # Включая предложение прежнего слота листу ожидания после переноса (5 запросов)
+    query_budget = 14
 
 
     def get_object(self, queryset=None):
@@ -179,24 +355,18 @@ class ReservationUpdateView(UpdateView, ):
             messages.error(self.request, "Дата бронирования не может быть в прошлом.")
             return self.form_invalid(form)
 
-        # Проверка интервала бронирования (60 минут после)
-        reserved_at = reservation.reserved_at
-        start_time = reserved_at
-        end_time = start_time + timedelta(minutes=60)
-
-        # Проверка, есть ли уже бронирования в этом интервале
-        interval_reservation = Reservation.objects.filter(reserved_at__range=(start_time, end_time)).exclude(
-            id=reservation.id
-        )  # Исключаем текущее бронирование
-
-        if interval_reservation.exists():
+        # Проверка, свободен ли выбранный столик, и сохранение в одной транзакции
+        try:
+            self.object = book_table(reservation)
+        except NoFreeTable:
+            messages.error(self.request, "К сожалению, на это время нет свободного столика на столько гостей.")
+            return self.form_invalid(form)
+        except ReservationConflict:
             messages.error(self.request, "К сожалению, на это время уже занято.")
             return self.form_invalid(form)
 
-        # Если все проверки пройдены, сохраняем бронирование
-        reservation.save()
         messages.success(self.request, "Бронирование успешно обновлено!")
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 
 class ReservationDeleteView(DeleteView):
@@ -204,50 +374,70 @@ class ReservationDeleteView(DeleteView):
 
     model = Reservation
     success_url = reverse_lazy("reservation:personal_account")
+    # Включая предложение освободившегося слота листу ожидания (5 запросов)
+    query_budget = 10
 
 
     def get_object(self, queryset=None):
         """Получение одного объекта."""
         self.object = super().get_object(queryset)
         if self.request.user == self.object.owner:
-            self.object.save()
             return self.object
         raise PermissionRequiredMixin
 
 
-class PersonalAccountListView(ListView):
+class PersonalAccountListView(AsyncLoginRequiredMixin, KeysetPaginationMixin, View):
     """Cтраница личного кабинета"""
 
-    model = Reservation
     template_name = "reservation/personal_account.html"
+    query_budget = 3
+
+    def setup(self, request, *args, **kwargs):
+        """Выбор периода: предстоящие бронирования или история (period=past)."""
+        super().setup(request, *args, **kwargs)
+        self.show_past = request.GET.get("period") == "past"
+        self.descending = self.show_past
+
+    async def get(self, request, *args, **kwargs):
+        """Страница бронирований пользователя за выбранный период."""
+        page = await self.aget_keyset_page(self.get_queryset())
+        context = {**page, "show_past": self.show_past, "view": self}
+        return TemplateResponse(request, self.template_name, context)
 
     def get_queryset(self):
         """Набор данных, для отображения в представлении."""
 
-        # Фильтруем по владельцу и сортируем по дате и столику
-        queryset = Reservation.objects.filter(owner=self.request.user).order_by("reserved_at", "table")
-        return queryset
+        # Фильтруем по владельцу, по умолчанию только предстоящие бронирования
+        if self.show_past:
+            queryset = restaurant_reservations().filter(reserved_at__lte=timezone.now() - RESERVATION_DURATION)
+        else:
+            queryset = upcoming_reservations()
+        return self.paginate_keyset(queryset.filter(owner=self.request.user))
 
 
-class Services(TemplateView):
+class Services(AnonymousPageCacheMixin, TemplateView):
     """Cтраница услуги."""
 
     template_name = "reservation/services.html"
+    query_budget = 2
 
 
-class Mission(TemplateView):
+class Mission(AnonymousPageCacheMixin, TemplateView):
     """Cтраница миссия и ценности."""
 
     template_name = "reservation/mission.html"
+    query_budget = 2
 
 
-class Team(TemplateView):
+class Team(AnonymousPageCacheMixin, TemplateView):
     """Cтраница команда."""
 
     template_name = "reservation/team.html"
+    query_budget = 2
 
 
-class History(TemplateView):
+class History(AnonymousPageCacheMixin, TemplateView):
     """Cтраница истории."""
 
     template_name = "reservation/history.html"
+    query_budget = 2
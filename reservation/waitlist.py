@@ -0,0 +1,73 @@
+from django.contrib.postgres.fields import RangeBoundary
+from django.db import transaction
+from django.utils import timezone
+
+from config.routers import restaurant_database, use_restaurant
+from reservation.models import Table, TsTzRange, WaitlistEntry
+from reservation.services import is_table_free
+from users.services import queue_mail
+
+
+def waiting_entries(restaurant_id, start, capacity):
+    """Ожидающие гости ресторана, которым подходит начало бронирования start за столиком вместимостью capacity.
+
+    Условие совпадает с выражением частичного GiST-индекса waitlist_restaurant_window_idx,
+    поэтому подходящие записи находятся поиском по индексу, а не перебором листа ожидания.
+    """
+    return WaitlistEntry.objects.annotate(
+        window=TsTzRange("desired_from", "desired_to", RangeBoundary(inclusive_lower=True, inclusive_upper=True))
+    ).filter(
+        restaurant_id=restaurant_id, status=WaitlistEntry.STATUS_WAITING, window__contains=start, guests__lte=capacity
+    )
+
+
+def match_freed_slot(restaurant_id, table_id, reserved_at):
+    """Предложение освободившегося столика table_id ресторана с началом в reserved_at лучшему из ожидающих.
+
+    Лучший - самая большая компания, которая помещается за столиком (меньше пустых мест),
+    а среди равных - вставший в очередь раньше. Запись блокируется с SKIP LOCKED, поэтому
+    одновременные отмены не предложат одной компании два столика. Письмо ставится в
+    очередь и отправляется командой send_outbox. Возвращает запись или None.
+    """
+    if reserved_at <= timezone.now():
+        return None
+    with use_restaurant(restaurant_id):
+        return offer_freed_slot(restaurant_id, table_id, reserved_at)
+
+
+def offer_freed_slot(restaurant_id, table_id, reserved_at):
+    """Поиск ожидающего и запись предложения в БД ресторана (см. match_freed_slot)."""
+    table = Table.objects.filter(pk=table_id, is_available=True).values("number", "capacity").first()
+    if table is None or not is_table_free(table_id, reserved_at):
+        return None
+
+    with transaction.atomic(using=restaurant_database(restaurant_id)):
+        entry = (
+            waiting_entries(restaurant_id, reserved_at, table["capacity"])
+            .select_related("owner")
+            .select_for_update(of=("self",), skip_locked=True)
+            .order_by("-guests", "created_at")
+            .first()
+        )
+        if entry is None:
+            return None
+        entry.status = WaitlistEntry.STATUS_NOTIFIED
+        entry.offered_table_id = table_id
+        entry.offered_at = reserved_at
+        entry.notified_at = timezone.now()
+        entry.save(update_fields=["status", "offered_table", "offered_at", "notified_at"])
+        notify_waitlist_entry(entry, table["number"])
+    return entry
+
+
+def notify_waitlist_entry(entry, table_number):
+    """Письмо гостю из листа ожидания о том, что для него освободился столик."""
+    when = f"{timezone.localtime(entry.offered_at):%d.%m.%Y %H:%M}"
+    queue_mail(
+        subject="Освободился столик в ресторане 'НеРесторан'",
+        message=(
+            f"Здравствуйте, {entry.customer_name}! Освободился столик №{table_number} на {entry.guests} гостей "
+            f"на {when}. Забронируйте его на сайте в разделе «Бронирование», пока его не занял кто-то другой."
+        ),
+        recipient_list=[entry.owner.email],
+    )
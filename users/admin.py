@@ -1,8 +1,30 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import EmailVerificationToken, ImageVariantJob, OutgoingEmail, User
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ("id", "email", "first_name", "last_name", "phone_number")
+
+
+@admin.register(EmailVerificationToken)
+class EmailVerificationTokenAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "created_at", "expires_at", "used_at")
+    search_fields = ("user__email",)
+    list_select_related = ("user",)
+    readonly_fields = ("token_hash",)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "subject", "recipients", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+
+
+@admin.register(ImageVariantJob)
+class ImageVariantJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "path", "status", "attempts", "created_at", "processed_at")
+    list_filter = ("status",)
+    search_fields = ("path",)
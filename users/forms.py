@@ -1,11 +1,13 @@
 from django.contrib.auth.forms import PasswordResetForm, SetPasswordForm, UserChangeForm, UserCreationForm
 from django.forms import ModelForm
+from django.template import loader
 from django.urls import reverse_lazy
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 from reservation.forms import StyleFormMixin
 from users.models import User
+from users.services import queue_mail
 
 
 class UserRegisterForm(StyleFormMixin, UserCreationForm):
@@ -95,6 +97,25 @@ class UserForgotPasswordForm(PasswordResetForm):
         for k, v in self.Meta.labels.items():
             self[k].label = v
 
+    def send_mail(
+        self,
+        subject_template_name,
+        email_template_name,
+        context,
+        from_email,
+        to_email,
+        html_email_template_name=None,
+    ):
+        """Постановка письма для восстановления пароля в очередь отправки."""
+        subject = loader.render_to_string(subject_template_name, context)
+        # Тема письма не должна содержать переносов строк
+        subject = "".join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_message = None
+        if html_email_template_name is not None:
+            html_message = loader.render_to_string(html_email_template_name, context)
+        queue_mail(subject, body, [to_email], from_email=from_email, html_message=html_message)
+
 
 class UserSetNewPasswordForm(SetPasswordForm):
     """Форма изменения пароля пользователя после подтверждения."""
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from reservation.partitions import ARCHIVE_SCHEMA, archive_partition, get_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    """Отключение старых месячных секций бронирований."""
+
+    help = (
+        f"Отключает секции бронирований за месяцы до --before и переносит их в схему {ARCHIVE_SCHEMA} "
+        "или удаляет при --drop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="Первый сохраняемый месяц, например 2024-01")
+        parser.add_argument("--drop", action="store_true", help="Удалить секции вместо переноса в архивную схему")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать секции, которые будут отключены")
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="БД или схема ресторанов, по умолчанию default"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            year, month = map(int, options["before"].split("-")[:2])
+            before = date(year, month, 1)
+        except ValueError as error:
+            raise CommandError(f"Некорректный месяц: {options['before']}") from error
+        using = options["database"]
+        if not is_partitioned(using):
+            raise CommandError("Таблица бронирований не секционирована, примените миграции")
+
+        months = [month for month in get_partitions(using) if month < before]
+        for month in months:
+            if options["dry_run"]:
+                self.stdout.write(f"Будет отключена секция за {month:%Y-%m}")
+                continue
+            name = archive_partition(month, drop=options["drop"], using=using)
+            self.stdout.write(f"{'Удалена' if options['drop'] else 'Перенесена в архив'} секция {name}")
+        self.stdout.write(self.style.SUCCESS(f"Обработано секций: {len(months)}"))
@@ -0,0 +1,272 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+from itertools import count
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import Client
+from django.urls import URLPattern, resolve, reverse
+from django.middleware.csrf import CSRF_SECRET_LENGTH
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from config.routers import use_restaurant
+from reservation import urls as reservation_urls
+from reservation.models import RESERVATION_DURATION, Reservation, Table
+from reservation.query_budget import QueryRecorder, get_view_budget
+from reservation.restaurants import RESTAURANT_PARAM, command_restaurant
+from reservation.seed import seed_reservations, seed_tables
+from users import urls as users_urls
+from users.models import User
+
+# Значения параметров маршрутов по имени параметра
+SAMPLE_KWARGS = {
+    "token": "bench",
+    "uidb64": "MA",
+}
+
+
+class Command(BaseCommand):
+    """Нагрузочный замер всех маршрутов reservation и users на тестовых данных."""
+
+    help = "Заполняет базу тестовыми данными и замеряет задержки, RPS и количество запросов к БД по маршрутам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tables", type=int, default=50, help="Количество создаваемых столиков")
+        parser.add_argument("--reservations", type=int, default=10000, help="Количество создаваемых бронирований")
+        parser.add_argument("--users", type=int, default=10, help="Количество одновременных пользователей")
+        parser.add_argument("--requests", type=int, default=200, help="Количество запросов к каждому маршруту")
+        parser.add_argument("--output", default="bench.json", help="Файл для результатов в формате JSON")
+        parser.add_argument("--compare", help="Файл с предыдущими результатами для сравнения")
+        parser.add_argument("--keep", action="store_true", help="Не удалять тестовые данные после замера")
+        parser.add_argument(
+            "--base-url",
+            help="Адрес запущенного сервера (gunicorn WSGI или ASGI), например http://127.0.0.1:8000. "
+            "По умолчанию запросы выполняются тестовым клиентом внутри процесса",
+        )
+        parser.add_argument("--routes", nargs="*", help="Замерять только маршруты, имя которых содержит подстроку")
+        parser.add_argument("--restaurant", type=int, help="id ресторана, по умолчанию ресторан по умолчанию сайта")
+
+    def handle(self, *args, **options):
+        users = [
+            User.objects.create(email=f"bench-{index}-{time.time_ns()}@bench.local", is_active=True)
+            for index in range(options["users"])
+        ]
+        # Данные создаются в ресторане, который выбирают запросы замера (cookie restaurant)
+        self.restaurant_id = command_restaurant(options["restaurant"])
+        with use_restaurant(self.restaurant_id):
+            tables = seed_tables(options["tables"])
+            seed_reservations(tables, options["reservations"], owners=users)
+            try:
+                sample = Reservation.objects.filter(owner=users[0]).latest("reserved_at")
+                routes = self.get_routes(sample, tables)
+                if options["routes"]:
+                    routes = {
+                        name: route
+                        for name, route in routes.items()
+                        if any(part in name for part in options["routes"])
+                    }
+                results = {name: self.run_route(users, options, *route) for name, route in routes.items()}
+            finally:
+                if not options["keep"]:
+                    Table.objects.filter(pk__in=[table.pk for table in tables]).delete()
+                    User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        report = {
+            "meta": {
+                "commit": self.get_commit(),
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "tables": options["tables"],
+                "reservations": options["reservations"],
+                "users": options["users"],
+                "requests": options["requests"],
+                "base_url": options["base_url"],
+            },
+            "routes": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                previous = json.load(file)["routes"]
+        for name, result in results.items():
+            line = (
+                f"{name:40} p50={result['p50_ms']:8.2f} мс  p95={result['p95_ms']:8.2f} мс  "
+                f"p99={result['p99_ms']:8.2f} мс  rps={result['rps']:8.1f}"
+            )
+            if result["queries_avg"] is not None:
+                line += f"  запросов к БД={result['queries_avg']:.1f}"
+            if result["over_budget"]:
+                line += f"  превышен бюджет {result['query_budget']}"
+            if result["unexpected"]:
+                line += f"  неожиданных ответов {result['unexpected']} (ожидался {result['expected_status']})"
+            if name in previous:
+                line += f"  Δp95={result['p95_ms'] - previous[name]['p95_ms']:+.2f} мс"
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
+
+        failed = [name for name, result in results.items() if result["unexpected"]]
+        if failed:
+            raise CommandError(f"Маршруты ответили не тем кодом, что ожидался: {', '.join(failed)}")
+
+    def get_routes(self, sample, tables):
+        """Маршруты для замера: все GET-маршруты приложений и POST бронирования."""
+        kwargs = {"pk": sample.pk, **SAMPLE_KWARGS}
+        routes = {}
+        for urlconf in (reservation_urls, users_urls):
+            for pattern in urlconf.urlpatterns:
+                if not isinstance(pattern, URLPattern):
+                    continue
+                name = f"{urlconf.app_name}:{pattern.name}"
+                url = reverse(name, kwargs={key: kwargs[key] for key in pattern.pattern.converters})
+                if pattern.name == "availability":
+                    url += f"?date_from={timezone.localdate().isoformat()}"
+                routes[name] = ("get", url, None, None)
+
+        # Каждое бронирование замера - свободный слот после созданных бронирований: столики по кругу,
+        # затем следующий час. Иначе часть POST-запросов заканчивалась бы отказом, а не бронированием
+        slots = count()
+        first_slot = Reservation.objects.filter(table__in=tables).aggregate(Max("reserved_at"))["reserved_at__max"]
+        first_slot = max(first_slot or timezone.now(), timezone.now()).replace(second=0, microsecond=0)
+        first_slot += RESERVATION_DURATION
+
+        def booking_data():
+            index = next(slots)
+            table = tables[index % len(tables)]
+            reserved_at = first_slot + RESERVATION_DURATION * (index // len(tables))
+            return {
+                "table": table.pk,
+                "guests": random.randint(1, table.capacity),
+                "reserved_at": timezone.localtime(reserved_at).strftime("%Y-%m-%dT%H:%M"),
+                "customer_name": "bench",
+                "customer_contact": "bench",
+            }
+
+        # Успешное бронирование перенаправляет на список бронирований
+        routes["reservation:reservation_list [POST]"] = (
+            "post",
+            reverse("reservation:reservation_list"),
+            booking_data,
+            302,
+        )
+        return routes
+
+    def run_route(self, users, options, method, url, data_factory, expected_status):
+        """Замер одного маршрута: пользователи параллельно выполняют запросы.
+
+        Если задан expected_status, ответы с другим кодом считаются неожиданными (unexpected).
+        """
+        latencies = []
+        queries = []
+        statuses = {}
+        lock = threading.Lock()
+        per_user = -(-options["requests"] // len(users))
+
+        def worker(user):
+            send = self.http_sender(user, options["base_url"]) if options["base_url"] else self.client_sender(user)
+            try:
+                for _ in range(per_user):
+                    data = data_factory() if data_factory else None
+                    with QueryRecorder().record() as recorder:
+                        started = time.perf_counter()
+                        status = send(method, url, data)
+                        elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(recorder.count)
+                        statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total = time.perf_counter() - started
+
+        budget = get_view_budget(resolve(url.split("?")[0]).func)
+        milliseconds = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+        return {
+            "method": method.upper(),
+            "url": url,
+            "count": len(latencies),
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "expected_status": expected_status,
+            "unexpected": 0 if expected_status is None else len(latencies) - statuses.get(expected_status, 0),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "rps": round(len(latencies) / total, 1),
+            # Запросы сервера к БД видны только при замере внутри процесса
+            "queries_avg": None if options["base_url"] else round(float(np.mean(queries)), 2),
+            "queries_max": None if options["base_url"] else int(np.max(queries)),
+            "query_budget": budget,
+            "over_budget": not options["base_url"] and budget is not None and int(np.max(queries)) > budget,
+        }
+
+    def client_sender(self, user):
+        """Выполнение запросов тестовым клиентом от имени пользователя user, возвращает код ответа."""
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        client.cookies[RESTAURANT_PARAM] = str(self.restaurant_id)
+
+        def send(method, url, data):
+            return getattr(client, method)(url, data).status_code
+
+        return send
+
+    def http_sender(self, user, base_url):
+        """Выполнение запросов к серверу base_url по одному keep-alive соединению, возвращает код ответа.
+
+        Сессия пользователя создается в общей с сервером БД, CSRF-токен передается
+        в cookie и заголовке X-CSRFToken.
+        """
+        client = Client()
+        client.force_login(user)
+        csrf_token = get_random_string(CSRF_SECRET_LENGTH)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; "
+        cookie += f"{settings.CSRF_COOKIE_NAME}={csrf_token}; {RESTAURANT_PARAM}={self.restaurant_id}"
+        # Дальше поток работает только по HTTP: соединение с БД возвращается в пул
+        connections.close_all()
+        parts = urlsplit(base_url)
+        http = HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+        def send(method, url, data):
+            headers = {"Cookie": cookie, "X-CSRFToken": csrf_token}
+            body = None
+            if data is not None:
+                body = urlencode(data)
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+            try:
+                http.request(method.upper(), url, body=body, headers=headers)
+                response = http.getresponse()
+                response.read()
+            except (OSError, HTTPException):
+                http.close()  # соединение будет открыто заново при следующем запросе
+                return 0
+            return response.status
+
+        return send
+
+    def get_commit(self):
+        """Текущий коммит git, если доступен."""
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
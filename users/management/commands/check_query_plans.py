@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from config.routers import restaurant_database, use_restaurant
+from reservation.models import Reservation, WaitlistEntry
+from reservation.query_plan import SequentialScanFound, assert_no_seq_scan
+from reservation.restaurants import command_restaurant
+from reservation.seed import seed_reservations, seed_tables, seed_waitlist
+from reservation.services import find_conflicts, get_reservation_period
+from reservation.views import PersonalAccountListView, ReservationListView
+from reservation.waitlist import waiting_entries
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов представлений бронирований на заполненной базе."""
+
+    help = (
+        "Заполняет базу тестовыми данными во временной транзакции, выполняет EXPLAIN для запросов "
+        "представлений и завершается ошибкой при последовательном просмотре таблицы бронирований"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tables", type=int, default=50, help="Количество создаваемых столиков")
+        parser.add_argument("--reservations", type=int, default=100000, help="Количество создаваемых бронирований")
+        parser.add_argument("--users", type=int, default=50, help="Количество владельцев бронирований")
+        parser.add_argument("--waitlist", type=int, default=5000, help="Количество записей в листе ожидания")
+        parser.add_argument("--restaurant", type=int, help="id ресторана, в котором создаются тестовые данные")
+
+    def handle(self, *args, **options):
+        with use_restaurant(command_restaurant(options["restaurant"])):
+            self.check_plans(options)
+
+    def check_plans(self, options):
+        """Заполнение БД текущего ресторана и проверка планов в откатываемой транзакции."""
+        failures = []
+        using = restaurant_database()
+        with transaction.atomic(), transaction.atomic(using=using):
+            users = [
+                User.objects.create(email=f"plan-{index}-{time.time_ns()}@plan.local", is_active=True)
+                for index in range(options["users"])
+            ]
+            admin = users[-1]
+            tables = seed_tables(options["tables"])
+            seed_reservations(tables, options["reservations"], owners=users)
+            seed_waitlist(users, options["waitlist"])
+            with connections[using].cursor() as cursor:
+                cursor.execute(f"ANALYZE {Reservation._meta.db_table}")
+                cursor.execute(f"ANALYZE {WaitlistEntry._meta.db_table}")
+
+            for label, queryset in self.get_querysets(users[0], admin, tables[0]).items():
+                try:
+                    assert_no_seq_scan(queryset, label)
+                except SequentialScanFound as error:
+                    failures.append(str(error))
+                    self.stdout.write(self.style.ERROR(f"{label}: последовательный просмотр"))
+                else:
+                    self.stdout.write(f"{label}: OK")
+            # Пользователи создаются в default, остальные данные - в БД ресторана
+            transaction.set_rollback(True, using=using)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError("\n\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Последовательных просмотров таблицы бронирований нет"))
+
+    def get_querysets(self, user, admin, table):
+        """Запросы представлений в том виде, в котором их выполняет страница."""
+        querysets = {
+            "Личный кабинет, предстоящие": self.get_view_queryset(PersonalAccountListView, user),
+            "Личный кабинет, история": self.get_view_queryset(PersonalAccountListView, user, {"period": "past"}),
+            "Список бронирований пользователя": self.get_view_queryset(ReservationListView, user),
+            "Список бронирований администратора": self.get_view_queryset(ReservationListView, admin, show_all=True),
+        }
+        start, end = get_reservation_period(timezone.now() + timedelta(days=1))
+        querysets["Проверка пересечений"] = find_conflicts(table, start, end)
+        querysets["Лист ожидания, освободившийся слот"] = waiting_entries(
+            table.restaurant_id, start, table.capacity
+        ).order_by("-guests", "created_at")[:1]
+        return querysets
+
+    def get_view_queryset(self, view_class, user, params=None, **kwargs):
+        """Первая страница набора данных представления для пользователя user."""
+        request = RequestFactory().get("/", params)
+        request.user = user
+        view = view_class()
+        view.setup(request)
+        return view.get_queryset(**kwargs)[: view.keyset_page_size + 1]
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from users.models import EmailVerificationToken, User
+
+
+class Command(BaseCommand):
+    """Удаление неподтвержденных аккаунтов и просроченных токенов подтверждения почты."""
+
+    help = (
+        "Удаляет пачками аккаунты, почта которых не подтверждена до истечения срока ссылки, "
+        "и просроченные токены подтверждения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Количество строк в пачке")
+        parser.add_argument("--sleep", type=float, default=0, help="Пауза между пачками, в секундах")
+        parser.add_argument("--dry-run", action="store_true", help="Только подсчитать, что будет удалено")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Аккаунт не подтвержден, если у него есть только просроченные неиспользованные токены.
+        # Заблокированные администратором пользователи тоже неактивны, но их токен использован
+        expired = EmailVerificationToken.objects.filter(expires_at__lt=now)
+        unverified_ids = (
+            expired.filter(used_at__isnull=True, user__is_active=False, user__last_login__isnull=True)
+            .exclude(user__verification_tokens__expires_at__gte=now)
+            .exclude(user__verification_tokens__used_at__isnull=False)
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"Неподтвержденных аккаунтов: {unverified_ids.count()}")
+            self.stdout.write(f"Просроченных токенов: {expired.count()}")
+            return
+
+        users = self.delete_in_batches(User.objects.all(), unverified_ids, options)
+        tokens = self.delete_in_batches(
+            EmailVerificationToken.objects.all(), expired.values_list("pk", flat=True), options
+        )
+        self.stdout.write(self.style.SUCCESS(f"Удалено аккаунтов: {users}, токенов: {tokens}"))
+
+    def delete_in_batches(self, queryset, ids, options):
+        """Удаление строк queryset с первичными ключами из подзапроса ids пачками по --batch-size.
+
+        Каждая пачка удаляется в своей короткой транзакции (автофиксация), поэтому
+        блокировки не копятся на время всей очистки и не мешают регистрации и входу.
+        """
+        deleted = 0
+        while True:
+            batch = list(ids.order_by()[: options["batch_size"]])
+            if not batch:
+                return deleted
+            _, per_model = queryset.filter(pk__in=batch).delete()
+            deleted += per_model.get(queryset.model._meta.label, 0)
+            self.stdout.write(f"{queryset.model._meta.verbose_name_plural}: удалено {deleted}")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
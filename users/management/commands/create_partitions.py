@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from reservation.partitions import PARTITION_MONTHS_AHEAD, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    """Создание месячных секций таблицы бронирований на ближайшие месяцы."""
+
+    help = "Создает недостающие месячные секции бронирований на --months месяцев вперед"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months", type=int, default=PARTITION_MONTHS_AHEAD, help="На сколько месяцев вперед создать секции"
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="БД или схема ресторанов, по умолчанию default"
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not is_partitioned(using):
+            raise CommandError("Таблица бронирований не секционирована, примените миграции")
+        created = ensure_partitions(months_ahead=options["months"], using=using)
+        for name in created:
+            self.stdout.write(f"Создана секция {name}")
+        self.stdout.write(self.style.SUCCESS(f"Создано секций: {len(created)}"))
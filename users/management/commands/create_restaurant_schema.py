@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+
+class Command(BaseCommand):
+    """Создание схемы ресторанов и ее таблиц."""
+
+    help = (
+        "Создает схему ресторанов из RESTAURANT_DATABASES, собственную таблицу примененных миграций "
+        "в ней и применяет миграции к схеме"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("database", help="Псевдоним БД из RESTAURANT_DATABASES с параметром schema")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        schema = settings.RESTAURANT_DATABASES.get(alias, {}).get("schema")
+        if not schema:
+            raise CommandError(f"{alias} не описан в RESTAURANT_DATABASES как схема (параметр schema)")
+
+        connection = connections[alias]
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(schema)}")
+            # Без своей таблицы миграций migrate нашел бы через search_path таблицу из public
+            # и посчитал бы миграции схемы уже примененными
+            cursor.execute(f"SET LOCAL search_path TO {connection.ops.quote_name(schema)}")
+            MigrationRecorder(connection).ensure_schema()
+        self.stdout.write(f"Схема {schema} готова, применяются миграции")
+        call_command("migrate", database=alias, interactive=False, verbosity=options["verbosity"])
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reservation.export import filter_reservations, iter_export_rows
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка бронирований в CSV или JSONL."""
+
+    help = "Выгружает бронирования за период с отбором по столику и владельцу в CSV или JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Начало периода, например 2024-01-01")
+        parser.add_argument("--to", dest="date_to", help="Конец периода (не включая), например 2025-01-01")
+        parser.add_argument("--table", type=int, help="Номер столика")
+        parser.add_argument("--owner", help="Email владельца бронирования")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Формат выгрузки")
+        parser.add_argument("--output", help="Файл для выгрузки, по умолчанию стандартный вывод")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Размер пачки серверного курсора")
+
+    def handle(self, *args, **options):
+        queryset = filter_reservations(
+            date_from=self.parse_date(options["date_from"]),
+            date_to=self.parse_date(options["date_to"]),
+            table=options["table"],
+            owner=options["owner"],
+        )
+        output = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for line in iter_export_rows(queryset, options["format"], chunk_size=options["chunk_size"]):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    def parse_date(self, value):
+        """Дата или дата со временем из аргумента команды."""
+        if not value:
+            return None
+        moment = parse_datetime(value if "T" in value or " " in value else f"{value}T00:00")
+        if moment is None:
+            raise CommandError(f"Некорректная дата: {value}")
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
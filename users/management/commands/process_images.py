@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+from PIL import Image
+
+from reservation.images import find_images, generate_variants
+from users.models import ImageVariantJob
+from users.services import claim_queue_batch, queue_image_variants, run_queue
+
+
+class Command(BaseCommand):
+    """Создание уменьшенных копий изображений из очереди ImageVariantJob."""
+
+    help = "Создает копии изображений WebP и JPEG разной ширины для заданий из очереди"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10, help="Количество заданий в пачке")
+        parser.add_argument("--max-attempts", type=int, default=3, help="Количество попыток обработки")
+        parser.add_argument(
+            "--lease", type=int, default=300, help="Через сколько секунд необработанное задание снова берется в работу"
+        )
+        parser.add_argument("--sleep", type=float, default=5, help="Пауза при пустой очереди, в секундах")
+        parser.add_argument("--once", action="store_true", help="Обработать очередь и завершить работу")
+        parser.add_argument(
+            "--scan",
+            action="store_true",
+            help="Поставить в очередь все изображения MEDIA_ROOT перед обработкой (разовое заполнение очереди)",
+        )
+
+    def handle(self, *args, **options):
+        if options["scan"]:
+            paths = list(find_images())
+            for path in paths:
+                queue_image_variants(path)
+            self.stdout.write(f"Поставлено в очередь изображений: {len(paths)}")
+        run_queue(lambda: self.process_batch(options), options["once"], options["sleep"])
+
+    def process_batch(self, options):
+        """Обработка одной пачки заданий вне транзакции, возвращает количество обработанных заданий."""
+        batch = claim_queue_batch(ImageVariantJob, options["batch_size"], options["lease"])
+        if not batch:
+            return 0
+
+        for job in batch:
+            try:
+                generate_variants(job.path)
+            except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as error:
+                # Поврежденный или удаленный файл не должен останавливать очередь
+                job.last_error = str(error)
+                job.next_attempt_at = timezone.now()
+                if job.attempts >= options["max_attempts"]:
+                    job.status = ImageVariantJob.STATUS_FAILED
+            else:
+                job.status = ImageVariantJob.STATUS_DONE
+                job.processed_at = timezone.now()
+                job.last_error = ""
+
+        ImageVariantJob.objects.bulk_update(batch, ["status", "next_attempt_at", "last_error", "processed_at"])
+        self.stdout.write(f"Обработано изображений: {len(batch)}")
+        return len(batch)
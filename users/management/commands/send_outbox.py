@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+from users.services import claim_queue_batch, run_queue
+
+
+class Command(BaseCommand):
+    """Отправка писем из очереди OutgoingEmail."""
+
+    help = "Отправляет письма из очереди пачками через одно SMTP-подключение с повторами и задержкой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Количество писем в пачке")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Количество попыток отправки письма")
+        parser.add_argument("--backoff", type=int, default=60, help="Начальная задержка повтора, в секундах")
+        parser.add_argument(
+            "--lease", type=int, default=300, help="Через сколько секунд неотправленное письмо снова берется в работу"
+        )
+        parser.add_argument("--sleep", type=float, default=5, help="Пауза при пустой очереди, в секундах")
+        parser.add_argument("--once", action="store_true", help="Обработать очередь и завершить работу")
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            run_queue(lambda: self.send_batch(connection, options), options["once"], options["sleep"])
+        finally:
+            connection.close()
+
+    def send_batch(self, connection, options):
+        """Отправка одной пачки писем вне транзакции, возвращает количество обработанных писем."""
+        batch = claim_queue_batch(OutgoingEmail, options["batch_size"], options["lease"])
+        if not batch:
+            return 0
+
+        sent = 0
+        for email in batch:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.message,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection,
+            )
+            if email.html_message:
+                message.attach_alternative(email.html_message, "text/html")
+            try:
+                connection.open()  # подключение открывается один раз и переиспользуется
+                message.send()
+            except Exception as error:  # noqa: BLE001 - ошибка любого почтового бэкенда ведет к повтору
+                connection.close()  # следующая отправка откроет новое подключение
+                email.last_error = str(error)
+                if email.attempts >= options["max_attempts"]:
+                    email.status = OutgoingEmail.STATUS_FAILED
+                else:
+                    delay = options["backoff"] * 2 ** (email.attempts - 1)
+                    email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            else:
+                email.status = OutgoingEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+                sent += 1
+
+        OutgoingEmail.objects.bulk_update(batch, ["status", "next_attempt_at", "last_error", "sent_at"])
+        self.stdout.write(f"Отправлено писем: {sent} из {len(batch)}")
+        return len(batch)
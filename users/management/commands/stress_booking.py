@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from config.routers import use_restaurant
+from reservation.models import Reservation, Table
+from reservation.restaurants import command_restaurant
+from reservation.services import ReservationConflict, book_table
+
+
+class Command(BaseCommand):
+    """Нагрузочная проверка: параллельные бронирования одного столика на одно время."""
+
+    help = "Параллельно бронирует один слот из многих потоков и проверяет, что успешно только одно бронирование"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=50, help="Количество потоков (соединений с БД)")
+        parser.add_argument("--attempts", type=int, default=500, help="Общее количество попыток бронирования")
+        parser.add_argument("--keep", action="store_true", help="Не удалять тестовый столик и бронирование")
+        parser.add_argument("--restaurant", type=int, help="id ресторана тестового столика")
+
+    def handle(self, *args, **options):
+        with use_restaurant(command_restaurant(options["restaurant"])) as restaurant_id:
+            self.stress(restaurant_id, options)
+
+    def stress(self, restaurant_id, options):
+        """Параллельное бронирование нового столика ресторана restaurant_id и проверка результата.
+
+        Потоки не наследуют текущий ресторан, поэтому БД бронирований выбирается по столику.
+        """
+        threads_count = options["threads"]
+        attempts = options["attempts"]
+
+        number = (Table.objects.filter(restaurant_id=restaurant_id).aggregate(Max("number"))["number__max"] or 0) + 1
+        table = Table.objects.create(restaurant_id=restaurant_id, number=number, capacity=2, is_available=True)
+        reserved_at = timezone.now().replace(second=0, microsecond=0) + timedelta(days=1)
+
+        results = {"booked": 0, "conflict": 0, "error": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads_count)
+
+        def worker(count):
+            barrier.wait()  # все потоки начинают одновременно
+            try:
+                for _ in range(count):
+                    reservation = Reservation(
+                        table=table,
+                        reserved_at=reserved_at,
+                        customer_name="stress",
+                        customer_contact="stress",
+                    )
+                    try:
+                        book_table(reservation)
+                        outcome = "booked"
+                    except ReservationConflict:
+                        outcome = "conflict"
+                    except Exception as error:  # noqa: BLE001 - любая иная ошибка считается сбоем проверки
+                        self.stderr.write(str(error))
+                        outcome = "error"
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connections.close_all()
+
+        shares = [
+            attempts // threads_count + (1 if index < attempts % threads_count else 0)
+            for index in range(threads_count)
+        ]
+        threads = [threading.Thread(target=worker, args=(share,)) for share in shares]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stored = Reservation.objects.filter(table=table).count()
+        if not options["keep"]:
+            table.delete()
+
+        self.stdout.write(
+            f"Попыток: {attempts}, потоков: {threads_count}, успешно: {results['booked']}, "
+            f"отклонено: {results['conflict']}, ошибок: {results['error']}, записей в БД: {stored}"
+        )
+        self.stdout.write(f"Время: {elapsed:.3f} с, пропускная способность: {attempts / elapsed:.1f} бронирований/с")
+
+        if results["booked"] != 1 or stored != 1 or results["error"]:
+            raise CommandError("Проверка не пройдена: слот должен быть забронирован ровно один раз.")
+        self.stdout.write(self.style.SUCCESS("Проверка пройдена: слот забронирован ровно один раз."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="token",
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name="token"),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-17 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_alter_user_token"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageVariantJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=255, verbose_name="Путь к изображению")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает обработки"),
+                            ("done", "Обработано"),
+                            ("failed", "Ошибка обработки"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0, verbose_name="Попыток обработки")),
+                ("last_error", models.TextField(blank=True, default="", verbose_name="Последняя ошибка")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Создано")),
+                ("processed_at", models.DateTimeField(blank=True, null=True, verbose_name="Обработано")),
+            ],
+            options={
+                "verbose_name": "Обработка изображения",
+                "verbose_name_plural": "Обработка изображений",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["created_at"],
+                        name="image_variant_job_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:23
+
+import hashlib
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def move_pending_tokens(apps, schema_editor):
+    """Перенос токенов из еще не подтвержденных писем: ссылки продолжают работать весь срок действия."""
+    User = apps.get_model("users", "User")
+    EmailVerificationToken = apps.get_model("users", "EmailVerificationToken")
+    expires_at = timezone.now() + timedelta(seconds=settings.EMAIL_VERIFICATION_TTL)
+    pending = User.objects.filter(is_active=False, token__isnull=False).exclude(token="")
+    EmailVerificationToken.objects.bulk_create(
+        (
+            EmailVerificationToken(
+                user_id=user_id, token_hash=hashlib.sha256(token.encode()).hexdigest(), expires_at=expires_at
+            )
+            for user_id, token in pending.values_list("id", "token").iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_imagevariantjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailVerificationToken",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("token_hash", models.CharField(max_length=64, unique=True, verbose_name="SHA-256 токена")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Создан")),
+                ("expires_at", models.DateTimeField(verbose_name="Действует до")),
+                ("used_at", models.DateTimeField(blank=True, null=True, verbose_name="Использован")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="verification_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Токен подтверждения почты",
+                "verbose_name_plural": "Токены подтверждения почты",
+                "indexes": [models.Index(fields=["expires_at"], name="verification_token_expiry_idx")],
+            },
+        ),
+        migrations.RunPython(move_pending_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="user",
+            name="token",
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 14:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_emailverificationtoken"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="imagevariantjob",
+            name="image_variant_job_pending_idx",
+        ),
+        migrations.AddField(
+            model_name="imagevariantjob",
+            name="next_attempt_at",
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name="Следующая попытка"),
+        ),
+        migrations.AddIndex(
+            model_name="imagevariantjob",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["next_attempt_at"],
+                name="image_variant_job_pending_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 NULLABLE = {"blank": True, "null": True}
 
@@ -19,8 +20,6 @@ class User(AbstractUser):
         help_text="Загрузите аватар",
     )
 
-    token = models.CharField(max_length=100, verbose_name="token", blank=True, null=True)
-
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
@@ -33,3 +32,102 @@ class User(AbstractUser):
         permissions = [
             ("can_block_user", "can block user"),
         ]
+
+
+class EmailVerificationToken(models.Model):
+    """Одноразовый токен подтверждения почты. В БД хранится только SHA-256 токена из письма."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="verification_tokens", verbose_name="Пользователь"
+    )
+    token_hash = models.CharField(max_length=64, unique=True, verbose_name="SHA-256 токена")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    used_at = models.DateTimeField(verbose_name="Использован", **NULLABLE)
+
+    def __str__(self):
+        return f"{self.user_id} до {self.expires_at}"
+
+    class Meta:
+        verbose_name = "Токен подтверждения почты"
+        verbose_name_plural = "Токены подтверждения почты"
+        indexes = [
+            # Очистка просроченных токенов и неподтвержденных аккаунтов пачками
+            models.Index(fields=["expires_at"], name="verification_token_expiry_idx"),
+        ]
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку (transactional outbox)."""
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает отправки"),
+        (STATUS_SENT, "Отправлено"),
+        (STATUS_FAILED, "Ошибка отправки"),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name="Тема")
+    message = models.TextField(verbose_name="Текст письма")
+    html_message = models.TextField(verbose_name="HTML-версия письма", **NULLABLE)
+    from_email = models.CharField(max_length=254, verbose_name="Отправитель", **NULLABLE)
+    recipients = models.JSONField(verbose_name="Получатели")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток отправки")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, default="", verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    sent_at = models.DateTimeField(verbose_name="Отправлено", **NULLABLE)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+    class Meta:
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        indexes = [
+            # Очередь обработчика: только письма, ожидающие отправки
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outgoing_email_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+
+class ImageVariantJob(models.Model):
+    """Задание на создание уменьшенных копий изображения из MEDIA_ROOT."""
+
+    STATUS_PENDING = "pending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает обработки"),
+        (STATUS_DONE, "Обработано"),
+        (STATUS_FAILED, "Ошибка обработки"),
+    ]
+
+    path = models.CharField(max_length=255, verbose_name="Путь к изображению")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток обработки")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, default="", verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    processed_at = models.DateTimeField(verbose_name="Обработано", **NULLABLE)
+
+    def __str__(self):
+        return self.path
+
+    class Meta:
+        verbose_name = "Обработка изображения"
+        verbose_name_plural = "Обработка изображений"
+        indexes = [
+            # Очередь обработчика: только задания, ожидающие обработки
+            models.Index(
+                fields=["next_attempt_at"],
+                name="image_variant_job_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
@@ -0,0 +1,161 @@
+import hashlib
+import secrets
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import EmailVerificationToken, ImageVariantJob, OutgoingEmail
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """Постановка письма в очередь вместо отправки во время запроса.
+
+    Письмо сохраняется в той же транзакции, что и изменения, из-за которых оно
+    отправляется, а доставляет его команда send_outbox.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        message=message,
+        html_message=html_message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def queue_image_variants(path):
+    """Постановка изображения из MEDIA_ROOT в очередь на создание уменьшенных копий.
+
+    Копии создает команда process_images, запрос на загрузку изображения их не ждет.
+    """
+    return ImageVariantJob.objects.create(path=path)
+
+
+def claim_queue_batch(model, batch_size, lease):
+    """Захват пачки ожидающих записей очереди model (OutgoingEmail, ImageVariantJob) в короткой транзакции.
+
+    Захваченным записям засчитывается попытка, а следующая попытка откладывается на lease секунд:
+    другие обработчики их не берут, пока идет обработка, а записи упавшего обработчика после
+    аренды берутся повторно. Сама обработка идет вне транзакции и не держит блокировки строк.
+    """
+    lease_until = timezone.now() + timedelta(seconds=lease)
+    with transaction.atomic():
+        # SKIP LOCKED позволяет запускать несколько обработчиков параллельно
+        batch = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(status=model.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        for item in batch:
+            item.attempts += 1
+            item.next_attempt_at = lease_until
+        model.objects.bulk_update(batch, ["attempts", "next_attempt_at"])
+    return batch
+
+
+def run_queue(process_batch, once=False, sleep=5):
+    """Цикл обработчика очереди: process_batch вызывается, пока пачки не пусты, затем пауза sleep секунд.
+
+    С once обработчик завершается, как только очередь опустела.
+    """
+    while True:
+        if process_batch():
+            continue
+        if once:
+            break
+        time.sleep(sleep)
+
+
+def hash_token(token):
+    """SHA-256 токена подтверждения: по нему токен ищется в БД, а сам токен есть только в письме."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_verification_token(user):
+    """Новый токен подтверждения почты пользователя user; возвращается токен для ссылки в письме."""
+    token = secrets.token_urlsafe(32)
+    EmailVerificationToken.objects.create(
+        user=user,
+        token_hash=hash_token(token),
+        expires_at=timezone.now() + timedelta(seconds=settings.EMAIL_VERIFICATION_TTL),
+    )
+    return token
+
+
+def verify_email(token):
+    """Активация пользователя по токену из письма. Возвращает пользователя или None.
+
+    Токен ищется по уникальному индексу хеша и блокируется, поэтому повторный или
+    одновременный переход по ссылке не использует его дважды. Просроченный или уже
+    использованный токен не подходит.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        verification = (
+            EmailVerificationToken.objects.select_for_update()
+            .select_related("user")
+            .filter(token_hash=hash_token(token), used_at__isnull=True, expires_at__gt=now)
+            .first()
+        )
+        if verification is None:
+            return None
+        verification.used_at = now
+        verification.save(update_fields=["used_at"])
+        user = verification.user
+        user.is_active = True
+        user.save(update_fields=["is_active"])
+    return user
+
+
+def user_cache_key(user_id):
+    """Ключ кэша пользователя для загрузки в запросе по сессии."""
+    return f"user:{user_id}"
+
+
+def roles_cache_key(user_id):
+    """Ключ кэша групп и прав пользователя."""
+    return f"user-roles:{user_id}"
+
+
+def load_user_roles(user):
+    """Группы и права пользователя из БД."""
+    backend = ModelBackend()
+    return {
+        "groups": set(user.groups.values_list("name", flat=True)),
+        "permissions": backend.get_user_permissions(user) | backend.get_group_permissions(user),
+    }
+
+
+def get_user_roles(user):
+    """Группы и права пользователя: из кэша, а при промахе из БД.
+
+    Кэш сбрасывается сигналами при изменении пользователя, его групп и прав групп.
+    """
+    key = roles_cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = load_user_roles(user)
+        cache.set(key, roles, settings.USER_CACHE_TIMEOUT)
+    return roles
+
+
+async def aget_user_roles(user):
+    """Асинхронная версия get_user_roles."""
+    key = roles_cache_key(user.pk)
+    roles = await cache.aget(key)
+    if roles is None:
+        roles = await sync_to_async(load_user_roles)(user)
+        await cache.aset(key, roles, settings.USER_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_user_cache(user_ids):
+    """Сброс закэшированных пользователей и их ролей."""
+    keys = [key for user_id in user_ids for key in (user_cache_key(user_id), roles_cache_key(user_id))]
+    if keys:
+        cache.delete_many(keys)
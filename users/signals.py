@@ -0,0 +1,68 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from reservation.images import is_up_to_date
+from users.models import User
+from users.services import invalidate_user_cache, queue_image_variants
+
+
+@receiver(post_save, sender=User)
+def clear_header_fragment(sender, instance, **kwargs):
+    """Сброс закэшированной шапки сайта после изменения данных пользователя."""
+    cache.delete(make_template_fragment_key("header", [instance.pk]))
+
+
+@receiver(post_save, sender=User)
+def queue_avatar_variants(sender, instance, update_fields=None, **kwargs):
+    """Постановка нового аватара в очередь на создание уменьшенных копий."""
+    if not instance.avatar or (update_fields is not None and "avatar" not in update_fields):
+        return
+    if not is_up_to_date(instance.avatar.name):
+        queue_image_variants(instance.avatar.name)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def clear_user_cache(sender, instance, **kwargs):
+    """Сброс закэшированного пользователя и его ролей после изменения или удаления."""
+    invalidate_user_cache([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def clear_member_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сброс ролей пользователей при изменении их групп или личных прав.
+
+    При изменении со стороны группы (group.user_set) затронуты пользователи из pk_set,
+    а при очистке - все участники группы, которые известны только до очистки.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_user_cache([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        invalidate_user_cache(pk_set)
+    elif action == "pre_clear" and isinstance(instance, Group):
+        invalidate_user_cache(instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def clear_group_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сброс ролей участников групп, у которых изменились права."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        groups = [instance.pk]
+    elif action == "pre_clear":
+        groups = instance.group_set.values_list("pk", flat=True)
+    else:
+        groups = pk_set
+    invalidate_user_cache(User.objects.filter(groups__in=groups).values_list("pk", flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+def clear_deleted_group_roles(sender, instance, **kwargs):
+    """Сброс ролей участников удаляемой группы."""
+    invalidate_user_cache(instance.user_set.values_list("pk", flat=True))
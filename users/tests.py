@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import EmailVerificationToken, ImageVariantJob, OutgoingEmail, User
+from users.services import claim_queue_batch, create_verification_token, hash_token, verify_email
+
+
+def create_token(user, expires_in=timedelta(hours=1)):
+    """Токен подтверждения почты пользователя user, действующий еще expires_in (отрицательное - просрочен)."""
+    token = create_verification_token(user)
+    EmailVerificationToken.objects.filter(token_hash=hash_token(token)).update(expires_at=timezone.now() + expires_in)
+    return token
+
+
+class QueueClaimTest(TestCase):
+    """Захват пачек очередей писем и заданий на обработку изображений."""
+
+    def test_claimed_items_are_leased(self):
+        for model, item in (
+            (
+                OutgoingEmail,
+                OutgoingEmail.objects.create(subject="test", message="test", recipients=["a@example.com"]),
+            ),
+            (ImageVariantJob, ImageVariantJob.objects.create(path="test.jpg")),
+        ):
+            with self.subTest(model.__name__):
+                batch = claim_queue_batch(model, batch_size=10, lease=60)
+                self.assertEqual([claimed.pk for claimed in batch], [item.pk])
+                item.refresh_from_db()
+                self.assertEqual(item.attempts, 1)
+                self.assertGreater(item.next_attempt_at, timezone.now() + timedelta(seconds=50))
+                # Пока аренда не истекла, запись не берет ни один обработчик
+                self.assertEqual(claim_queue_batch(model, batch_size=10, lease=60), [])
+
+    def test_batch_size_and_order(self):
+        now = timezone.now()
+        jobs = [
+            ImageVariantJob.objects.create(path=f"{index}.jpg", next_attempt_at=now - timedelta(minutes=index))
+            for index in range(3)
+        ]
+        ImageVariantJob.objects.create(path="later.jpg", next_attempt_at=now + timedelta(hours=1))
+        batch = claim_queue_batch(ImageVariantJob, batch_size=2, lease=60)
+        self.assertEqual([job.pk for job in batch], [jobs[2].pk, jobs[1].pk])
+
+
+class EmailVerificationTest(TestCase):
+    """Подтверждение почты одноразовой ссылкой с ограниченным сроком действия."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="new@example.com", is_active=False)
+
+    def confirm(self, token):
+        """Переход по ссылке подтверждения с токеном token."""
+        return self.client.get(reverse("users:email-confirm", kwargs={"token": token}))
+
+    def assert_active(self, is_active):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.is_active, is_active)
+
+    def test_valid_token(self):
+        response = self.confirm(create_token(self.user))
+        self.assertRedirects(response, reverse("users:login"), fetch_redirect_response=False)
+        self.assert_active(True)
+
+    def test_expired_token(self):
+        self.assertEqual(self.confirm(create_token(self.user, -timedelta(seconds=1))).status_code, 404)
+        self.assert_active(False)
+
+    def test_spent_token(self):
+        token = create_token(self.user)
+        self.assertEqual(verify_email(token), self.user)
+        # Заблокированный после подтверждения пользователь не активируется повторной ссылкой
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(verify_email(token))
+        self.assertEqual(self.confirm(token).status_code, 404)
+        self.assert_active(False)
+
+    def test_unknown_token(self):
+        create_token(self.user)
+        token_hash = EmailVerificationToken.objects.get(user=self.user).token_hash
+        # В БД хранится только хеш: ни он сам, ни произвольная строка токеном не являются
+        for token in (token_hash, "unknown"):
+            with self.subTest(token):
+                self.assertIsNone(verify_email(token))
+                self.assertEqual(self.confirm(token).status_code, 404)
+        self.assert_active(False)
+
+
+class CleanupUnverifiedTest(TestCase):
+    """Очистка неподтвержденных аккаунтов и просроченных токенов."""
+
+    expired = -timedelta(hours=1)
+
+    def create_user(self, email, expires_in=None, used=False, **fields):
+        """Пользователь с токеном подтверждения (если задан expires_in), использованным при used."""
+        user = User.objects.create(email=email, is_active=fields.pop("is_active", False), **fields)
+        if expires_in is not None:
+            token = create_token(user, expires_in)
+            if used:
+                EmailVerificationToken.objects.filter(token_hash=hash_token(token)).update(used_at=timezone.now())
+        return user
+
+    def test_cleanup(self):
+        unverified = self.create_user("unverified@example.com", self.expired)
+        kept = [
+            self.create_user("pending@example.com", timedelta(hours=1)),
+            self.create_user("verified@example.com", self.expired, used=True, is_active=True),
+            # Заблокирован администратором после подтверждения
+            self.create_user("blocked@example.com", self.expired, used=True),
+            # Неактивен, но уже входил на сайт
+            self.create_user("visited@example.com", self.expired, last_login=timezone.now()),
+            self.create_user("no-token@example.com"),
+        ]
+        resent = self.create_user("resent@example.com", self.expired)
+        create_token(resent)  # новая ссылка взамен просроченной
+        kept.append(resent)
+
+        call_command("cleanup_unverified", "--dry-run", stdout=StringIO())
+        self.assertTrue(User.objects.filter(pk=unverified.pk).exists())
+
+        call_command("cleanup_unverified", "--batch-size", "1", stdout=StringIO())
+        self.assertCountEqual(User.objects.all(), kept)
+        # Остаются только действующие токены
+        self.assertFalse(EmailVerificationToken.objects.filter(expires_at__lt=timezone.now()).exists())
+        self.assertEqual(EmailVerificationToken.objects.count(), 2)
@@ -1,15 +1,15 @@
-import secrets
-
 from django.contrib.auth.views import PasswordResetConfirmView, PasswordResetView
 from django.contrib.messages.views import SuccessMessageMixin
-from django.core.mail import send_mail
-from django.shortcuts import get_object_or_404, redirect
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView
 
 from config.settings import EMAIL_HOST_USER
 from users.forms import UserForgotPasswordForm, UserRegisterForm, UserSetNewPasswordForm
 from users.models import User
+from users.services import create_verification_token, queue_mail, verify_email
 
 
 class UserCreateView(CreateView):
@@ -20,27 +20,29 @@ class UserCreateView(CreateView):
     success_url = reverse_lazy("users:login")
 
     def form_valid(self, form):
-        user = form.save()
-        user.is_active = False
-        token = secrets.token_hex(16)
-        user.token = token
-        user.save()
-        host = self.request.get_host()
-        url = f"http://{host}/users/email-confirm/{token}/"
-        send_mail(
-            subject="Подтверждение почты на сайте ресторана 'НеРесторан'",
-            message=f"Приветствуем Вас! Благодарим Вас за регистраницию на сайте НеРесторан'! Прежде всего нам необходимо убедиться что это действительно Вы. Для подтверждения вашей электронной почты, просим Вас перейти по ссылке {url}",
-            from_email=EMAIL_HOST_USER,
-            recipient_list=[user.email],
-        )
-        return super().form_valid(form)
+        # Пользователь и письмо с подтверждением сохраняются в одной транзакции,
+        # письмо отправляет команда send_outbox
+        with transaction.atomic():
+            user = form.save(commit=False)
+            user.is_active = False
+            user.save()
+            token = create_verification_token(user)
+            host = self.request.get_host()
+            url = f"http://{host}/users/email-confirm/{token}/"
+            queue_mail(
+                subject="Подтверждение почты на сайте ресторана 'НеРесторан'",
+                message=f"Приветствуем Вас! Благодарим Вас за регистраницию на сайте НеРесторан'! Прежде всего нам необходимо убедиться что это действительно Вы. Для подтверждения вашей электронной почты, просим Вас перейти по ссылке {url}",
+                from_email=EMAIL_HOST_USER,
+                recipient_list=[user.email],
+            )
+        self.object = user
+        return redirect(self.get_success_url())
 
 
 def email_verification(request, token):
     """Подтверждение email."""
-    user = get_object_or_404(User, token=token)
-    user.is_active = True
-    user.save()
+    if verify_email(token) is None:
+        raise Http404("Ссылка подтверждения недействительна или устарела")
     return redirect(reverse("users:login"))
 
 